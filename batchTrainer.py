@@ -0,0 +1,329 @@
+"""Trains tabular agents on many tic tac toe games played in lockstep.
+
+All the games of a batch are advanced one move at a time with NumPy array
+operations: move selection, win detection and SARSA / Q-learning updates
+are done for the whole batch at once. The trained state action values can
+be turned into an AIPlayer or saved in the same format as AIPlayer.saveState.
+"""
+from __future__ import division
+import array
+import pickle
+import numpy as np
+import deepTic
+
+nOfStates = 3 ** 9
+
+#lookup tables indexed by the base-3 code of the board
+states = np.array( deepTic.Symmetries.states, dtype = np.int8 )
+canonicalCode = np.array( deepTic.Symmetries.canonicalCode, dtype = np.int64 )
+canonicalPerm = np.array( deepTic.Symmetries.canonicalPerm, dtype = np.int64 )
+legal = states == 0
+bits = 1 << np.arange( 9 )
+won = np.array( deepTic.Game.winning )[ ( states == 1 ).dot( bits ) ] | np.array( deepTic.Game.winning )[ ( states == 2 ).dot( bits ) ]
+full = ~legal.any( axis = 1 )
+powers = np.array( deepTic.Game.powers, dtype = np.int64 )
+#inverseAction[ p, a ] gives the board cell of action a taken in the invariant with permutation p
+inverseAction = np.array( deepTic.sharedSymmetries.p[ : len( deepTic.Symmetries.allSymmetries ) ], dtype = np.int64 )
+#boards which can occur in a game, X moves first so it has as many symbols as O or one more
+lead = ( states == 1 ).sum( axis = 1 ) - ( states == 2 ).sum( axis = 1 )
+reachable = ( lead == 0 ) | ( lead == 1 )
+
+
+def greedyPolicy( values ):
+    """Builds a table of greedy actions from AIPlayer state action values.
+
+    Unseen states get their first legal action, which is what AIPlayer
+    does in competition mode when all the values of a state are equal.
+
+    Args:
+        values: dictionary of state action pair values ( as saved by AIPlayer.saveState )
+
+    Returns:
+        array with the chosen action for every board code ( -1 for full boards )
+    """
+    policy = np.where( full, -1, legal.argmax( axis = 1 ) )
+    for state, row in values.items():
+        #ties go to the lowest action, like in DictQTable.greedyAction
+        policy[ deepTic.Symmetries.codes[ state ] ] = max( sorted( row ), key = row.get )
+    return policy
+
+
+class BatchTrainer( object ):
+    """Trains state action values on a batch of games played in lockstep.
+
+    Game g is learned by the table g % nTables, so several games can share
+    a table ( one agent trained on parallel games ) or every game can have
+    its own table ( independent agents ). Updates from games sharing a table
+    are applied at the same time, if several games update the same state
+    action pair in one step the updates are applied one after another.
+
+    The tables only have rows for the boards which can occur in a game,
+    only for their invariants with the symmetry, so the values of 200
+    agents take about 12 MB with the symmetry and 87 MB without it,
+    instead of 283 MB for rows of all the board codes.
+
+    Attributes:
+        nGames: number of games played in lockstep
+        nTables: number of independent state action value tables
+        codes: board code of every row of the tables
+        rows: row of the tables of every board code, -1 for the boards without one
+        q: state action pair values, array of shape ( nTables, len( codes ), 9 )
+        visited: flags of the rows in which each table made a move
+        opponent: table of greedy actions of a fixed opponent playing as player two,
+            the tables play against themselves when None
+        opponentSymmetry: flag denoting if the opponent's table is given
+            w.r.t. the symmetric invariants of the states
+        eps: epsilon parameter, either a number or a function mapping an array
+            of episode numbers to an array of epsilons
+        sarsa: SARSA ( when set to True ) or Q-learning update
+        initialStateActionValue: Initial value for state action pairs
+        learningRate: learning rate as define in SARSA and Q-learning algorithms
+        useSymmetry: Flag denoting if the agents are aware of symmetric states,
+            fixed by the constructor
+        rng: numpy random generator
+    """
+
+    def __init__( self, nGames, nTables = 1, opponent = None, opponentSymmetry = True, eps = 0.1,
+                  sarsa = True, initialStateActionValue = 0.01, learningRate = 0.2, useSymmetry = True,
+                  seed = None ):
+        """Constructor
+
+        Args:
+            nGames: number of games played in lockstep, has to be a multiple of nTables
+            nTables: number of independent state action value tables
+            opponent: table of actions of the opponent ( see greedyPolicy ), None for self-play
+            opponentSymmetry: flag denoting if the opponent's table is given w.r.t. the invariants
+            eps: epsilon parameter, a number or a function of the episode numbers
+            sarsa: SARSA ( when set to True ) or Q-learning update
+            initialStateActionValue: Initial value for state action pairs
+            learningRate: learning rate as define in SARSA and Q-learning algorithms
+            useSymmetry: Flag denoting if the agents are aware of symmetric states
+            seed: seed of the random generator
+        """
+        if nGames % nTables != 0:
+            raise ValueError( "Number of games has to be a multiple of the number of tables" )
+        self.nGames = nGames
+        self.nTables = nTables
+        self.opponent = opponent
+        self.opponentSymmetry = opponentSymmetry
+        self.eps = eps
+        self.sarsa = sarsa
+        self.initialStateActionValue = initialStateActionValue
+        self.learningRate = learningRate
+        self.useSymmetry = useSymmetry
+        self.rng = np.random.RandomState( seed )
+        if useSymmetry:
+            self.codes = np.flatnonzero( reachable & ( canonicalCode == np.arange( nOfStates ) ) )
+        else:
+            self.codes = np.flatnonzero( reachable )
+        self.rows = np.full( nOfStates, -1, dtype = np.int64 )
+        self.rows[ self.codes ] = np.arange( len( self.codes ) )
+        self.q = np.where( legal[ self.codes ], initialStateActionValue, -np.inf )[ np.newaxis ].repeat( nTables, axis = 0 )
+        self.visited = np.zeros( ( nTables, len( self.codes ) ), dtype = bool )
+
+    def epsilon( self, episodes ):
+        """Returns epsilons for the given episode numbers."""
+        if callable( self.eps ):
+            return np.asarray( self.eps( episodes ), dtype = float )
+        return np.full( len( episodes ), self.eps, dtype = float )
+
+    def train( self, nEpisodes ):
+        """Plays nEpisodes episodes in every game of the batch.
+
+        Args:
+            nEpisodes: number of episodes played by every game
+
+        Returns:
+            array of shape ( nGames, nEpisodes ) with the results of the episodes:
+            1 if Player 1 won, 0 for a tie, -1 if the Player 1 lost
+        """
+        n = self.nGames
+        games = np.arange( n )
+        tables = games % self.nTables
+        results = np.zeros( ( n, nEpisodes ), dtype = np.int8 )
+        code = np.zeros( n, dtype = np.int64 )
+        turn = np.zeros( n, dtype = np.int64 )
+        episode = np.zeros( n, dtype = np.int64 )
+        #last state and action of each side, used for the delayed SARSA updates
+        prevState = np.zeros( ( 2, n ), dtype = np.int64 )
+        prevAction = np.zeros( ( 2, n ), dtype = np.int64 )
+        hasPrev = np.zeros( ( 2, n ), dtype = bool )
+        active = np.ones( n, dtype = bool )
+        if nEpisodes == 0:
+            return results
+        while active.any():
+            if self.opponent is None:
+                learner = active
+            else:
+                learner = active & ( turn == 0 )
+            move = np.zeros( n, dtype = np.int64 )
+
+            g = games[ learner ]
+            if len( g ):
+                move[ g ] = self.learnerMoves( g, tables[ g ], code[ g ], turn[ g ], episode[ g ],
+                                               prevState, prevAction, hasPrev )
+            g = games[ active & ~learner ]
+            if len( g ):
+                c = code[ g ]
+                if self.opponentSymmetry:
+                    move[ g ] = inverseAction[ canonicalPerm[ c ], self.opponent[ canonicalCode[ c ] ] ]
+                else:
+                    move[ g ] = self.opponent[ c ]
+
+            g = games[ active ]
+            code[ g ] += ( turn[ g ] + 1 ) * powers[ move[ g ] ]
+            win = active & won[ code ]
+            tie = active & full[ code ] & ~win
+            ended = games[ win | tie ]
+            if len( ended ):
+                reward = np.where( win[ ended ], 1.0, 0.0 )
+                mover = turn[ ended ]
+                self.terminalUpdates( ended, tables[ ended ], mover, reward, prevState, prevAction, hasPrev )
+                self.terminalUpdates( ended, tables[ ended ], 1 - mover, -reward, prevState, prevAction, hasPrev )
+                results[ ended, episode[ ended ] ] = np.where( mover == 0, reward, -reward )
+                code[ ended ] = 0
+                hasPrev[ :, ended ] = False
+                episode[ ended ] += 1
+                active[ ended[ episode[ ended ] == nEpisodes ] ] = False
+            turn[ g ] = 1 - turn[ g ]
+            turn[ ended ] = 0
+        return results
+
+    def learnerMoves( self, g, t, c, side, episode, prevState, prevAction, hasPrev ):
+        """Selects epsilon greedy moves of the learning tables and updates the values of their previous moves.
+
+        Args:
+            g: indices of the games
+            t: tables learning in the games
+            c: codes of the boards
+            side: side making the move in each game ( 0 or 1 )
+            episode: current episode number of each game
+            prevState, prevAction, hasPrev: previous moves of both sides
+
+        Returns:
+            board cells chosen in every game
+        """
+        if self.useSymmetry:
+            s = self.rows[ canonicalCode[ c ] ]
+        else:
+            s = self.rows[ c ]
+        q = self.q[ t, s ]
+        greedy = q.argmax( axis = 1 )
+        noise = self.rng.random_sample( q.shape )
+        #illegal actions have the value of minus infinity
+        noise[ q == -np.inf ] = -1.0
+        explore = self.rng.random_sample( len( g ) ) < self.epsilon( episode )
+        a = np.where( explore, noise.argmax( axis = 1 ), greedy )
+        self.visited[ t, s ] = True
+
+        update = hasPrev[ side, g ]
+        if update.any():
+            ut = t[ update ]
+            ps = prevState[ side[ update ], g[ update ] ]
+            pa = prevAction[ side[ update ], g[ update ] ]
+            if self.sarsa:
+                target = q[ update, a[ update ] ]
+            else:
+                target = q[ update ].max( axis = 1 )
+            self.applyUpdates( ut, ps, pa, target, self.learningRate )
+        prevState[ side, g ] = s
+        prevAction[ side, g ] = a
+        hasPrev[ side, g ] = True
+        if self.useSymmetry:
+            return inverseAction[ canonicalPerm[ c ], a ]
+        return a
+
+    def terminalUpdates( self, g, t, side, reward, prevState, prevAction, hasPrev ):
+        """Updates the values of the last moves made by the learners before the game ended.
+
+        Args:
+            g: indices of the ended games
+            t: tables learning in the games
+            side: side to be updated in each game
+            reward: reward received by the side
+            prevState, prevAction, hasPrev: previous moves of both sides
+        """
+        update = hasPrev[ side, g ]
+        if self.opponent is not None:
+            update &= side == 0
+        if update.any():
+            ut = t[ update ]
+            ps = prevState[ side[ update ], g[ update ] ]
+            pa = prevAction[ side[ update ], g[ update ] ]
+            #in a terminal state we know the value for s2,a2 is zero
+            self.applyUpdates( ut, ps, pa, reward[ update ], 0.1 )
+
+    def applyUpdates( self, t, s, a, target, rate ):
+        """Moves the values of the state action pairs towards the targets.
+
+        Games sharing a table may update the same pair in one step, their
+        updates are applied one after another in the order of the games
+        ( see deepTic.updateRounds ), so the step does not grow with the
+        number of the games.
+
+        Args:
+            t: tables of the pairs
+            s: rows of the states of the pairs
+            a: actions of the pairs
+            target: target values of the updates
+            rate: learning rate of the updates
+        """
+        flat = np.ravel_multi_index( ( t, s, a ), self.q.shape )
+        #the tables are contiguous, so the flat array is a view of them
+        values = self.q.reshape( -1 )
+        for positions in deepTic.updateRounds( flat ):
+            i = flat[ positions ]
+            values[ i ] += rate * ( target[ positions ] - values[ i ] )
+
+    def toDict( self, table = 0 ):
+        """Returns state action pair values of a table in the AIPlayer format.
+
+        Args:
+            table: index of the table
+        """
+        values = {}
+        for row in np.nonzero( self.visited[ table ] )[ 0 ]:
+            code = self.codes[ row ]
+            actions = np.nonzero( legal[ code ] )[ 0 ]
+            values[ deepTic.Symmetries.states[ code ] ] = dict(
+                ( int( a ), float( self.q[ table, row, a ] ) ) for a in actions )
+        return values
+
+    def qTable( self, table = 0 ):
+        """Returns state action pair values of a table as a DenseQTable.
+
+        Args:
+            table: index of the table
+        """
+        qTable = deepTic.DenseQTable()
+        visited = self.codes[ self.visited[ table ] ]
+        values = np.full( ( nOfStates, 9 ), -np.inf )
+        values[ visited ] = self.q[ table, self.visited[ table ] ]
+        qTable.values = array.array( 'd', values.ravel().tolist() )
+        for code in visited:
+            qTable.actions[ code ] = deepTic.Game.actions[ int( ( ~legal[ code ] ).dot( bits ) ) ]
+        return qTable
+
+    def player( self, eps, table = 0 ):
+        """Returns an AIPlayer using the values learned by a table.
+
+        Args:
+            eps: epsilon parameter of the player
+            table: index of the table
+        """
+        player = deepTic.AIPlayer( eps, qTable = self.qTable( table ) )
+        player.sarsa = self.sarsa
+        player.initialStateActionValue = self.initialStateActionValue
+        player.learningRate = self.learningRate
+        player.useSymmetry = self.useSymmetry
+        return player
+
+    def saveState( self, fileName, table = 0 ):
+        """Saves the values learned by a table, the file can be loaded by AIPlayer.
+
+        Args:
+            fileName: path of the file
+            table: index of the table
+        """
+        with open( fileName, 'wb' ) as f:
+            pickle.dump( self.toDict( table ), f, 2 )
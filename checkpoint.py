@@ -0,0 +1,209 @@
+"""Incremental checkpoints of AIPlayer training runs.
+
+A checkpoint consists of a full snapshot ( <path>.snapshot ) and an
+append-only log ( <path>.log ) of the state action pair values changed
+since the snapshot. Every checkpoint appends one record to the log, every
+compactEvery checkpoints the log is compacted into a new snapshot.
+Both the snapshot and the log records carry the epsilon parameter and the
+state of the random generator, so training can continue exactly where it
+stopped.
+
+    checkpointer = Checkpointer( player, 'runs/agent' )
+    ...
+    checkpointer.checkpoint()
+
+    #later, in a new process
+    player = deepTic.AIPlayer( 0.1 )
+    checkpointer = Checkpointer( player, 'runs/agent', resume = True )
+"""
+import os
+import pickle
+import random
+import struct
+
+
+class LoggingQTable( object ):
+    """Storage of state action pair values which remembers what has changed.
+
+    Wraps another storage ( DictQTable, DenseQTable, ... ) and records the
+    states initialized and the state action pairs set since the last flush.
+
+    Attributes:
+        table: the wrapped storage
+        newStates: actions of the states initialized since the last flush
+        changed: state action pairs set since the last flush
+    """
+
+    def __init__( self, table ):
+        self.table = table
+        self.newStates = {}
+        self.changed = set()
+
+    def __contains__( self, state ):
+        return state in self.table
+
+    def __len__( self ):
+        return len( self.table )
+
+    def initialize( self, state, possibleActions, value ):
+        self.table.initialize( state, possibleActions, value )
+        self.newStates[ state ] = tuple( possibleActions )
+        self.changed.update( ( state, a ) for a in possibleActions )
+
+    def actionValues( self, state ):
+        return self.table.actionValues( state )
+
+    def greedyAction( self, state ):
+        return self.table.greedyAction( state )
+
+    def get( self, state, action ):
+        return self.table.get( state, action )
+
+    def set( self, state, action, value ):
+        self.table.set( state, action, value )
+        self.changed.add( ( state, action ) )
+
+    def maxValue( self, state ):
+        return self.table.maxValue( state )
+
+    def loadDict( self, values ):
+        self.table.loadDict( values )
+        for state, row in values.items():
+            self.newStates[ state ] = tuple( row )
+            self.changed.update( ( state, a ) for a in row )
+
+    def toDict( self ):
+        return self.table.toDict()
+
+    def snapshot( self ):
+        return self.table.snapshot()
+
+    def flush( self ):
+        """Returns the changes since the last flush and forgets them.
+
+        Returns:
+            tuple of the new states ( dictionary of their actions ) and
+            a list of ( state, action, value ) entries
+        """
+        entries = list( ( s, a, self.table.get( s, a ) ) for ( s, a ) in self.changed )
+        newStates = self.newStates
+        self.newStates = {}
+        self.changed = set()
+        return newStates, entries
+
+
+class Checkpointer( object ):
+    """Writes incremental checkpoints of an AIPlayer.
+
+    Attributes:
+        player: the player being checkpointed
+        path: common path of the snapshot and the log files
+        compactEvery: number of checkpoints between compactions
+        sequence: number of the last checkpoint written
+    """
+
+    def __init__( self, player, path, compactEvery = 10, resume = False ):
+        """Constructor
+
+        Args:
+            player: AIPlayer to be checkpointed
+            path: common path of the snapshot and the log files
+            compactEvery: number of checkpoints between compactions
+            resume: if True the player ( which should be freshly constructed ) is
+                restored from the files, otherwise the checkpoint starts anew
+                with a full snapshot of the player
+        """
+        self.player = player
+        self.path = path
+        self.compactEvery = compactEvery
+        self.sequence = 0
+        self.__sinceCompaction = 0
+        if resume:
+            self.restore()
+        self.__table = LoggingQTable( player.getQTable() )
+        player.setQTable( self.__table )
+        if not resume:
+            self.compact()
+
+    def snapshotFile( self ):
+        return self.path + '.snapshot'
+
+    def logFile( self ):
+        return self.path + '.log'
+
+    def checkpoint( self ):
+        """Appends the changes since the last checkpoint to the log."""
+        if self.__sinceCompaction + 1 >= self.compactEvery:
+            self.compact()
+            return
+        newStates, entries = self.__table.flush()
+        self.sequence += 1
+        record = {
+            'sequence': self.sequence,
+            'states': newStates,
+            'entries': entries,
+            'eps': self.player.getEps(),
+            'rng': random.getstate() }
+        with open( self.logFile(), 'ab' ) as f:
+            pickle.dump( record, f, 2 )
+            f.flush()
+            os.fsync( f.fileno() )
+        self.__sinceCompaction += 1
+
+    def compact( self ):
+        """Writes a full snapshot and empties the log."""
+        self.__table.flush()
+        self.sequence += 1
+        snapshot = {
+            'sequence': self.sequence,
+            'values': self.__table.toDict(),
+            'eps': self.player.getEps(),
+            'rng': random.getstate() }
+        temporaryFile = self.snapshotFile() + '.tmp'
+        with open( temporaryFile, 'wb' ) as f:
+            pickle.dump( snapshot, f, 2 )
+            f.flush()
+            os.fsync( f.fileno() )
+        if os.path.exists( self.snapshotFile() ):
+            os.remove( self.snapshotFile() )
+        os.rename( temporaryFile, self.snapshotFile() )
+        #records in the log are older than the snapshot now
+        with open( self.logFile(), 'wb' ):
+            pass
+        self.__sinceCompaction = 0
+
+    def restore( self ):
+        """Restores the player from the snapshot and replays the log.
+
+        Log records older than the snapshot ( left by an interrupted compaction )
+        are ignored, a record which was not written completely is removed.
+        """
+        with open( self.snapshotFile(), 'rb' ) as f:
+            snapshot = pickle.load( f )
+        table = self.player.getQTable()
+        table.loadDict( snapshot[ 'values' ] )
+        last = snapshot
+        if os.path.exists( self.logFile() ):
+            with open( self.logFile(), 'r+b' ) as f:
+                while True:
+                    end = f.tell()
+                    try:
+                        record = pickle.load( f )
+                    except ( EOFError, pickle.UnpicklingError, ValueError, TypeError, IndexError, KeyError, struct.error ):
+                        #new records have to follow the last complete one, the
+                        #pure Python unpickler of Python 2 fails on a cut record
+                        #with all kinds of errors
+                        f.truncate( end )
+                        break
+                    if record[ 'sequence' ] <= snapshot[ 'sequence' ]:
+                        continue
+                    for state, actions in record[ 'states' ].items():
+                        if state not in table:
+                            table.initialize( state, actions, 0.0 )
+                    for ( state, action, value ) in record[ 'entries' ]:
+                        table.set( state, action, value )
+                    last = record
+                    self.__sinceCompaction += 1
+        self.sequence = last[ 'sequence' ]
+        self.player.setEps( last[ 'eps' ] )
+        random.setstate( last[ 'rng' ] )
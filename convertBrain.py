@@ -0,0 +1,13 @@
+import argparse
+import pickle
+import deepTic
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description = 'Converts pickled .brain files to the binary brain format' )
+    parser.add_argument( "source", help = 'Path to pickled pre-trained policy' )
+    parser.add_argument( "destination", help = 'Path of the binary brain file to write' )
+    args = parser.parse_args()
+    with open( args.source, 'rb' ) as f:
+        values = pickle.load( f )
+    deepTic.MappedQTable.save( values, args.destination )
+    print( "Converted {} states.".format( len( values ) ) )
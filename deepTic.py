@@ -1,6 +1,96 @@
+import array
+import bisect
+import ctypes
+import itertools
+import mmap
 import random
 import pickle
+import struct
+import sys
 from pprint import pprint
+try:
+    import numpy
+    #random generators whose draws makeMoves vectorizes
+    numpyGenerators = tuple( getattr( numpy.random, name ) for name in ( 'Generator', 'RandomState' ) if hasattr( numpy.random, name ) )
+except ImportError:
+    numpy = None
+try:
+    readLine = raw_input
+except NameError:
+    #Python 3
+    readLine = input
+
+def basicPermutations( size ):
+    """Returns the rotation left, mirroring and identity permutations of a square board.
+    
+    A permutation p gives the board tuple( state[ i ] for i in p ).
+    
+    Args:
+        size: length of the side of the board
+    """
+    cells = tuple( itertools.product( range( size ), repeat = 2 ) )
+    rotation = tuple( c * size + size - 1 - r for ( r, c ) in cells )
+    mirroring = tuple( ( size - 1 - r ) * size + c for ( r, c ) in cells )
+    return { 'r': rotation, 'm': mirroring, 'e': tuple( range( size * size ) ) }
+
+def winningLines( size, k ):
+    """Returns cells of all the lines of k cells in a row on a square board.
+    
+    Rows come first, then columns, diagonals and anti-diagonals.
+    
+    Args:
+        size: length of the side of the board
+        k: number of symbols in a row needed to win
+    """
+    lines = []
+    for ( dr, dc ) in ( ( 0, 1 ), ( 1, 0 ), ( 1, 1 ), ( 1, -1 ) ):
+        for r in range( size ):
+            for c in range( size ):
+                line = tuple( ( r + i * dr, c + i * dc ) for i in range( k ) )
+                if all( 0 <= lr < size and 0 <= lc < size for ( lr, lc ) in line ):
+                    lines.append( tuple( lr * size + lc for ( lr, lc ) in line ) )
+    return lines
+
+def epsilonGreedy( greedyAction, possibleActions, eps ):
+    """Returns the probabilities of the moves of the epsilon greedy strategy.
+    
+    Args:
+        greedyAction: the best action
+        possibleActions: all actions possible in the state
+        eps: probability of a random move
+    
+    Returns:
+        list of pairs of an action and the probability it is chosen
+    """
+    if eps <= 0:
+        return [ ( greedyAction, 1.0 ) ]
+    share = eps / float( len( possibleActions ) )
+    return list( ( a, share + ( 1 - eps if a == greedyAction else 0.0 ) ) for a in possibleActions )
+
+def updateRounds( indices ):
+    """Splits updates of an array into rounds without repeated indices.
+    
+    An update whose index appeared k times before it in the sequence goes
+    into round k, so applying the rounds one after another applies the
+    updates of the same entry in their order, like the scalar updates do,
+    while every round is a single array operation. Needs NumPy.
+    
+    Args:
+        indices: NumPy array of the indices of the updated entries
+    
+    Returns:
+        list of arrays of the positions in indices, one per round
+    """
+    n = len( indices )
+    if n == 0:
+        return []
+    #a stable sort keeps the updates of the same entry in their order
+    order = numpy.argsort( indices, kind = 'mergesort' )
+    ordered = indices[ order ]
+    starts = numpy.flatnonzero( numpy.concatenate( ( [ True ], ordered[ 1 : ] != ordered[ : -1 ] ) ) )
+    ranks = numpy.empty( n, dtype = numpy.intp )
+    ranks[ order ] = numpy.arange( n ) - numpy.repeat( starts, numpy.diff( numpy.append( starts, n ) ) )
+    return list( numpy.flatnonzero( ranks == k ) for k in range( ranks.max() + 1 ) )
 
 class Symmetries():
     """Class for finding invariant states of the tic tac toe board.
@@ -13,29 +103,101 @@ class Symmetries():
             and mirroring
         allSymmetries: stores the recipies for generating all symmetry transformations
             using the primitive operations or rotation and mirroring
+        states: lookup table mapping base-3 code of a board to the board tuple
+        codes: lookup table mapping board tuple to its base-3 code
+        canonicalCode: lookup table mapping base-3 code of a board to the code
+            of its invariant state
+        canonicalPerm: lookup table mapping base-3 code of a board to the index
+            of the permutation which gives its invariant state
+        inverse: inverse permutations, inverse[ p ][ action ] gives the action
+            under permutation p
     """
     
     multiplier = tuple( range( 10 , 0, -1 ) )
-    perm = {
-        'r': ( 2, 5, 8, 1, 4, 7, 0, 3, 6 ), #rotation left
-        'm': ( 6, 7, 8, 3, 4, 5, 0, 1, 2 ), #mirroring
-        'e': tuple( range( 9 ) ) }          #identity
+    perm = basicPermutations( 3 )
     allSymmetries = ( 'e', 'r', 'rr', 'rrr', 'm','mr','mrr','mrrr' )
     
+    #lookup tables are shared by all the instances and built only once
+    states = None
+    codes = None
+    canonicalCode = None
+    canonicalPerm = None
+    inverse = None
+    
     def __init__( self ):
         self.p = [[]] * len(Symmetries.allSymmetries) * 2
         state = tuple(range(9))
         #cache the allSymmetries
         for permutationIndex in range( len( Symmetries.allSymmetries ) ):
             r = self.initPermute( state, Symmetries.allSymmetries[ permutationIndex ] )  
-            self.p[ permutationIndex ] = r           
+            self.p[ permutationIndex ] = r
+        if Symmetries.canonicalCode is None:
+            Symmetries.buildTables( self.p[ : len( Symmetries.allSymmetries ) ] )
+            
+    @staticmethod
+    def buildTables( permutations ):
+        """Precomputes invariants of all the boards.
+        
+        Boards are encoded as base-3 numbers with the first cell being the
+        most significant digit. With cell values below 10 comparing the scores
+        of two boards is the same as comparing their codes, so the invariant
+        of a board is its permutation with the largest code (the first one
+        if several permutations give the same board).
+        
+        Args:
+            permutations: the cached permutations for all the symmetries
+        """
+        permutedCodes = []
+        for p in permutations:
+            #weight of each cell of the original board in the permuted board code
+            weights = [ 0 ] * 9
+            for newPos, oldPos in enumerate( p ):
+                weights[ oldPos ] = 3 ** ( 8 - newPos )
+            codes = [ 0 ]
+            for w in weights:
+                codes = [ c + d * w for c in codes for d in ( 0, 1, 2 ) ]
+            permutedCodes.append( codes )
+        canonicalCode = []
+        canonicalPerm = []
+        for codes in zip( *permutedCodes ):
+            bestCode = max( codes )
+            canonicalCode.append( bestCode )
+            canonicalPerm.append( codes.index( bestCode ) )
+        states = list( itertools.product( ( 0, 1, 2 ), repeat = 9 ) )
+        Symmetries.states = states
+        Symmetries.codes = dict( ( s, c ) for ( c, s ) in enumerate( states ) )
+        Symmetries.canonicalCode = canonicalCode
+        Symmetries.canonicalPerm = canonicalPerm
+        Symmetries.inverse = tuple( tuple( p.index( a ) for a in range( 9 ) ) for p in permutations )
             
     def invariant( self, state ):
         """For a given state returns its invariant under the symmetries.
         
+        Boards are looked up in the precomputed tables, other states
+        are handled by computeInvariant.
+        
         Args:
             state: A state of the tic tac toe board - tuple of length 9 with values 0, 1, or 2
         """
+        code = Symmetries.codes.get( tuple( state ) )
+        if code is None:
+            return self.computeInvariant( state )
+        return ( Symmetries.states[ Symmetries.canonicalCode[ code ] ], Symmetries.canonicalPerm[ code ] )
+        
+    def invariantOfCode( self, code ):
+        """Returns the invariant of a board given by its base-3 code.
+        
+        Args:
+            code: base-3 code of the board
+        """
+        return ( Symmetries.states[ Symmetries.canonicalCode[ code ] ], Symmetries.canonicalPerm[ code ] )
+    
+    def computeInvariant( self, state ):
+        """Computes invariant of a state without using the lookup tables.
+        
+        Args:
+            state: A state of the tic tac toe board - tuple of length 9
+        """
         
         bestState = tuple( state )
         bestPerm = 0
@@ -78,25 +240,52 @@ class Symmetries():
         
     def permuteAction( self, action, permutation):
         """Gives action value under permutation"""
-        return self.p[ permutation ].index( action )
+        return Symmetries.inverse[ permutation ][ action ]
     
     def inverseAction( self, action, permutation):
         """Given action under permutation, returns original action"""
         return self.p[ permutation ][ action ]
 
 
+#all the games share one instance of the Symmetries
+sharedSymmetries = Symmetries()
+
+
 class Game( object ):
     """Represents the state of the game.
     
+    The board is kept as two bit masks, one for the cells taken by X and
+    one for the cells taken by O ( bit i stands for the cell i ), together
+    with the base-3 code of the board used to look up its invariant.
+    
     Attributes:
-        __state: stores the state of the game
-        __invState: stores the invariante of the current
+        __x: bit mask of the cells taken by X
+        __o: bit mask of the cells taken by O
+        __code: base-3 code of the state of the game
+        __invCode: base-3 code of the invariante of the current
             state of the game ( it is cached for performance )
+        __invPerm: index of the permutation giving the invariante
+        __won: flag denoting if one of the players has a winning line, it
+            is decided when a symbol is placed and cached until the next move
+        __tie: flag denoting if the board is full without a winning line
         debug: flag to indicate if debog output should be printed
         useSymmetry: stores instance of the Symmetries class for
-            computing invariants of the states
-        
+            computing invariants of the states ( shared by all the games )
+        lines: bit masks of the 8 winning lines
+        powers: value of the base-3 digit for every cell of the board
+        winning: lookup table telling if a mask contains a winning line
+        actions: lookup table mapping a mask of taken cells to the
+            tuple of the empty cells
+        permutedMask: lookup table, permutedMask[ p ][ mask ] gives the
+            mask permuted with the permutation p
     """
+    fullMask = 0x1FF
+    lines = None
+    powers = tuple( 3 ** ( 8 - i ) for i in range( 9 ) )
+    winning = None
+    actions = None
+    permutedMask = None
+    
     def __init__( self, state = None, debug = False ):
         """
         Args:
@@ -104,13 +293,46 @@ class Game( object ):
             debug: indicates if deboug output should be printed
         """
         
-        if state is not None:
-            self.__state = tuple( state )
-        else:
-            self.__state = [ 0 ] * 9
         self.debug = debug
-        self.useSymmetry = Symmetries()
-        self.__invState = self.useSymmetry.invariant( self.__state )
+        self.useSymmetry = sharedSymmetries
+        self.reset( state )
+        
+    def reset( self, state = None ):
+        """Puts the game back into the initial state.
+        
+        Args:
+            state: Initial state of the game, empty board if None
+        """
+        self.__x = 0
+        self.__o = 0
+        self.__code = 0
+        if state is not None:
+            for pos, symbol in enumerate( state ):
+                if symbol == 1:
+                    self.__x |= 1 << pos
+                elif symbol == 2:
+                    self.__o |= 1 << pos
+                self.__code += symbol * Game.powers[ pos ]
+        self.__invCode = Symmetries.canonicalCode[ self.__code ]
+        self.__invPerm = Symmetries.canonicalPerm[ self.__code ]
+        self.__won = Game.winning[ self.__x ] or Game.winning[ self.__o ]
+        self.__tie = ( self.__x | self.__o ) == Game.fullMask and not self.__won
+        
+    @staticmethod
+    def buildTables( permutations ):
+        """Precomputes the lookup tables for the bit masks.
+        
+        Args:
+            permutations: the cached permutations for all the symmetries
+        """
+        lines = tuple( sum( 1 << i for i in line ) for line in winningLines( 3, 3 ) )
+        masks = range( Game.fullMask + 1 )
+        Game.lines = lines
+        Game.winning = tuple( any( mask & line == line for line in lines ) for mask in masks )
+        Game.actions = tuple( tuple( i for i in range( 9 ) if not mask & ( 1 << i ) ) for mask in masks )
+        Game.permutedMask = tuple( 
+            tuple( sum( ( ( mask >> p[ i ] ) & 1 ) << i for i in range( 9 ) ) for mask in masks )
+            for p in permutations )
 
     @staticmethod
     def mapper( s ):
@@ -127,8 +349,9 @@ class Game( object ):
     def __repr__( self ):
         """Returns string representation of the board
         """ 
+        state = self.returnState( False )
         lines = ( lineIndex for lineIndex in range( 3 ) )
-        lineState = ( self.__state[ line * 3 : line * 3 + 3 ] for line in lines )        
+        lineState = ( state[ line * 3 : line * 3 + 3 ] for line in lines )        
         allLines = ( "|".join( ( Game.mapper( x ) for x in line ) ) for line in lineState )
         return "\n-----\n".join( allLines )  
         
@@ -142,10 +365,27 @@ class Game( object ):
                 or not
         """
         if usingSymmetry:            
-            pos = self.useSymmetry.inverseAction( pos, self.__invState[1] )
-        self.__state[ pos ] = symbol
-        self.__invState = self.useSymmetry.invariant( self.__state )
-        if self.debug: print( self.__state )
+            pos = self.useSymmetry.inverseAction( pos, self.__invPerm )
+        bit = 1 << pos
+        power = Game.powers[ pos ]
+        replaced = ( self.__code // power ) % 3
+        self.__code += ( symbol - replaced ) * power
+        self.__x &= ~bit
+        self.__o &= ~bit
+        if symbol == 1:
+            self.__x |= bit
+            #a new line can only be one of the mover's lines through the placed cell
+            self.__won = self.__won or Game.winning[ self.__x ]
+        elif symbol == 2:
+            self.__o |= bit
+            self.__won = self.__won or Game.winning[ self.__o ]
+        if replaced != 0:
+            #a line might have been broken
+            self.__won = Game.winning[ self.__x ] or Game.winning[ self.__o ]
+        self.__tie = ( self.__x | self.__o ) == Game.fullMask and not self.__won
+        self.__invCode = Symmetries.canonicalCode[ self.__code ]
+        self.__invPerm = Symmetries.canonicalPerm[ self.__code ]
+        if self.debug: print( self.returnState( False ) )
     
     def returnState( self, usingSymmetry ):
         """Gives current state.
@@ -154,9 +394,9 @@ class Game( object ):
             usingSymmetry: if True the symmetric invariant of the state is returned
         """
         if usingSymmetry:
-            return self.__invState[ 0 ]            
+            return Symmetries.states[ self.__invCode ]
         else:
-            return tuple(self.__state)
+            return Symmetries.states[ self.__code ]
     
     def terminalState( self, state ):
         """Checks if the state is in a wining position.
@@ -164,17 +404,14 @@ class Game( object ):
         Args:
             state: state of the board
         """
-        if ( ( ( state[ 0 ] != 0) and ( state[ 0 ] == state[ 4 ] == state[ 8 ] ) ) or 
-           ( ( state[ 2 ] != 0 ) and ( state[ 2 ] == state[ 4 ] == state[ 6 ] ) ) ):
-            return True
-        for line in range( 3 ):
-            tmpLine = state[ line*3:line*3 + 3 ]
-            tmpCol = state[ line:line + 2 * 3 + 1:3]
-            if tmpLine[ 0 ] != 0 and all( ( x == tmpLine[ 0 ] for x in tmpLine ) ):
-                return True
-            if tmpCol[0] != 0 and all((x == tmpCol[0] for x in tmpCol)):
-                return True
-        return False
+        x = 0
+        o = 0
+        for pos, symbol in enumerate( state ):
+            if symbol == 1:
+                x |= 1 << pos
+            elif symbol == 2:
+                o |= 1 << pos
+        return Game.winning[ x ] or Game.winning[ o ]
     
     def getAvailableActions( self, usingSymmetry ):
         """Returns all available actions in the current game state.
@@ -184,26 +421,304 @@ class Game( object ):
                 w.r.t the symmetric invariant of the current state or not.
         """
         if usingSymmetry:
-            r = self.__invState[ 0 ]
-            return tuple( i for (i, v) in enumerate( r ) if v == 0)           
+            return Game.actions[ Game.permutedMask[ self.__invPerm ][ self.__x | self.__o ] ]
         else:
-            return tuple( i for (i, v) in enumerate( self.__state ) if v == 0)
+            return Game.actions[ self.__x | self.__o ]
     
     def end( self ):
         """Returns true if the game is in a terminal state with a player winning.
         """
-        return self.terminalState( self.__state )
+        return self.__won
     
     def tie( self ):
         """Returns true if the game is in a terminal state which is a tie.
         """
-        return (not self.end()) and (len( self.getAvailableActions( False ) ) == 0)
+        return self.__tie
+
+
+Game.buildTables( sharedSymmetries.p[ : len( Symmetries.allSymmetries ) ] )
+
+
+class BoardSymmetries( object ):
+    """Finds invariant states of a square board of any size.
+    
+    Works like the Symmetries, but the 8 dihedral permutations are built
+    from the size of the board and no lookup tables over all the boards
+    are needed. Boards are encoded as base-3 numbers with the first cell
+    being the most significant digit, the invariant of a board is its
+    permutation with the largest code ( the first one if several
+    permutations give the same board ), so for the 3x3 board the
+    invariants are the same as the ones given by the Symmetries.
+    
+    Attributes:
+        size: length of the side of the board
+        p: the 8 permutations, in the order of Symmetries.allSymmetries
+        inverse: inverse permutations, inverse[ p ][ action ] gives the action
+            under permutation p
+        weights: weights[ p ][ pos ] is the value of the base-3 digit of the
+            cell pos in the code of the board permuted with p
+    """
+    
+    def __init__( self, size ):
+        """Constructor
+        
+        Args:
+            size: length of the side of the board
+        """
+        self.size = size
+        nOfCells = size * size
+        basic = basicPermutations( size )
+        self.p = []
+        for recipe in Symmetries.allSymmetries:
+            permutation = basic[ 'e' ]
+            for op in recipe:
+                permutation = tuple( permutation[ i ] for i in basic[ op ] )
+            self.p.append( permutation )
+        self.inverse = tuple( tuple( p.index( a ) for a in range( nOfCells ) ) for p in self.p )
+        self.weights = []
+        for p in self.p:
+            weights = [ 0 ] * nOfCells
+            for newPos, oldPos in enumerate( p ):
+                weights[ oldPos ] = 3 ** ( nOfCells - 1 - newPos )
+            self.weights.append( tuple( weights ) )
             
+    def codes( self, state ):
+        """Returns codes of the state permuted with every permutation.
+        
+        Args:
+            state: state of the board - tuple with values 0, 1, or 2
+        """
+        return list( sum( symbol * w for ( symbol, w ) in zip( state, weights ) ) for weights in self.weights )
+        
+    def invariant( self, state ):
+        """For a given state returns its invariant and the index of the permutation giving it.
+        
+        Args:
+            state: state of the board - tuple with values 0, 1, or 2
+        """
+        codes = self.codes( state )
+        permutationIndex = codes.index( max( codes ) )
+        return ( self.permuteState( state, permutationIndex ), permutationIndex )
+        
+    def permuteState( self, state, permutationIndex ):
+        """Permutes state using the cached permutations"""
+        return tuple( state[ i ] for i in self.p[ permutationIndex ] )
+        
+    def permuteAction( self, action, permutation ):
+        """Gives action value under permutation"""
+        return self.inverse[ permutation ][ action ]
+    
+    def inverseAction( self, action, permutation ):
+        """Given action under permutation, returns original action"""
+        return self.p[ permutation ][ action ]
+
+
+class BoardGame( object ):
+    """Represents the state of a game of k symbols in a row on a square board of any size.
+    
+    Has the same interface as the Game, which remains the faster choice
+    for the 3x3 board. The board is kept as two bit masks together with
+    the base-3 codes of all its 8 permutations, which are updated with a
+    single addition each per move, so the invariant of the board is the
+    largest of 8 integers. A win is only looked for along the lines going
+    through the last move.
+    
+    Attributes:
+        size: length of the side of the board
+        k: number of symbols in a row needed to win
+        debug: flag to indicate if debog output should be printed
+        useSymmetry: BoardSymmetries of the board ( shared by all the games
+            of the same size )
+        lines: bit masks of all the winning lines
+        linesThrough: linesThrough[ pos ] are the bit masks of the winning
+            lines going through the cell pos
+        fullMask: bit mask of all the cells
+        __x: bit mask of the cells taken by X
+        __o: bit mask of the cells taken by O
+        __cells: values of the cells
+        __codes: base-3 codes of the state under every permutation, the
+            first one is the code of the state itself
+        __invPerm: index of the permutation giving the invariant
+        __won: flag denoting if one of the players has a winning line
+    """
+    #geometry shared by all the games of the same size and k
+    tables = {}
+    
+    def __init__( self, size = 3, k = None, state = None, debug = False ):
+        """Constructor
+        
+        Args:
+            size: length of the side of the board
+            k: number of symbols in a row needed to win, size if None
+            state: Initial state of the game
+            debug: indicates if deboug output should be printed
+        """
+        if k is None:
+            k = size
+        if not 0 < k <= size:
+            raise ValueError( "Cannot get {} in a row on a {}x{} board".format( k, size, size ) )
+        if ( size, k ) not in BoardGame.tables:
+            BoardGame.tables[ ( size, k ) ] = BoardGame.buildTables( size, k )
+        self.size = size
+        self.k = k
+        self.debug = debug
+        self.useSymmetry, self.lines, self.linesThrough = BoardGame.tables[ ( size, k ) ]
+        self.fullMask = ( 1 << ( size * size ) ) - 1
+        self.reset( state )
+        
+    @staticmethod
+    def buildTables( size, k ):
+        """Returns the symmetries, the winning lines and the lines through every cell.
+        
+        Args:
+            size: length of the side of the board
+            k: number of symbols in a row needed to win
+        """
+        cells = winningLines( size, k )
+        lines = tuple( sum( 1 << i for i in line ) for line in cells )
+        linesThrough = tuple( 
+            tuple( mask for ( line, mask ) in zip( cells, lines ) if pos in line )
+            for pos in range( size * size ) )
+        return ( BoardSymmetries( size ), lines, linesThrough )
+        
+    def reset( self, state = None ):
+        """Puts the game back into the initial state.
+        
+        Args:
+            state: Initial state of the game, empty board if None
+        """
+        nOfCells = self.size * self.size
+        self.__x = 0
+        self.__o = 0
+        self.__cells = [ 0 ] * nOfCells
+        self.__codes = [ 0 ] * len( self.useSymmetry.p )
+        self.__invPerm = 0
+        self.__won = False
+        if state is not None:
+            for pos, symbol in enumerate( state ):
+                if symbol != 0:
+                    self.place( pos, symbol )
+            self.__won = self.terminalState( self.__cells )
+            
+    def place( self, pos, symbol ):
+        """Puts the symbol into the cell and updates the masks and the codes."""
+        bit = 1 << pos
+        difference = symbol - self.__cells[ pos ]
+        self.__cells[ pos ] = symbol
+        self.__x &= ~bit
+        self.__o &= ~bit
+        if symbol == 1:
+            self.__x |= bit
+        elif symbol == 2:
+            self.__o |= bit
+        codes = self.__codes
+        for i, weights in enumerate( self.useSymmetry.weights ):
+            codes[ i ] += difference * weights[ pos ]
+        self.__invPerm = codes.index( max( codes ) )
+        
+    def __repr__( self ):
+        """Returns string representation of the board
+        """ 
+        state = self.returnState( False )
+        size = self.size
+        lineState = ( state[ line * size : line * size + size ] for line in range( size ) )
+        allLines = ( "|".join( ( Game.mapper( x ) for x in line ) ) for line in lineState )
+        return ( "\n" + "-" * ( 2 * size - 1 ) + "\n" ).join( allLines )
+        
+    def setState( self, pos, symbol, usingSymmetry ):
+        """Updates the state of the game.
+        
+        Args:
+            pos: position on the board to be updated
+            symbol: 0 - empty, 1-X, 2-O
+            usingSymmetry: flag, denoting if the 'pos' is given 
+                w.r.t. the symmetric invariant of the current state or not
+        """
+        if usingSymmetry:
+            pos = self.useSymmetry.inverseAction( pos, self.__invPerm )
+        replaced = self.__cells[ pos ]
+        self.place( pos, symbol )
+        if replaced != 0:
+            #a line might have been broken
+            self.__won = self.terminalState( self.__cells )
+        elif symbol != 0 and not self.__won:
+            if symbol == 1:
+                mask = self.__x
+            else:
+                mask = self.__o
+            self.__won = any( mask & line == line for line in self.linesThrough[ pos ] )
+        if self.debug: print( self.returnState( False ) )
+        
+    def returnState( self, usingSymmetry ):
+        """Gives current state.
+        
+        Args:
+            usingSymmetry: if True the symmetric invariant of the state is returned
+        """
+        if usingSymmetry:
+            return self.useSymmetry.permuteState( self.__cells, self.__invPerm )
+        else:
+            return tuple( self.__cells )
+            
+    def returnCode( self, usingSymmetry ):
+        """Gives base-3 code of the current state, a compact key for large boards.
+        
+        The GameEnvironment gives the codes instead of the states to the
+        players with the useCodes flag set ( see AIPlayer.useCodes ).
+        
+        Args:
+            usingSymmetry: if True the code of the symmetric invariant of the state is returned
+        """
+        if usingSymmetry:
+            return self.__codes[ self.__invPerm ]
+        else:
+            return self.__codes[ 0 ]
+    
+    def terminalState( self, state ):
+        """Checks if the state is in a wining position.
+        
+        Args:
+            state: state of the board
+        """
+        x = 0
+        o = 0
+        for pos, symbol in enumerate( state ):
+            if symbol == 1:
+                x |= 1 << pos
+            elif symbol == 2:
+                o |= 1 << pos
+        return any( x & line == line or o & line == line for line in self.lines )
+    
+    def getAvailableActions( self, usingSymmetry ):
+        """Returns all available actions in the current game state.
+        
+        Args:
+            usingSymmetry: flag denoting if the actions should be returned 
+                w.r.t the symmetric invariant of the current state or not.
+        """
+        cells = self.__cells
+        if usingSymmetry:
+            p = self.useSymmetry.p[ self.__invPerm ]
+            return tuple( i for i in range( len( cells ) ) if cells[ p[ i ] ] == 0 )
+        else:
+            return tuple( i for i in range( len( cells ) ) if cells[ i ] == 0 )
+    
+    def end( self ):
+        """Returns true if the game is in a terminal state with a player winning.
+        """
+        return self.__won
+    
+    def tie( self ):
+        """Returns true if the game is in a terminal state which is a tie.
+        """
+        return ( self.__x | self.__o ) == self.fullMask and not self.__won
+
+
 class Update( object ):
     '''
     Class to store SARSA updates to the agents
     '''
-    def __init__( self, callback ):
+    def __init__( self, callback, reuseRecord = False ):
         self.a1 = None  #action in first state
         self.s1 = None  #first state
         self.a2 = None  #action in subsequent state
@@ -212,18 +727,43 @@ class Update( object ):
         self.r = None   #reward experienced after taking a1 in s1
         self.firstPush = True   
         self.callback = callback    #agent who should receive this update
+        self.observe = None     #method of the game giving the states the agent learns on
+        #when set, the same dictionary is filled in for every update, so the
+        #agent must not keep a reference to it
+        self.reuseRecord = reuseRecord
+        self.record = {}
+        
+    def reset( self, callback = None ):
+        '''
+        Prepares the object for a new episode
+        
+        Args:
+            callback: new agent to receive the updates, the current one is kept if None
+        '''
+        if callback is not None:
+            self.callback = callback
+        self.a1 = None
+        self.s1 = None
+        self.a2 = None
+        self.s2 = None
+        self.t = None
+        self.r = None
+        self.firstPush = True
         
     def send( self ):
         '''
         Sends SARSA update to the registered agents
         '''
-        r = {
-            'a1': self.a1,
-            'a2': self.a2,
-            's1': self.s1,
-            's2': self.s2,
-             'r': self.r,
-             't': self.t}
+        if self.reuseRecord:
+            r = self.record
+        else:
+            r = {}
+        r[ 'a1' ] = self.a1
+        r[ 'a2' ] = self.a2
+        r[ 's1' ] = self.s1
+        r[ 's2' ] = self.s2
+        r[ 'r' ] = self.r
+        r[ 't' ] = self.t
         self.callback.update( r )
         
     def push(self, state, action, reward, terminal):
@@ -264,21 +804,62 @@ class GameEnvironment( object ):
         __p1: Player one
         __p2: Player two
         __game: State of the game
+        __p1Update: object managing updates to the player one
+        __p2Update: object managing updates to the player two
+        __initialState: state the game is put back into by reset, None for the empty board
         debug: Flag denoting if debug output should be printed
         sym: 
     """
-    def __init__(self, p1, p2, game):
+    def __init__(self, p1, p2, game, reuseUpdates = False ):
         """Constructor
         
         Args:
             p1: player one
             p2: player two
             game: game to play
+            reuseUpdates: if True the players receive the same update
+                dictionary every time ( they must not keep references to it )
         """
         self.__p1 = p1
         self.__p2 = p2
         self.__game = game
+        initialState = game.returnState( False )
+        self.__initialState = tuple( initialState ) if any( initialState ) else None
+        self.__p1Update = Update( p1, reuseUpdates )
+        self.__p2Update = Update( p2, reuseUpdates )
         self.debug = False
+        
+    def reset( self, p1 = None, p2 = None ):
+        """Prepares the environment for a new game.
+        
+        The game is put back into the state it was in when the environment
+        was created, so the same environment can be used to play many
+        episodes, also from a position set up in advance.
+        
+        Args:
+            p1: new player one, the current one is kept if None
+            p2: new player two, the current one is kept if None
+        """
+        if p1 is not None:
+            self.__p1 = p1
+        if p2 is not None:
+            self.__p2 = p2
+        self.__game.reset( self.__initialState )
+        
+    def observer( self, player ):
+        """Returns the method of the game giving the states the player sees.
+        
+        A player with the useCodes flag set gets the base-3 codes of the
+        boards ( see BoardGame.returnCode ), which are cheaper to compute and
+        to hash than the tuples of the large boards; the others get the
+        tuples of the cells.
+        
+        Args:
+            player: player making moves in the game
+        """
+        if getattr( player, 'useCodes', False ):
+            return self.__game.returnCode
+        return self.__game.returnState
                
     def step( self, p1, p2, game, p1Update, p2Update, symbol ):
         """Conducts a single step of a game.
@@ -302,20 +883,20 @@ class GameEnvironment( object ):
             0 if the game ended in a tie
             -1 if the game continues 
         """
-        currentGameState = game.returnState( p1.useSymmetry )
+        currentGameState = p1Update.observe( p1.useSymmetry )
         move = p1.makeMove( currentGameState, game.getAvailableActions( p1.useSymmetry ) )        
         p1Update.push( currentGameState, move, 0, False )
         game.setState( move, symbol, p1.useSymmetry )           
         if game.end():
-            currentGameState = game.returnState( p1.useSymmetry )
+            currentGameState = p1Update.observe( p1.useSymmetry )
             p1Update.push( currentGameState, -1, 1,  True )
-            currentGameState = game.returnState( p2.useSymmetry )
+            currentGameState = p2Update.observe( p2.useSymmetry )
             p2Update.push( currentGameState, -1, -1, True )
             return 1
         elif game.tie():
-            currentGameState = game.returnState( p1.useSymmetry )
+            currentGameState = p1Update.observe( p1.useSymmetry )
             p1Update.push( currentGameState, -1, 0,  True )
-            currentGameState = game.returnState( p2.useSymmetry )
+            currentGameState = p2Update.observe( p2.useSymmetry )
             p2Update.push( currentGameState, -1, 0, True )
             return 0
         else:            
@@ -337,8 +918,12 @@ class GameEnvironment( object ):
         if self.debug: 
             print( self.__game )
             print( "======" )
-        p1Update = Update( self.__p1 )
-        p2Update = Update( self.__p2 )
+        p1Update = self.__p1Update
+        p2Update = self.__p2Update
+        p1Update.reset( self.__p1 )
+        p2Update.reset( self.__p2 )
+        p1Update.observe = self.observer( self.__p1 )
+        p2Update.observe = self.observer( self.__p2 )
         while result == -1:    
             if self.debug: print( "Player's {} move!".format( currentPlayer ) )        
             if currentPlayer == 1:
@@ -384,7 +969,7 @@ class HumanPlayer( object ):
         print( "You have the following choices: {}".format( possibleActions ) )
         while not moveDone:
             try:
-                action = int(raw_input())
+                action = int(readLine())
             except ValueError:
                 continue
             if action in possibleActions:
@@ -398,12 +983,451 @@ class HumanPlayer( object ):
             pprint( state )
 
 
+class DictQTable( object ):
+    """Stores state action pair values in a hash table.
+    
+    This is the default storage of the AIPlayer. Works with states
+    of any shape.
+    
+    Attributes:
+        q: dictionary mapping states to dictionaries of action values
+    """
+    def __init__( self, values = None ):
+        """Constructor
+        
+        Args:
+            values: dictionary of state action pair values to start with
+        """
+        self.q = {}
+        if values is not None:
+            self.loadDict( values )
+        
+    def __contains__( self, state ):
+        return state in self.q
+    
+    def __len__( self ):
+        return len( self.q )
+        
+    def initialize( self, state, possibleActions, value ):
+        """Adds a state with all its actions set to the given value."""
+        self.q[ state ] = dict.fromkeys( possibleActions, value )
+        
+    def actionValues( self, state ):
+        """Returns lists of the actions and their values in the given state."""
+        row = self.q[ state ]
+        return list( row.keys() ), list( row.values() )
+        
+    def greedyAction( self, state ):
+        """Returns the lowest action with the highest value in the given state.
+        
+        The ties are not left to the order of the dictionary, which differs
+        between the versions of Python.
+        """
+        row = self.q[ state ]
+        best = max( row.values() )
+        return min( a for a, v in row.items() if v == best )
+        
+    def get( self, state, action ):
+        return self.q[ state ][ action ]
+    
+    def set( self, state, action, value ):
+        self.q[ state ][ action ] = value
+        
+    def maxValue( self, state ):
+        """Returns the highest action value in the given state."""
+        return max( self.q[ state ].values() )
+        
+    def loadDict( self, values ):
+        """Loads state action pair values from a dictionary."""
+        for state, row in values.items():
+            self.q[ state ] = dict( row )
+    
+    def toDict( self ):
+        """Returns the state action pair values as a dictionary."""
+        return self.q
+    
+    def snapshot( self ):
+        """Returns an independent copy of the table."""
+        return DictQTable( self.q )
+    
+    
+class DenseQTable( object ):
+    """Stores state action pair values in a contiguous array of floats.
+    
+    Values are indexed by the base-3 code of the state and the action,
+    so only states of the 3x3 board ( tuples of 9 values ) can be stored.
+    Values of the illegal actions are set to minus infinity, so the greedy
+    action can be found without knowing which actions are legal.
+    
+    Attributes:
+        values: array of nOfStates * 9 state action pair values
+        actions: available actions for every seen state, None for unseen states
+    """
+    nOfStates = 3 ** 9
+    illegal = float( '-inf' )
+    
+    def __init__( self, values = None ):
+        """Constructor
+        
+        Args:
+            values: dictionary of state action pair values to start with
+        """
+        self.values = array.array( 'd', [ DenseQTable.illegal ] ) * ( DenseQTable.nOfStates * 9 )
+        self.actions = [ None ] * DenseQTable.nOfStates
+        if values is not None:
+            self.loadDict( values )
+            
+    def __contains__( self, state ):
+        return self.actions[ Symmetries.codes[ state ] ] is not None
+    
+    def __len__( self ):
+        return sum( 1 for a in self.actions if a is not None )
+        
+    def containsCode( self, code ):
+        """Returns True if the state with the given base-3 code was seen."""
+        return self.actions[ code ] is not None
+        
+    def initializeCodes( self, codes, possibleMasks, value ):
+        """Adds many states at once, all their actions set to the given value.
+        
+        Needs NumPy.
+        
+        Args:
+            codes: base-3 codes of the states, each given once
+            possibleMasks: bit masks of the actions possible in the states
+            value: initial value of the actions
+        """
+        self.setRows( codes, possibleMasks, value )
+        for code, mask in zip( codes, possibleMasks ):
+            self.actions[ code ] = Game.actions[ Game.fullMask ^ mask ]
+            
+    def setRows( self, codes, possibleMasks, value ):
+        """Sets the possible actions of the states to the value and the others to illegal."""
+        legal = ( numpy.array( possibleMasks )[ :, None ] >> numpy.arange( 9 ) ) & 1
+        rows = numpy.frombuffer( self.values, dtype = numpy.float64 ).reshape( -1, 9 )
+        rows[ codes ] = numpy.where( legal, value, DenseQTable.illegal )
+        
+    def initialize( self, state, possibleActions, value ):
+        """Adds a state with all its actions set to the given value."""
+        code = Symmetries.codes[ state ]
+        base = code * 9
+        for a in possibleActions:
+            self.values[ base + a ] = value
+        self.actions[ code ] = tuple( possibleActions )
+        
+    def actionValues( self, state ):
+        """Returns lists of the actions and their values in the given state."""
+        code = Symmetries.codes[ state ]
+        base = code * 9
+        actions = list( self.actions[ code ] )
+        return actions, list( self.values[ base + a ] for a in actions )
+        
+    def greedyAction( self, state ):
+        """Returns the first action with the highest value in the given state."""
+        base = Symmetries.codes[ state ] * 9
+        row = self.values[ base : base + 9 ]
+        return row.index( max( row ) )
+        
+    def get( self, state, action ):
+        return self.values[ Symmetries.codes[ state ] * 9 + action ]
+    
+    def set( self, state, action, value ):
+        self.values[ Symmetries.codes[ state ] * 9 + action ] = value
+        
+    def maxValue( self, state ):
+        """Returns the highest action value in the given state."""
+        base = Symmetries.codes[ state ] * 9
+        return max( self.values[ base : base + 9 ] )
+    
+    def loadDict( self, values ):
+        """Loads state action pair values from a dictionary."""
+        for state, row in values.items():
+            self.initialize( state, sorted( row ), 0.0 )
+            for action, value in row.items():
+                self.set( state, action, value )
+    
+    def toDict( self ):
+        """Returns the state action pair values as a dictionary."""
+        q = {}
+        for code, actions in enumerate( self.actions ):
+            if actions is not None:
+                base = code * 9
+                q[ Symmetries.states[ code ] ] = dict( ( a, self.values[ base + a ] ) for a in actions )
+        return q
+    
+    def snapshot( self ):
+        """Returns an independent copy of the table."""
+        table = DenseQTable.__new__( DenseQTable )
+        table.values = array.array( 'd', self.values )
+        table.actions = list( self.actions )
+        return table
+    
+
+class MappedQTable( object ):
+    """Reads state action pair values from a memory mapped binary brain file.
+    
+    The file is mapped copy-on-write, so processes reading the same file share
+    one physical copy of it. Values can still be updated ( the changes are private
+    to the process ), states missing from the file are kept in a DictQTable.
+    
+    The binary format ( little endian ) is a 16 byte header with the magic bytes,
+    format version, number of cells of the board and number of states, followed
+    by the sorted base-3 codes of the states ( uint32 ) and, aligned to 8 bytes,
+    9 float64 values per state. Illegal actions have the value minus infinity.
+    
+    Attributes:
+        codes: sorted base-3 codes of the states in the file
+        values: values of the states in the file, 9 per state
+        extra: values of the states not in the file
+    """
+    magic = b'TTTB'
+    version = 1
+    header = struct.Struct( '<4sHHI4x' )
+    
+    def __init__( self, fileName ):
+        """Constructor
+        
+        Args:
+            fileName: path to the binary brain file
+        """
+        with open( fileName, 'rb' ) as f:
+            self.__map = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_COPY )
+        magic, version, nOfCells, nOfStates = MappedQTable.header.unpack_from( self.__map, 0 )
+        if magic != MappedQTable.magic or version != MappedQTable.version or nOfCells != 9:
+            raise ValueError( "{} is not a supported binary brain file".format( fileName ) )
+        start = MappedQTable.header.size
+        valuesStart = MappedQTable.valuesOffset( nOfStates )
+        if sys.byteorder == 'little':
+            self.codes = ( ctypes.c_uint32 * nOfStates ).from_buffer( self.__map, start )
+            self.values = ( ctypes.c_double * ( 9 * nOfStates ) ).from_buffer( self.__map, valuesStart )
+        else:
+            #the file is little endian, the values are copied and swapped
+            self.codes = MappedQTable.readArray( fileName, 'I', start, nOfStates )
+            self.values = MappedQTable.readArray( fileName, 'd', valuesStart, 9 * nOfStates )
+        self.extra = DictQTable()
+        
+    @staticmethod
+    def readArray( fileName, typecode, offset, n ):
+        """Returns n little endian numbers read from the file at the offset as a native array."""
+        data = array.array( typecode )
+        with open( fileName, 'rb' ) as f:
+            f.seek( offset )
+            data.fromfile( f, n )
+        if sys.byteorder != 'little':
+            data.byteswap()
+        return data
+        
+    @staticmethod
+    def valuesOffset( nOfStates ):
+        """Returns offset of the values in a file with nOfStates states."""
+        return ( MappedQTable.header.size + 4 * nOfStates + 7 ) // 8 * 8
+        
+    @staticmethod
+    def isBinaryBrain( fileName ):
+        """Returns True if the file is in the binary brain format."""
+        with open( fileName, 'rb' ) as f:
+            return f.read( len( MappedQTable.magic ) ) == MappedQTable.magic
+        
+    @staticmethod
+    def save( values, fileName ):
+        """Saves state action pair values in the binary brain format.
+        
+        Args:
+            values: dictionary of state action pair values ( as saved by AIPlayer.saveState )
+            fileName: path of the file to write
+        """
+        codes = sorted( Symmetries.codes[ state ] for state in values )
+        table = array.array( 'd', [ DenseQTable.illegal ] ) * ( 9 * len( codes ) )
+        for index, code in enumerate( codes ):
+            for action, value in values[ Symmetries.states[ code ] ].items():
+                table[ index * 9 + action ] = value
+        codes = array.array( 'I', codes )
+        if sys.byteorder != 'little':
+            codes.byteswap()
+            table.byteswap()
+        header = MappedQTable.header.pack( MappedQTable.magic, MappedQTable.version, 9, len( codes ) )
+        padding = MappedQTable.valuesOffset( len( codes ) ) - len( header ) - 4 * len( codes )
+        with open( fileName, 'wb' ) as f:
+            f.write( header )
+            codes.tofile( f )
+            f.write( b'\0' * padding )
+            table.tofile( f )
+        
+    def index( self, state ):
+        """Returns index of the state in the file or None if it is not there."""
+        code = Symmetries.codes.get( state )
+        if code is None:
+            return None
+        i = bisect.bisect_left( self.codes, code )
+        if i < len( self.codes ) and self.codes[ i ] == code:
+            return i
+        return None
+        
+    def __contains__( self, state ):
+        return self.index( state ) is not None or state in self.extra
+    
+    def __len__( self ):
+        return len( self.codes ) + len( self.extra )
+    
+    def initialize( self, state, possibleActions, value ):
+        """Adds a state with all its actions set to the given value."""
+        self.extra.initialize( state, possibleActions, value )
+        
+    def actionValues( self, state ):
+        """Returns lists of the actions and their values in the given state."""
+        i = self.index( state )
+        if i is None:
+            return self.extra.actionValues( state )
+        row = list( self.values[ i * 9 : i * 9 + 9 ] )
+        actions = list( a for a in range( 9 ) if row[ a ] != DenseQTable.illegal )
+        return actions, list( row[ a ] for a in actions )
+        
+    def greedyAction( self, state ):
+        """Returns the first action with the highest value in the given state."""
+        i = self.index( state )
+        if i is None:
+            return self.extra.greedyAction( state )
+        row = list( self.values[ i * 9 : i * 9 + 9 ] )
+        return row.index( max( row ) )
+    
+    def get( self, state, action ):
+        i = self.index( state )
+        if i is None:
+            return self.extra.get( state, action )
+        return self.values[ i * 9 + action ]
+    
+    def set( self, state, action, value ):
+        i = self.index( state )
+        if i is None:
+            self.extra.set( state, action, value )
+        else:
+            self.values[ i * 9 + action ] = value
+            
+    def maxValue( self, state ):
+        """Returns the highest action value in the given state."""
+        i = self.index( state )
+        if i is None:
+            return self.extra.maxValue( state )
+        return max( self.values[ i * 9 : i * 9 + 9 ] )
+    
+    def loadDict( self, values ):
+        """Loads state action pair values from a dictionary."""
+        for state, row in values.items():
+            if self.index( state ) is None:
+                self.extra.q[ state ] = dict( row )
+            else:
+                for action, value in row.items():
+                    self.set( state, action, value )
+    
+    def toDict( self ):
+        """Returns the state action pair values as a dictionary."""
+        q = {}
+        for code in self.codes:
+            state = Symmetries.states[ code ]
+            q[ state ] = dict( zip( *self.actionValues( state ) ) )
+        q.update( self.extra.toDict() )
+        return q
+    
+    def snapshot( self ):
+        """Returns an independent copy of the table."""
+        return DictQTable( self.toDict() )
+    
+    
+class ReplayBuffer( object ):
+    """Ring buffer of the transitions experienced by an AIPlayer.
+    
+    Transitions are kept in preallocated arrays of fixed width numbers,
+    states are stored as their base-3 codes, so only the states of the 3x3
+    board can be stored. Once batchSize new transitions are collected they
+    are learned in the order they came in, followed by nOfSamples
+    transitions drawn uniformly from the whole buffer.
+    
+    Attributes:
+        capacity: maximal number of transitions kept
+        batchSize: number of new transitions triggering a batch of updates
+        nOfSamples: number of older transitions replayed with every batch
+        rng: random generator used for sampling
+        size: number of transitions in the buffer
+        pending: number of transitions not learned yet
+        s1, a1, r, s2, a2, t: arrays with the codes of the first states, the
+            first actions, the rewards, the codes of the second states, the
+            second actions ( -1 in terminal states ) and the terminal flags
+    """
+    
+    def __init__( self, capacity, batchSize = 32, nOfSamples = 0, rng = None ):
+        """Constructor
+        
+        Args:
+            capacity: maximal number of transitions kept, the oldest ones
+                are overwritten
+            batchSize: number of new transitions triggering a batch of updates
+            nOfSamples: number of older transitions replayed with every batch
+            rng: random.Random used for sampling, the random module if None
+        """
+        if batchSize > capacity:
+            raise ValueError( "Batch of {} does not fit into {} transitions".format( batchSize, capacity ) )
+        self.capacity = capacity
+        self.batchSize = batchSize
+        self.nOfSamples = nOfSamples
+        self.rng = random if rng is None else rng
+        self.size = 0
+        self.pending = 0
+        self.__position = 0
+        self.s1 = array.array( 'H', [ 0 ] ) * capacity
+        self.a1 = array.array( 'b', [ 0 ] ) * capacity
+        self.r = array.array( 'd', [ 0.0 ] ) * capacity
+        self.s2 = array.array( 'H', [ 0 ] ) * capacity
+        self.a2 = array.array( 'b', [ 0 ] ) * capacity
+        self.t = array.array( 'B', [ 0 ] ) * capacity
+        
+    def __len__( self ):
+        return self.size
+        
+    def push( self, s1, a1, r, s2, a2, t ):
+        """Stores a transition, overwriting the oldest one when the buffer is full.
+        
+        Args:
+            s1: code of the first state
+            a1: action taken in the first state
+            r: reward observed after taking the action
+            s2: code of the second state
+            a2: action taken in the second state, -1 if it is terminal
+            t: flag denoting if the second state is terminal
+        
+        Returns:
+            True if a full batch of new transitions is ready
+        """
+        i = self.__position
+        self.s1[ i ] = s1
+        self.a1[ i ] = a1
+        self.r[ i ] = r
+        self.s2[ i ] = s2
+        self.a2[ i ] = a2
+        self.t[ i ] = t
+        self.__position = ( i + 1 ) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+        self.pending += 1
+        return self.pending >= self.batchSize
+        
+    def batch( self ):
+        """Returns indices of the new transitions followed by the sampled ones and marks them learned."""
+        first = self.__position - self.pending
+        indices = list( ( first + i ) % self.capacity for i in range( self.pending ) )
+        if self.nOfSamples:
+            size = self.size
+            randrange = self.rng.randrange
+            indices.extend( randrange( size ) for _ in range( self.nOfSamples ) )
+        self.pending = 0
+        return indices
+
+
 class AIPlayer( object ):
     """Represents an AI player.
     
     Attributes:
-        __q: State action pair values. Hash table storing the values
-            for all encountered state action pairs.
+        __q: State action pair values. Storage ( DictQTable, DenseQTable
+            or MappedQTable ) holding the values for all encountered state action pairs.
         __eps: The epsilon parameter for the epsilon-greedy strategy.
         debug: Flag denoting if the debug output should be printed.
         competitionMode: flag denoting if the agent should do exploratory moves
@@ -417,23 +1441,40 @@ class AIPlayer( object ):
             them.
         learningRate: learning rate as define in SARSA and Q-learning algorithms
         useSymmetry: Flag denoting if the agent is aware of symmetric states.
+        useCodes: Flag denoting if the agent keys its values on the base-3
+            codes of the states instead of the tuples of the cells ( see
+            BoardGame.returnCode ); needs a BoardGame and the DictQTable,
+            the other storages and the replay buffer expect the 3x3 boards.
+        replay: ReplayBuffer collecting the updates, which are then learned in
+            batches; updates are learned right away if None.
                        
     """
     
-    def __init__( self, eps, pretaindFile = None ):
+    def __init__( self, eps, pretaindFile = None, qTable = None ):
         """Constructor
         
         Args:
             eps: epsilon parameter for the epsilon greedy strattegy.
                 controls how may exploratory moves the agent does.
             pretrainedFile: path to file containint pretrained state action
-                values ( can be created using saveState method ).
+                values ( can be created using saveState method ). Binary brain
+                files are memory mapped unless qTable is given.
+            qTable: storage for the state action pair values, DictQTable
+                is used if None.
         """
-        if pretaindFile is None:
-            self.__q = {}
-        else:
-            with open( pretaindFile, 'rt' ) as f:
-                self.__q = pickle.load( f )
+        if qTable is None and pretaindFile is not None and MappedQTable.isBinaryBrain( pretaindFile ):
+            qTable = MappedQTable( pretaindFile )
+        elif pretaindFile is not None:
+            if qTable is None:
+                qTable = DictQTable()
+            if MappedQTable.isBinaryBrain( pretaindFile ):
+                qTable.loadDict( MappedQTable( pretaindFile ).toDict() )
+            else:
+                with open( pretaindFile, 'rb' ) as f:
+                    qTable.loadDict( pickle.load( f ) )
+        elif qTable is None:
+            qTable = DictQTable()
+        self.__q = qTable
         self.__eps = eps
         self.debug = False
         self.competitionMode = False
@@ -441,21 +1482,46 @@ class AIPlayer( object ):
         self.initialStateActionValue = 0.01
         self.learningRate = 0.2
         self.useSymmetry = True
+        self.useCodes = False
+        self.replay = None
         
-    def saveState( self, fileName ):
+    def saveState( self, fileName, binary = False ):
         """Saves the current state of state action pair values.
         
         The saved data can be used to initialise new instances
         of the agent.
+        
+        Args:
+            fileName: path of the file
+            binary: if True the values are saved in the memory mappable
+                binary brain format ( see MappedQTable ) instead of pickle
         """
-        with open( fileName, 'wt') as f:
-            pickle.dump( self.__q, f )
+        if binary:
+            MappedQTable.save( self.__q.toDict(), fileName )
+            return
+        with open( fileName, 'wb' ) as f:
+            pickle.dump( self.__q.toDict(), f, 2 )
             
     def setEps(self, eps ):
         """Sets the epsilon parameter
         """
         self.__eps = eps
         
+    def getEps( self ):
+        """Returns the epsilon parameter
+        """
+        return self.__eps
+        
+    def getQTable( self ):
+        """Returns the storage of the state action pair values
+        """
+        return self.__q
+    
+    def setQTable( self, qTable ):
+        """Replaces the storage of the state action pair values
+        """
+        self.__q = qTable
+        
     def selectAction( self, actions, values ):
         """Selects action using epsilon greedy strategy
         
@@ -464,10 +1530,35 @@ class AIPlayer( object ):
             values: Corresponding values of the actions.
         """
         
-        if ( ( random.random() < self.__eps ) and ( not self.competitionMode ) ):
+        if self.explore():
             return random.choice( actions )
         else:
             return actions[values.index( max( values ) ) ]
+            
+    def explore( self, rng = None ):
+        """Decides if the next move should be an exploratory one.
+        
+        Args:
+            rng: random.Random drawing the decision, the random module if None
+        
+        Returns:
+            True with probability eps, never in competition mode.
+        """
+        return ( ( rng or random ).random() < self.__eps ) and ( not self.competitionMode )
+        
+    def exploreMany( self, n, rng ):
+        """Decides which of the next n moves should be exploratory ones.
+        
+        Args:
+            n: number of the moves
+            rng: NumPy random generator drawing all the decisions at once
+        
+        Returns:
+            NumPy array of flags, each True with probability eps, all False in competition mode.
+        """
+        if self.competitionMode or self.__eps <= 0:
+            return numpy.zeros( n, dtype = bool )
+        return rng.random( n ) < self.__eps
     
     def initializeStateActions( self, state, possibleActions ):
         """Initializes unseen states (state, action) pairs with default values.
@@ -476,8 +1567,18 @@ class AIPlayer( object ):
             state: Unseen state.
             possibleActions: all actions, possible in the given state.         
         """
-        values = [ self.initialStateActionValue ] * len(possibleActions)
-        self.__q[ state ] = dict(zip(possibleActions, values) )
+        self.__q.initialize( state, possibleActions, self.initialStateActionValue )
+        
+    def initializeManyStateActions( self, codes, possibleMasks ):
+        """Initializes many unseen states of the 3x3 board at once with default values.
+        
+        Needs a dense storage ( see DenseQTable.initializeCodes ).
+        
+        Args:
+            codes: base-3 codes of the unseen states, each given once
+            possibleMasks: bit masks of the actions possible in the states
+        """
+        self.__q.initializeCodes( codes, possibleMasks, self.initialStateActionValue )
     
     def makeMove( self, state, possibleActions ):
         """Chooses a move, best in the given state using epsilon greedy strategy
@@ -487,15 +1588,135 @@ class AIPlayer( object ):
             possibleActions: All actions possible in the given state.
         """
         #check if state is in q already
-        state = tuple(state)
+        if not self.useCodes:
+            state = tuple(state)
         if state not in self.__q:
             #initialize q(s, a) for given state arbitrarily
             self.initializeStateActions( state, possibleActions )
             #now that the q(s, a) is initialized, proceed
-        return self.selectAction( self.__q[ state ].keys(), self.__q[ state ].values() )
+        if self.explore():
+            return random.choice( possibleActions )
+        else:
+            return self.__q.greedyAction( state )
+        
+    def actionProbabilities( self, state, possibleActions ):
+        """Returns the probabilities of the moves makeMove chooses from.
+        
+        Unlike makeMove it leaves the state action pair values untouched, an
+        unseen state gets its first possible action as the greedy one.
+        
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        
+        Returns:
+            list of pairs of an action and the probability it is chosen
+        """
+        if not self.useCodes:
+            state = tuple( state )
+        if state in self.__q:
+            greedyAction = self.__q.greedyAction( state )
+        else:
+            greedyAction = possibleActions[ 0 ]
+        return epsilonGreedy( greedyAction, possibleActions, 0 if self.competitionMode else self.__eps )
+        
+    def makeMoves( self, states, possibleActions, rng = None ):
+        """Chooses moves in many states at once using epsilon greedy strategy.
+        
+        Unseen states are initialized before any move is chosen. With NumPy
+        available and a dense storage ( one with containsCode, like the
+        DenseQTable ) they are initialized in bulk and the greedy actions of
+        all the states are found with a single array operation. With a
+        NumPy random generator all the random numbers are drawn at once,
+        with random.Random ( or the random module ) the moves are the same
+        as the ones makeMove would give if called for every state in turn
+        with the same random numbers. The exploration decisions go through
+        explore or exploreMany, so the profiler counts them.
+        
+        Args:
+            states: sequence of states ( tuples, lists or rows of a NumPy array )
+            possibleActions: for every state either the sequence of the actions
+                possible in it or, on the 3x3 board, the bit mask of the
+                possible actions ( bit i for the cell i ); a 2D NumPy array
+                is taken as rows of flags of the legal actions
+            rng: random.Random or NumPy random generator ( numpy.random.Generator )
+                used for the exploratory moves, the random module if None
+        
+        Returns:
+            list of the chosen actions
+        """
+        if rng is None:
+            rng = random
+        if getattr( possibleActions, 'ndim', 1 ) == 2:
+            possibleActions = possibleActions.dot( [ 1 << i for i in range( 9 ) ] )
+        if hasattr( possibleActions, 'tolist' ):
+            possibleActions = possibleActions.tolist()
+        q = self.__q
+        #masks of the taken cells give the empty ones
+        masks = Game.actions
+        if numpy is not None and hasattr( q, 'containsCode' ):
+            if isinstance( states, numpy.ndarray ):
+                codes = states.dot( Game.powers ).tolist()
+            else:
+                codes = [ Symmetries.codes[ tuple( state ) ] for state in states ]
+            containsCode = q.containsCode
+            newCodes = []
+            newMasks = []
+            added = set()
+            for code, actions in zip( codes, possibleActions ):
+                if code not in added and not containsCode( code ):
+                    added.add( code )
+                    newCodes.append( code )
+                    newMasks.append( actions if isinstance( actions, int ) else sum( 1 << a for a in actions ) )
+            if newCodes:
+                self.initializeManyStateActions( newCodes, newMasks )
+            #illegal actions have the value of minus infinity
+            greedy = numpy.frombuffer( q.values, dtype = numpy.float64 ).reshape( -1, 9 )[ codes ].argmax( axis = 1 ).tolist()
+        else:
+            if hasattr( states, 'tolist' ):
+                states = states.tolist()
+            states = [ tuple( state ) for state in states ]
+            for state, actions in zip( states, possibleActions ):
+                if state not in q:
+                    if isinstance( actions, int ):
+                        actions = masks[ Game.fullMask ^ actions ]
+                    self.initializeStateActions( state, tuple( actions ) )
+            greedyAction = q.greedyAction
+            greedy = [ greedyAction( state ) for state in states ]
+        if numpy is not None and isinstance( rng, numpyGenerators ):
+            moves = numpy.array( greedy, dtype = int )
+            rows = numpy.flatnonzero( self.exploreMany( len( greedy ), rng ) )
+            if len( rows ):
+                #the exploratory move is a uniformly drawn one of the legal actions
+                possible = list( possibleActions[ i ] for i in rows )
+                possible = numpy.array( list( a if isinstance( a, int ) else sum( 1 << b for b in a ) for a in possible ) )
+                legal = ( possible[ :, None ] >> numpy.arange( 9 ) ) & 1
+                picks = ( rng.random( len( rows ) ) * legal.sum( axis = 1 ) ).astype( int )
+                moves[ rows ] = ( legal.cumsum( axis = 1 ) > picks[ :, None ] ).argmax( axis = 1 )
+            return moves.tolist()
+        explore = self.explore
+        choice = rng.choice
+        return [ ( choice( masks[ Game.fullMask ^ actions ] if isinstance( actions, int ) else actions ) if explore( rng ) else g )
+                 for ( g, actions ) in zip( greedy, possibleActions ) ]
+        
+    def freeze( self ):
+        """Compiles the greedy strategy into an immutable FrozenPlayer.
+        
+        The frozen player makes the same moves as this player in competition
+        mode, but never changes.
+        """
+        return FrozenPlayer.fromQTable( self.__q, self.useSymmetry )
+        
+    def snapshot( self ):
+        """Returns an independent copy of the state action pair values."""
+        return self.__q.snapshot()
+        
+    def nOfStates( self ):
+        """Returns number of states with initialized state action pair values."""
+        return len( self.__q )
         
     def strategy( self ):
-        pprint( self.__q )
+        pprint( self.__q.toDict() )
         
     def update( self, stateUpdate ):
         """Updates state action pairs.
@@ -511,28 +1732,180 @@ class AIPlayer( object ):
         if self.debug: 
             print( "Update received: ")
             pprint( stateUpdate )
+        if self.replay is not None:
+            codes = Symmetries.codes
+            if self.replay.push( codes[ stateUpdate[ 's1' ] ], stateUpdate[ 'a1' ], stateUpdate[ 'r' ],
+                                 codes[ stateUpdate[ 's2' ] ], stateUpdate[ 'a2' ], stateUpdate[ 't' ] ):
+                self.learnReplay()
+            return
+        self.learn( stateUpdate )
+        
+    def learnReplay( self ):
+        """Learns the transitions collected in the replay buffer since the last batch
+        and the older transitions sampled from it.
+        
+        With NumPy and a dense storage ( one with containsCode ) the batch is
+        learned by vectorized updates: a state action pair appearing in the
+        batch more than once is updated once per round ( see updateRounds ),
+        so its updates are applied one after another like the scalar ones.
+        Otherwise the transitions are learned one by one in the order of the
+        batch ( see learn ).
+        """
+        replay = self.replay
+        indices = replay.batch()
+        q = self.__q
+        if numpy is not None and hasattr( q, 'containsCode' ):
+            indices = numpy.array( indices, dtype = numpy.intp )
+            s1, a1, r, s2, a2, t = ( numpy.frombuffer( column, dtype = column.typecode )[ indices ]
+                                     for column in ( replay.s1, replay.a1, replay.r, replay.s2, replay.a2, replay.t ) )
+            values = numpy.frombuffer( q.values, dtype = numpy.float64 )
+            first = s1.astype( numpy.intp ) * 9 + a1
+            second = s2.astype( numpy.intp )
+            terminal = t != 0
+            for positions in updateRounds( first ):
+                #the targets are read after the previous rounds were applied
+                pairs = first[ positions ]
+                ended = terminal[ positions ]
+                if self.sarsa:
+                    following = values[ second[ positions ] * 9 + numpy.where( ended, 0, a2[ positions ] ) ]
+                else:
+                    following = values.reshape( -1, 9 )[ second[ positions ] ].max( axis = 1 )
+                #the second state of a terminal transition has no value
+                following = numpy.where( ended, 0.0, following )
+                current = values[ pairs ]
+                reward = r[ positions ]
+                values[ pairs ] = current + numpy.where( ended, 0.1 * ( reward - current ),
+                                                         self.learningRate * ( reward + following - current ) )
+            return
+        states = Symmetries.states
+        #the same dictionary is filled in for every transition
+        record = {}
+        for i in indices:
+            record[ 's1' ] = states[ replay.s1[ i ] ]
+            record[ 'a1' ] = replay.a1[ i ]
+            record[ 'r' ] = replay.r[ i ]
+            record[ 's2' ] = states[ replay.s2[ i ] ]
+            record[ 'a2' ] = replay.a2[ i ]
+            record[ 't' ] = replay.t[ i ]
+            self.learn( record )
+        
+    def learn( self, stateUpdate ):
+        """Updates the value of the first state action pair of the update.
+        
+        Args:
+            stateUpdate: dictionary of the update ( see update )
+        """
         if not stateUpdate[ 't' ]: #if the stateUpdate is not terminal, then we care about s2,a2 reward.
             s2 = stateUpdate[ 's2' ]
             s1 = stateUpdate[ 's1' ]
             a1 = stateUpdate[ 'a1' ]
             a2 = stateUpdate[ 'a2' ]
-            currVal = self.__q[ s1 ][ a1 ]
+            currVal = self.__q.get( s1, a1 )
             if self.sarsa: #SARSA update
-                currVal = currVal + self.learningRate * ( stateUpdate[ 'r' ] + self.__q[ s2 ][ a2 ] - currVal )
+                currVal = currVal + self.learningRate * ( stateUpdate[ 'r' ] + self.__q.get( s2, a2 ) - currVal )
             else: #Q-learning update
-                tmpVal = max( self.__q[ s2 ].values() )
+                tmpVal = self.__q.maxValue( s2 )
                 currVal = currVal + self.learningRate * ( stateUpdate[ 'r' ] + tmpVal - currVal )            
-            self.__q[ s1 ][ a1 ] = currVal
+            self.__q.set( s1, a1, currVal )
         else:
             #in a terminal state we know the value for s2,a2 is zero. 
             #Therefore We only care about the transition reward.
             s1 = stateUpdate[ 's1' ]
             a1 = stateUpdate[ 'a1' ]
-            currVal = self.__q[ s1 ][ a1 ] 
+            currVal = self.__q.get( s1, a1 )
             currVal = currVal + 0.1 * ( stateUpdate[ 'r' ] - currVal )
-            self.__q[ s1 ][ a1 ] = currVal
-
-
+            self.__q.set( s1, a1, currVal )
 
+class FrozenPlayer( object ):
+    """Player using a fixed greedy strategy compiled from state action pair values.
     
+    The best action of every board of the 3x3 game is stored in a table
+    indexed by the base-3 code of the board. Actions found in the invariant
+    states are already mapped back to the board, so every move is a single
+    table lookup and the player does not need the symmetric invariants.
     
+    Attributes:
+        bestActions: tuple of the best action for every board code ( noAction
+            for full boards )
+        debug: Flag denoting if the debug output should be printed.
+        competitionMode: kept for the compatibility with the AIPlayer, the
+            player never explores nor learns
+        useSymmetry: always False, the player works with the plain boards
+    """
+    noAction = 255
+    
+    def __init__( self, bestActions ):
+        """Constructor
+        
+        Args:
+            bestActions: best action for every board code
+        """
+        self.bestActions = tuple( bestActions )
+        self.debug = False
+        self.competitionMode = True
+        self.useSymmetry = False
+        
+    @staticmethod
+    def fromQTable( qTable, useSymmetry ):
+        """Builds the table of the greedy actions of the given state action pair values.
+        
+        States missing in the storage get their first possible action, which
+        is what the AIPlayer does with a state it sees for the first time.
+        
+        Args:
+            qTable: storage of the state action pair values
+            useSymmetry: flag denoting if the values are given w.r.t. the
+                symmetric invariants of the states
+        """
+        bestActions = bytearray( [ FrozenPlayer.noAction ] ) * len( Symmetries.states )
+        for code, state in enumerate( Symmetries.states ):
+            if 0 not in state:
+                continue
+            permutation = 0
+            if useSymmetry:
+                permutation = Symmetries.canonicalPerm[ code ]
+                state = Symmetries.states[ Symmetries.canonicalCode[ code ] ]
+            if state in qTable:
+                action = qTable.greedyAction( state )
+            else:
+                action = state.index( 0 )
+            bestActions[ code ] = sharedSymmetries.inverseAction( action, permutation )
+        return FrozenPlayer( bestActions )
+        
+    @staticmethod
+    def load( fileName, useSymmetry = True ):
+        """Freezes the strategy stored in a brain file ( see AIPlayer.saveState ).
+        
+        Args:
+            fileName: path of a pickled or binary brain file
+            useSymmetry: flag denoting if the brain was trained w.r.t. the
+                symmetric invariants of the states ( see AIPlayer.useSymmetry )
+        """
+        if MappedQTable.isBinaryBrain( fileName ):
+            qTable = MappedQTable( fileName )
+        else:
+            with open( fileName, 'rb' ) as f:
+                qTable = DictQTable( pickle.load( f ) )
+        return FrozenPlayer.fromQTable( qTable, useSymmetry )
+        
+    def setEps( self, eps ):
+        """The frozen player never explores."""
+        pass
+        
+    def makeMove( self, state, possibleActions ):
+        """Returns the best move in the given state.
+        
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        return self.bestActions[ Symmetries.codes[ state ] ]
+        
+    def actionProbabilities( self, state, possibleActions ):
+        """Returns the best move in the given state with probability one."""
+        return [ ( self.bestActions[ Symmetries.codes[ state ] ], 1.0 ) ]
+        
+
+    def update( self, stateUpdate ):
+        """Frozen player does not learn."""
+        pass
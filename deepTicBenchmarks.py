@@ -0,0 +1,235 @@
+"""Throughput benchmarks for the hot paths of deepTic.
+
+Every benchmark reports operations per second. Results can be saved as JSON
+and compared against a stored baseline, the script exits with an error when
+a benchmark is slower than the baseline by more than the given threshold.
+
+    python deepTicBenchmarks.py --output bench.json
+    python deepTicBenchmarks.py --baseline bench.json --threshold 0.2
+"""
+from __future__ import division
+import argparse
+import json
+import os
+import pickle
+import random
+import sys
+import time
+import deepTic
+
+brainFile = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'brainy.brain' )
+
+def sampleStates( nOfGames = 50 ):
+    """Returns states visited in random games."""
+    rng = random.Random( 0 )
+    states = []
+    for _ in range( nOfGames ):
+        g = deepTic.Game()
+        symbol = 1
+        while not ( g.end() or g.tie() ):
+            g.setState( rng.choice( g.getAvailableActions( False ) ), symbol, False )
+            states.append( g.returnState( False ) )
+            symbol = 3 - symbol
+    return states
+
+def loadBrainy():
+    """Returns the pretrained player in competition mode."""
+    with open( brainFile, 'rb' ) as f:
+        player = deepTic.AIPlayer( 0, qTable = deepTic.DictQTable( pickle.load( f ) ) )
+    player.competitionMode = True
+    return player
+
+def benchInvariant( states ):
+    s = deepTic.Symmetries()
+    def run():
+        for state in states:
+            s.invariant( state )
+        return len( states )
+    return run
+
+def benchGameSetState( states ):
+    moves = list( ( state.index( 0 ), 1 ) for state in states if 0 in state )
+    def run():
+        g = deepTic.Game()
+        for ( pos, symbol ) in moves:
+            g.reset()
+            g.setState( pos, symbol, True )
+        return len( moves )
+    return run
+
+def benchTerminalState( states ):
+    g = deepTic.Game()
+    def run():
+        for state in states:
+            g.terminalState( state )
+        return len( states )
+    return run
+
+def benchMakeMove( states ):
+    moves = list( ( state, tuple( i for ( i, v ) in enumerate( state ) if v == 0 ) ) for state in states if 0 in state )
+    player = deepTic.AIPlayer( 0.1 )
+    def run():
+        for ( state, actions ) in moves:
+            player.makeMove( state, actions )
+        return len( moves )
+    return run
+
+def benchMakeMoves( states ):
+    moves = list( ( state, tuple( i for ( i, v ) in enumerate( state ) if v == 0 ) ) for state in states if 0 in state )
+    batchStates = list( state for ( state, _ ) in moves )
+    batchActions = list( actions for ( _, actions ) in moves )
+    player = deepTic.AIPlayer( 0.1, qTable = deepTic.DenseQTable() )
+    def run():
+        player.makeMoves( batchStates, batchActions )
+        return len( moves )
+    return run
+
+def benchFrozenMakeMove( states ):
+    moves = list( ( state, tuple( i for ( i, v ) in enumerate( state ) if v == 0 ) ) for state in states if 0 in state )
+    player = loadBrainy().freeze()
+    def run():
+        for ( state, actions ) in moves:
+            player.makeMove( state, actions )
+        return len( moves )
+    return run
+
+def benchUpdate( states ):
+    player = deepTic.AIPlayer( 0.1 )
+    moves = list( ( state, tuple( i for ( i, v ) in enumerate( state ) if v == 0 ) ) for state in states if 0 in state )
+    updates = []
+    for ( ( s1, actions1 ), ( s2, actions2 ) ) in zip( moves, moves[ 1: ] ):
+        updates.append( { 's1': s1, 'a1': player.makeMove( s1, actions1 ),
+                          's2': s2, 'a2': player.makeMove( s2, actions2 ), 'r': 0, 't': False } )
+    def run():
+        for u in updates:
+            player.update( u )
+        return len( updates )
+    return run
+
+def benchSelfPlay( _ ):
+    player = deepTic.AIPlayer( 0.1 )
+    environment = deepTic.GameEnvironment( player, player, deepTic.Game(), reuseUpdates = True )
+    def run():
+        for _ in range( 200 ):
+            environment.reset()
+            environment.play()
+        return 200
+    return run
+
+def benchSelfPlay4x4( _ ):
+    player = deepTic.AIPlayer( 0.1 )
+    environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ), reuseUpdates = True )
+    def run():
+        for _ in range( 200 ):
+            environment.reset()
+            environment.play()
+        return 200
+    return run
+
+def benchSelfPlay4x4Codes( _ ):
+    player = deepTic.AIPlayer( 0.1 )
+    player.useCodes = True
+    environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ), reuseUpdates = True )
+    def run():
+        for _ in range( 200 ):
+            environment.reset()
+            environment.play()
+        return 200
+    return run
+
+def benchVsBrainy( _ ):
+    player = deepTic.AIPlayer( 0.1 )
+    environment = deepTic.GameEnvironment( player, loadBrainy(), deepTic.Game(), reuseUpdates = True )
+    def run():
+        for _ in range( 200 ):
+            environment.reset()
+            environment.play()
+        return 200
+    return run
+
+benchmarks = (
+    ( 'Symmetries.invariant', benchInvariant ),
+    ( 'Game.setState', benchGameSetState ),
+    ( 'Game.terminalState', benchTerminalState ),
+    ( 'AIPlayer.makeMove', benchMakeMove ),
+    ( 'AIPlayer.makeMoves', benchMakeMoves ),
+    ( 'FrozenPlayer.makeMove', benchFrozenMakeMove ),
+    ( 'AIPlayer.update', benchUpdate ),
+    ( 'GameEnvironment.play self-play', benchSelfPlay ),
+    ( 'GameEnvironment.play vs brainy', benchVsBrainy ),
+    ( 'GameEnvironment.play 4x4 k=3', benchSelfPlay4x4 ),
+    ( 'GameEnvironment.play 4x4 k=3 codes', benchSelfPlay4x4Codes ) )
+
+def measure( run, minTime, repeat ):
+    """Returns the best operations per second over several repetitions.
+
+    Args:
+        run: function doing the work and returning the number of operations done
+        minTime: minimal duration of a single repetition in seconds
+        repeat: number of repetitions
+    """
+    best = 0.0
+    for _ in range( repeat ):
+        count = 0
+        start = time.time()
+        elapsed = 0.0
+        while elapsed < minTime:
+            count += run()
+            elapsed = time.time() - start
+        best = max( best, count / elapsed )
+    return best
+
+def runBenchmarks( names = None, minTime = 0.2, repeat = 3 ):
+    """Runs the benchmarks and returns a dictionary of operations per second.
+
+    Args:
+        names: names of the benchmarks to run, all of them if None
+        minTime: minimal duration of a single repetition in seconds
+        repeat: number of repetitions of every benchmark
+    """
+    random.seed( 0 )
+    states = sampleStates()
+    results = {}
+    for ( name, bench ) in benchmarks:
+        if names is None or name in names:
+            results[ name ] = measure( bench( states ), minTime, repeat )
+    return results
+
+def regressions( results, baseline, threshold ):
+    """Returns the benchmarks slower than the baseline by more than the threshold.
+
+    Args:
+        results: dictionary of operations per second
+        baseline: dictionary of operations per second to compare against
+        threshold: allowed relative slowdown, e.g. 0.2 for 20%
+    """
+    return list( name for name in sorted( results )
+                 if name in baseline and results[ name ] < baseline[ name ] * ( 1 - threshold ) )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description = 'Benchmarks of the deepTic hot paths' )
+    parser.add_argument( "--output", help = 'Path of the JSON file to save the results to' )
+    parser.add_argument( "--baseline", help = 'Path of the JSON file with the baseline results' )
+    parser.add_argument( "--threshold", type = float, default = 0.2, help = 'Allowed relative slowdown against the baseline' )
+    parser.add_argument( "--min-time", type = float, default = 0.2, help = 'Minimal duration of a repetition in seconds' )
+    parser.add_argument( "--repeat", type = int, default = 3, help = 'Number of repetitions of every benchmark' )
+    parser.add_argument( "names", nargs = '*', help = 'Benchmarks to run, all of them by default' )
+    args = parser.parse_args()
+
+    results = runBenchmarks( args.names or None, args.min_time, args.repeat )
+    baseline = {}
+    if args.baseline is not None:
+        with open( args.baseline, 'rt' ) as f:
+            baseline = json.load( f )
+    for name in sorted( results ):
+        line = "{:<32} {:>14,.0f} ops/s".format( name, results[ name ] )
+        if name in baseline:
+            line += "  ({:+.1%} vs baseline)".format( results[ name ] / baseline[ name ] - 1 )
+        print( line )
+    if args.output is not None:
+        with open( args.output, 'wt' ) as f:
+            json.dump( results, f, indent = 2, sort_keys = True )
+    slower = regressions( results, baseline, args.threshold )
+    if slower:
+        print( "Regressions: {}".format( ", ".join( slower ) ) )
+        sys.exit( 1 )
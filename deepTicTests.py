@@ -1,6 +1,35 @@
+import itertools
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
 import unittest
+import checkpoint
 import deepTic
+import deepTicBenchmarks
+import evaluator
+import experiments
+import hogwild
+import mctsPlayer
+import policyCache
+import profiler
+import resultLog
+import solver
+import sweep
 from distutils.archive_util import make_archive
+try:
+    import batchTrainer
+    import drawGraphs
+    import neuralPlayer
+except ImportError:
+    batchTrainer = None
+try:
+    from gameServerTests import TestGameServer
+except SyntaxError:
+    #asyncio needs Python 3
+    pass
 
 class TestSymmetryMethods( unittest.TestCase ):
 
@@ -21,13 +50,26 @@ class TestSymmetryMethods( unittest.TestCase ):
         for permIndex in range(len(s.allSymmetries)):
             permutedState = s.permuteState( testState, permIndex )
             r = s.invariant( permutedState )            
-            self.assertEqual( r[0], testState )            
-            
+            self.assertEqual( r[0], testState )
+
+    def testLookupTables( self ):
+        '''
+        test if the precomputed tables give the same invariants
+        and actions as computing them directly
+        '''
+        s = deepTic.Symmetries()
+        for state in itertools.product( ( 0, 1, 2 ), repeat = 9 ):
+            self.assertEqual( s.invariant( state ), s.computeInvariant( state ) )
+        for permIndex in range( len( s.allSymmetries ) ):
+            for action in range( 9 ):
+                self.assertEqual( s.permuteAction( action, permIndex ), list( s.p[ permIndex ] ).index( action ) )
+                self.assertEqual( s.inverseAction( s.permuteAction( action, permIndex ), permIndex ), action )
+
 class TestGameMethods( unittest.TestCase ):
 
     def testTerminalState( self ):
         g = deepTic.Game()
-        for x in xrange( 1, 3 ):
+        for x in range( 1, 3 ):
             #test for terminal state in the rows
             self.assertTrue( g.terminalState( ( x, x, x, 0, 0, 0, 0, 0, 0 ) ) )
             self.assertTrue( g.terminalState( ( 0, 0, 0, x, x, x, 0, 0, 0 ) ) )
@@ -56,7 +98,7 @@ class TestGameMethods( unittest.TestCase ):
         
         fullBoard = ( 2, 1, 2, 1, 2, 1, 1, 2, 1 )
         #test some other configurations of the boad being filled
-        for x in xrange(10):
+        for x in range(10):
             if x > 0:
                 state = fullBoard[:-x]+ (0,) * x
             else:
@@ -64,7 +106,7 @@ class TestGameMethods( unittest.TestCase ):
             self.assertEqual( deepTic.Game( state ).getAvailableActions( False ), tuple( range(9-x, 9, 1 ) ) )   
 
     def testSetState( self ):  
-        for x in xrange(9):
+        for x in range(9):
             g = deepTic.Game()
             g.setState( x, 1 , False )
             expectedState = [ 0, ] * 9
@@ -76,7 +118,67 @@ class TestGameMethods( unittest.TestCase ):
         self.assertTrue( g.tie() )
         g = deepTic.Game( ( 1, 1, 2, 1, 2, 1, 1, 2, 1 ) ) 
         self.assertFalse( g.tie() )
-        
+
+    def testCachedStatus( self ):
+        #the status decided in setState has to follow the board, also when a cell is overwritten
+        g = deepTic.Game( ( 1, 1, 0, 2, 2, 0, 0, 0, 0 ) )
+        self.assertFalse( g.end() )
+        g.setState( 2, 1, False )
+        self.assertTrue( g.end() )
+        self.assertFalse( g.tie() )
+        g.setState( 2, 0, False )
+        self.assertFalse( g.end() )
+        g.setState( 5, 2, False )
+        self.assertTrue( g.end() )
+        g.reset( ( 2, 1, 2, 1, 2, 1, 1, 2, 0 ) )
+        self.assertFalse( g.tie() )
+        g.setState( 8, 1, False )
+        self.assertTrue( g.tie() )
+        self.assertFalse( g.end() )
+
+    def testSymmetricState( self ):
+        #moves given w.r.t. the invariant have to agree with the plain board
+        g = deepTic.Game()
+        for ( move, symbol ) in ( ( 0, 1 ), ( 4, 2 ), ( 2, 1 ), ( 1, 2 ) ):
+            invState = g.returnState( True )
+            self.assertEqual( g.getAvailableActions( True ), tuple( i for ( i, v ) in enumerate( invState ) if v == 0 ) )
+            g.setState( move, symbol, True )
+            self.assertEqual( g.returnState( True ), deepTic.Symmetries().invariant( g.returnState( False ) )[ 0 ] )
+            self.assertEqual( g.end(), g.terminalState( g.returnState( False ) ) )
+
+    def testBoardGame( self ):
+        #the general engine has to agree with the 3x3 one
+        symmetries = deepTic.BoardSymmetries( 3 )
+        for state in deepTic.Symmetries.states[ : : 7 ]:
+            self.assertEqual( symmetries.invariant( state ), deepTic.Symmetries().invariant( state ) )
+        g = deepTic.Game()
+        b = deepTic.BoardGame()
+        for ( move, symbol ) in ( ( 0, 1 ), ( 4, 2 ), ( 2, 1 ), ( 1, 2 ), ( 3, 1 ), ( 7, 2 ) ):
+            for usingSymmetry in ( False, True ):
+                self.assertEqual( b.returnState( usingSymmetry ), g.returnState( usingSymmetry ) )
+                self.assertEqual( b.getAvailableActions( usingSymmetry ), g.getAvailableActions( usingSymmetry ) )
+            self.assertEqual( b.end(), g.end() )
+            g.setState( move, symbol, True )
+            b.setState( move, symbol, True )
+        self.assertTrue( b.end() )
+
+        #3 in a row on a 4x4 board
+        b = deepTic.BoardGame( 4, 3 )
+        self.assertEqual( len( b.lines ), 24 )
+        for ( move, symbol ) in ( ( 5, 1 ), ( 0, 2 ), ( 10, 1 ), ( 1, 2 ) ):
+            b.setState( move, symbol, False )
+        self.assertFalse( b.end() )
+        b.setState( 15, 1, False )
+        self.assertTrue( b.end() )
+        self.assertTrue( b.terminalState( b.returnState( False ) ) )
+        self.assertEqual( b.returnCode( False ), sum( v * 3 ** ( 15 - i ) for ( i, v ) in enumerate( b.returnState( False ) ) ) )
+        #the invariant does not depend on the orientation of the board
+        rotated = deepTic.BoardGame( 4, 3, b.useSymmetry.permuteState( b.returnState( False ), 3 ) )
+        self.assertTrue( rotated.end() )
+        self.assertEqual( rotated.returnState( True ), b.returnState( True ) )
+        self.assertEqual( rotated.returnCode( True ), b.returnCode( True ) )
+        self.assertRaises( ValueError, deepTic.BoardGame, 3, 4 )
+
         
         
 class TestGameEnvironment( unittest.TestCase ):
@@ -143,6 +245,60 @@ class TestGameEnvironment( unittest.TestCase ):
         self.assertEqual( p1.updatesReceived, player1ExpectedUpdates )
         self.assertEqual( p2.updatesReceived, player2ExpectedUpdates )
 
+    def testReset( self ):
+        #the same environment should be reusable for many episodes
+        p1 = TestGameEnvironment.MockPlayer( [ 4, 0, 8, 0, 2, 4, 5, 7 ] )
+        p2 = TestGameEnvironment.MockPlayer( [ 1, 7, 1, 6, 8, 3 ] )
+        gameInstance = deepTic.GameEnvironment( p1, p2, deepTic.Game(), reuseUpdates = True )
+        self.assertEqual( gameInstance.play(), 1 )
+        self.assertEqual( p1.updateCount, 3 )
+        gameInstance.reset()
+        self.assertEqual( gameInstance.play(), 0 )
+        self.assertEqual( p1.updateCount, 8 )
+        self.assertEqual( p2.updateCount, 6 )
+        #the first update of the new episode starts from the empty board
+        p3 = TestGameEnvironment.MockPlayer( [ 0, 2, 8 ] )
+        p4 = TestGameEnvironment.MockPlayer( [ 4, 1, 7 ] )
+        gameInstance.reset( p3, p4 )
+        self.assertEqual( gameInstance.play(), -1 )
+        self.assertEqual( p3.updateCount, 3 )
+        self.assertEqual( p4.updateCount, 3 )
+        self.assertTrue( p3.updatesReceived[ 0 ] is p3.updatesReceived[ -1 ] )
+
+    def testCodes( self ):
+        #a player keyed on the codes of the boards learns the same values as one keyed on the tuples
+        learned = []
+        state = random.getstate()
+        try:
+            for useCodes in ( False, True ):
+                random.seed( 6 )
+                player = deepTic.AIPlayer( 0.3 )
+                player.useCodes = useCodes
+                environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ) )
+                results = []
+                for _ in range( 50 ):
+                    environment.reset()
+                    results.append( environment.play() )
+                learned.append( ( results, player.snapshot().toDict() ) )
+        finally:
+            random.setstate( state )
+        ( results, values ), ( codeResults, codeValues ) = learned
+        self.assertEqual( codeResults, results )
+        self.assertEqual( len( codeValues ), len( values ) )
+        for board, row in values.items():
+            self.assertEqual( codeValues[ sum( v * 3 ** ( 15 - i ) for ( i, v ) in enumerate( board ) ) ], row )
+
+    def testResetToInitialState( self ):
+        #a game set up in advance is restored, not cleared to the empty board
+        p1 = TestGameEnvironment.MockPlayer( [ 1, 2, 1, 2 ] )
+        p2 = TestGameEnvironment.MockPlayer( [ 8, 8 ] )
+        game = deepTic.Game( state = ( 1, 0, 0, 0, 2, 0, 0, 0, 0 ) )
+        gameInstance = deepTic.GameEnvironment( p1, p2, game )
+        self.assertEqual( gameInstance.play(), 1 )
+        gameInstance.reset()
+        self.assertEqual( game.returnState( False ), ( 1, 0, 0, 0, 2, 0, 0, 0, 0 ) )
+        self.assertEqual( gameInstance.play(), 1 )
+
 class TestAIPlayer( unittest.TestCase ):
     
     def testUpating( self ):
@@ -158,6 +314,755 @@ class TestAIPlayer( unittest.TestCase ):
         self.assertNotEqual( aiPlayer.makeMove( s1, ( 1, 2 ) ), a1 )
         aiPlayer.update( { 's1': s1, 's2': s2, 'a1':2, 'a2':a2, 'r':-3, 't': False } )
         self.assertEqual( aiPlayer.makeMove( s1, ( 1, 2 ) ), a1 )
+
+    def testDenseQTable( self ):
+        aiPlayer = deepTic.AIPlayer( 0, qTable = deepTic.DenseQTable() )
+        s1 = ( 0, ) * 9
+        s2 = ( 1, 2, 0, 0, 0, 0, 0, 0, 0 )
+        a1 = aiPlayer.makeMove( s1, tuple( range( 9 ) ) )
+        a2 = aiPlayer.makeMove( s2, tuple( range( 2, 9 ) ) )
+        self.assertEqual( ( a1, a2 ), ( 0, 2 ) )
+        aiPlayer.update( { 's1': s1, 's2': s2, 'a1':a1, 'a2':a2 , 'r':-1, 't': False } )
+        self.assertEqual( aiPlayer.makeMove( s1, tuple( range( 9 ) ) ), 1 )
+        #the values have to match the ones of the default storage
+        dictPlayer = deepTic.AIPlayer( 0 )
+        dictPlayer.makeMove( s1, tuple( range( 9 ) ) )
+        dictPlayer.makeMove( s2, tuple( range( 2, 9 ) ) )
+        dictPlayer.update( { 's1': s1, 's2': s2, 'a1':a1, 'a2':a2 , 'r':-1, 't': False } )
+        snapshot = aiPlayer.snapshot()
+        self.assertEqual( snapshot.toDict(), dictPlayer.snapshot().toDict() )
+        self.assertEqual( deepTic.DenseQTable( snapshot.toDict() ).toDict(), snapshot.toDict() )
+        #snapshots do not change with the player
+        aiPlayer.update( { 's1': s1, 's2': s2, 'a1':1, 'a2':a2 , 'r':-1, 't': True } )
+        self.assertNotEqual( snapshot.get( s1, 1 ), aiPlayer.snapshot().get( s1, 1 ) )
+
+    def testMakeMoves( self ):
+        states = list( s for s in deepTicBenchmarks.sampleStates( 10 ) if 0 in s )
+        actions = list( tuple( i for ( i, v ) in enumerate( s ) if v == 0 ) for s in states )
+        masks = list( sum( 1 << i for i in a ) for a in actions )
+        for storage in ( deepTic.DictQTable, deepTic.DenseQTable ):
+            for eps in ( 0, 0.5 ):
+                single = deepTic.AIPlayer( eps, qTable = storage() )
+                batch = deepTic.AIPlayer( eps, qTable = storage() )
+                for player in ( single, batch ):
+                    for ( state, possibleActions ) in zip( states[ : 10 ], actions ):
+                        player.getQTable().initialize( state, possibleActions, 0.0 )
+                        player.getQTable().set( state, possibleActions[ -1 ], 1.0 )
+                #the batch gives the same moves as the single calls with the same random numbers
+                rng = random.Random( 1 )
+                state = random.getstate()
+                random.seed( 1 )
+                try:
+                    expected = list( single.makeMove( s, a ) for ( s, a ) in zip( states, actions ) )
+                finally:
+                    random.setstate( state )
+                self.assertEqual( batch.makeMoves( states, masks, rng ), expected )
+                self.assertEqual( single.snapshot().toDict(), batch.snapshot().toDict() )
+
+    @unittest.skipIf( deepTic.numpy is None, "NumPy is not available" )
+    def testVectorizedMakeMoves( self ):
+        states = list( s for s in deepTicBenchmarks.sampleStates( 10 ) if 0 in s )
+        masks = list( sum( 1 << i for i in range( 9 ) if s[ i ] == 0 ) for s in states )
+        player = deepTic.AIPlayer( 0.5, qTable = deepTic.DenseQTable() )
+        p = profiler.Profiler()
+        p.attach( players = [ player ] )
+        moves = player.makeMoves( states, masks, deepTic.numpy.random.default_rng( 1 ) )
+        self.assertTrue( all( s[ m ] == 0 for ( s, m ) in zip( states, moves ) ) )
+        #the batched moves, their exploration and the states initialized in bulk are counted
+        counters = p.snapshot()[ 'counters' ]
+        self.assertEqual( counters[ 'moves' ], len( states ) )
+        self.assertEqual( counters[ 'exploratory' ] + counters[ 'greedy' ], len( states ) )
+        self.assertTrue( 0 < counters[ 'exploratory' ] < len( states ) )
+        self.assertEqual( counters[ 'newStates' ], player.nOfStates() )
+        p.detach()
+        again = deepTic.AIPlayer( 0.5, qTable = deepTic.DenseQTable() )
+        self.assertEqual( again.makeMoves( states, masks, deepTic.numpy.random.default_rng( 1 ) ), moves )
+        self.assertEqual( again.snapshot().toDict(), player.snapshot().toDict() )
+        player.competitionMode = True
+        self.assertEqual( player.makeMoves( states, masks, deepTic.numpy.random.default_rng( 2 ) ),
+                          list( player.getQTable().greedyAction( s ) for s in states ) )
+
+    def testFreeze( self ):
+        #the frozen player has to make the moves of the player in competition mode on every board
+        brainy = deepTicBenchmarks.loadBrainy()
+        plain = deepTic.AIPlayer( 0 )
+        plain.useSymmetry = False
+        plain.competitionMode = True
+        plain.getQTable().initialize( ( 0, ) * 9, tuple( range( 9 ) ), 0.0 )
+        plain.getQTable().set( ( 0, ) * 9, 4, 1.0 )
+        for player in ( brainy, plain ):
+            frozen = player.freeze()
+            g = deepTic.Game()
+            for code in range( 0, len( deepTic.Symmetries.states ), 5 ):
+                g.reset( deepTic.Symmetries.states[ code ] )
+                if g.end() or g.tie():
+                    continue
+                before = g.returnState( False )
+                g.setState( player.makeMove( g.returnState( player.useSymmetry ), g.getAvailableActions( player.useSymmetry ) ), 1, player.useSymmetry )
+                after = g.returnState( False )
+                self.assertEqual( frozen.makeMove( before, g.getAvailableActions( False ) ),
+                                  next( i for i in range( 9 ) if before[ i ] != after[ i ] ) )
+        self.assertEqual( plain.freeze().makeMove( ( 0, ) * 9, tuple( range( 9 ) ) ), 4 )
+        self.assertEqual( deepTic.FrozenPlayer.load( deepTicBenchmarks.brainFile ).bestActions, brainy.freeze().bestActions )
+
+    def testLoadWithoutSymmetry( self ):
+        #a brain trained on the plain boards has to be frozen without the symmetric invariants
+        state = random.getstate()
+        try:
+            random.seed( 4 )
+            player = deepTic.AIPlayer( 0.3 )
+            player.useSymmetry = False
+            environment = deepTic.GameEnvironment( player, player, deepTic.Game() )
+            for _ in range( 300 ):
+                environment.reset()
+                environment.play()
+        finally:
+            random.setstate( state )
+        directory = tempfile.mkdtemp()
+        try:
+            for binary in ( False, True ):
+                fileName = os.path.join( directory, 'plain.tttb' if binary else 'plain.brain' )
+                player.saveState( fileName, binary )
+                self.assertEqual( deepTic.FrozenPlayer.load( fileName, False ).bestActions, player.freeze().bestActions )
+                self.assertNotEqual( deepTic.FrozenPlayer.load( fileName ).bestActions, player.freeze().bestActions )
+        finally:
+            shutil.rmtree( directory )
+
+    def testReplay( self ):
+        buffer = deepTic.ReplayBuffer( 4, batchSize = 3, nOfSamples = 2, rng = random.Random( 0 ) )
+        self.assertFalse( buffer.push( 0, 0, 0, 1, 1, False ) )
+        self.assertFalse( buffer.push( 1, 1, 0, 2, 2, False ) )
+        self.assertTrue( buffer.push( 2, 2, 1, 3, -1, True ) )
+        batch = buffer.batch()
+        self.assertEqual( batch[ : 3 ], [ 0, 1, 2 ] )
+        self.assertEqual( len( batch ), 5 )
+        self.assertTrue( all( 0 <= i < 3 for i in batch ) )
+        #the oldest transitions are overwritten
+        buffer.push( 3, 3, 0, 4, 4, False )
+        buffer.push( 4, 4, 0, 5, 5, False )
+        buffer.push( 5, 5, -1, 6, -1, True )
+        self.assertEqual( len( buffer ), 4 )
+        self.assertEqual( buffer.batch()[ : 3 ], [ 3, 0, 1 ] )
+        self.assertEqual( list( buffer.s1 ), [ 4, 5, 2, 3 ] )
+        self.assertEqual( list( buffer.a2 ), [ 5, -1, -1, 4 ] )
+
+        #batches of single transitions without sampling are the same as learning right away
+        state = random.getstate()
+        try:
+            values = []
+            for replay in ( None, deepTic.ReplayBuffer( 8, batchSize = 1 ) ):
+                random.seed( 3 )
+                player = deepTic.AIPlayer( 0.1 )
+                player.replay = replay
+                environment = deepTic.GameEnvironment( player, player, deepTic.Game() )
+                for _ in range( 200 ):
+                    environment.reset()
+                    environment.play()
+                values.append( player.snapshot().toDict() )
+        finally:
+            random.setstate( state )
+        self.assertEqual( values[ 0 ], values[ 1 ] )
+
+    @unittest.skipIf( deepTic.numpy is None, "NumPy is not available" )
+    def testVectorizedReplay( self ):
+        #a dense table learns a batch at once, a batch of one is the same as learning right away
+        state = random.getstate()
+        try:
+            values = []
+            for sarsa in ( True, False ):
+                for replay in ( None, deepTic.ReplayBuffer( 8, batchSize = 1 ) ):
+                    random.seed( 3 )
+                    player = deepTic.AIPlayer( 0.1, qTable = deepTic.DenseQTable() )
+                    player.sarsa = sarsa
+                    player.replay = replay
+                    environment = deepTic.GameEnvironment( player, player, deepTic.Game() )
+                    for _ in range( 200 ):
+                        environment.reset()
+                        environment.play()
+                    values.append( player.snapshot().toDict() )
+        finally:
+            random.setstate( state )
+        self.assertEqual( values[ 0 ], values[ 1 ] )
+        self.assertEqual( values[ 2 ], values[ 3 ] )
+        #a pair learned twice in one batch is updated twice one after another
+        player = deepTic.AIPlayer( 0, qTable = deepTic.DenseQTable() )
+        player.initialStateActionValue = 0.0
+        player.replay = deepTic.ReplayBuffer( 4, batchSize = 2 )
+        s1 = ( 0, ) * 9
+        s2 = ( 1, 0, 0, 0, 0, 0, 0, 0, 0 )
+        player.makeMove( s1, tuple( range( 9 ) ) )
+        for _ in range( 2 ):
+            player.update( { 's1': s1, 's2': s2, 'a1': 0, 'a2': -1, 'r': 1, 't': True } )
+        self.assertAlmostEqual( player.getQTable().get( s1, 0 ), 0.1 + 0.1 * ( 1 - 0.1 ) )
+        #large batches of self play keep the values bounded
+        state = random.getstate()
+        try:
+            random.seed( 5 )
+            player = deepTic.AIPlayer( 0.2, qTable = deepTic.DenseQTable() )
+            player.replay = deepTic.ReplayBuffer( 1024, batchSize = 256 )
+            environment = deepTic.GameEnvironment( player, player, deepTic.Game() )
+            for _ in range( 300 ):
+                environment.reset()
+                environment.play()
+        finally:
+            random.setstate( state )
+        for row in player.getQTable().toDict().values():
+            for value in row.values():
+                self.assertTrue( abs( value ) <= 1.0 )
+
+    def testBinaryBrain( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join( directory, 'test.tttb' )
+            s1 = ( 0, ) * 9
+            s2 = ( 1, 2, 0, 0, 0, 0, 0, 0, 0 )
+            trained = deepTic.AIPlayer( 0 )
+            trained.makeMove( s1, tuple( range( 9 ) ) )
+            trained.makeMove( s2, tuple( range( 2, 9 ) ) )
+            trained.update( { 's1': s1, 's2': s2, 'a1':0, 'a2':2 , 'r':-1, 't': False } )
+            trained.saveState( fileName, binary = True )
+            loaded = deepTic.AIPlayer( 0, fileName )
+            self.assertEqual( loaded.snapshot().toDict(), trained.snapshot().toDict() )
+            self.assertEqual( loaded.makeMove( s1, tuple( range( 9 ) ) ), 1 )
+            #unseen states and updates do not touch the file
+            loaded.makeMove( ( 1, 0, 0, 0, 0, 0, 0, 0, 0 ), tuple( range( 1, 9 ) ) )
+            loaded.update( { 's1': s1, 's2': s2, 'a1':1, 'a2':2 , 'r':-1, 't': True } )
+            self.assertEqual( deepTic.MappedQTable( fileName ).toDict(), trained.snapshot().toDict() )
+            self.assertEqual( len( loaded.snapshot() ), 3 )
+        finally:
+            shutil.rmtree( directory )
+
+class TestSolver( unittest.TestCase ):
+
+    def testValues( self ):
+        s = solver.solve( None )
+        #tic tac toe is a tie with perfect play
+        self.assertEqual( s.value( ( 0, ) * 9 ), 0 )
+        #X to move and win
+        self.assertEqual( s.value( ( 1, 1, 0, 2, 2, 0, 0, 0, 0 ) ), 1 )
+        #O to move, X has two threats
+        self.assertEqual( s.value( ( 1, 1, 0, 0, 1, 0, 2, 0, 2 ) ), 1 )
+        self.assertEqual( s.value( ( 1, 0, 0, 0, 2, 0, 0, 0, 1 ) ), 0 )
+        self.assertEqual( s.bestActions[ deepTic.Symmetries.codes[ ( 1, 1, 0, 2, 2, 0, 0, 0, 0 ) ] ], 2 )
         
+    def testCache( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join( directory, 'solver.cache' )
+            #a cache written without the version is stale and rebuilt
+            with open( fileName, 'wb' ) as f:
+                pickle.dump( ( {}, bytes( bytearray( 3 ) ) ), f, 2 )
+            self.assertTrue( solver.loadCache( fileName ) is None )
+            solved = solver.solve( fileName )
+            self.assertEqual( solved.value( ( 0, ) * 9 ), 0 )
+            loaded = solver.loadCache( fileName )
+            self.assertEqual( loaded.bestActions, solved.bestActions )
+            self.assertEqual( loaded.scores, solved.scores )
+            version = solver.cacheVersion
+            try:
+                solver.cacheVersion = version + 1
+                self.assertTrue( solver.loadCache( fileName ) is None )
+            finally:
+                solver.cacheVersion = version
+        finally:
+            shutil.rmtree( directory )
+
+    def testPerfectPlayer( self ):
+        perfect = solver.PerfectPlayer( solver = solver.solve( None ) )
+        self.assertEqual( deepTic.GameEnvironment( perfect, perfect, deepTic.Game() ).play(), 0 )
+        randomPlayer = deepTic.AIPlayer( 1.0 )
+        for _ in range( 50 ):
+            self.assertNotEqual( deepTic.GameEnvironment( perfect, randomPlayer, deepTic.Game() ).play(), -1 )
+            self.assertNotEqual( deepTic.GameEnvironment( randomPlayer, perfect, deepTic.Game() ).play(), 1 )
+
+class TestEvaluator( unittest.TestCase ):
+
+    def testRandomPlayers( self ):
+        #well known probabilities of the results of random games
+        result = evaluator.evaluate( solver.PerfectPlayer( 1.0 ), solver.PerfectPlayer( 1.0 ) )
+        self.assertAlmostEqual( result[ 'win' ], 0.5849206349206349 )
+        self.assertAlmostEqual( result[ 'loss' ], 0.2880952380952381 )
+        self.assertAlmostEqual( result[ 'tie' ], 0.1269841269841270 )
+
+    def testDeterministicPlayers( self ):
+        canonical = deepTicBenchmarks.loadBrainy().freeze()
+        perfect = solver.PerfectPlayer()
+        for agentFirst in ( True, False ):
+            players = ( canonical, perfect ) if agentFirst else ( perfect, canonical )
+            environment = deepTic.GameEnvironment( players[ 0 ], players[ 1 ], deepTic.Game() )
+            played = environment.play() * ( 1 if agentFirst else -1 )
+            result = evaluator.evaluate( canonical, perfect, agentFirst )
+            self.assertEqual( result[ 'score' ], played )
+            self.assertEqual( result[ 'win' ] + result[ 'tie' ] + result[ 'loss' ], 1.0 )
+
+    def testSymmetricMemo( self ):
+        player = deepTicBenchmarks.loadBrainy()
+        player.competitionMode = False
+        player.setEps( 0.3 )
+        self.assertTrue( player.useSymmetry )
+        nOfStates = player.nOfStates()
+        exact = evaluator.evaluate( player, player, symmetric = False )
+        memoized = evaluator.evaluate( player, player )
+        for outcome in exact:
+            self.assertAlmostEqual( exact[ outcome ], memoized[ outcome ] )
+        self.assertEqual( player.nOfStates(), nOfStates )
+
+class TestBenchmarks( unittest.TestCase ):
+
+    def testRegressions( self ):
+        baseline = { 'a': 100.0, 'b': 100.0 }
+        results = { 'a': 79.0, 'b': 81.0, 'c': 1.0 }
+        self.assertEqual( deepTicBenchmarks.regressions( results, baseline, 0.2 ), [ 'a' ] )
+        results = deepTicBenchmarks.runBenchmarks( [ 'Symmetries.invariant' ], minTime = 0.01, repeat = 1 )
+        self.assertEqual( list( results ), [ 'Symmetries.invariant' ] )
+        self.assertTrue( results[ 'Symmetries.invariant' ] > 0 )
+
+class TestProfiler( unittest.TestCase ):
+
+    def testCounters( self ):
+        player = deepTic.AIPlayer( 0.5 )
+        game = deepTic.Game()
+        environment = deepTic.GameEnvironment( player, player, game )
+        snapshots = []
+        p = profiler.Profiler( snapshotEvery = 5, callback = snapshots.append )
+        p.attach( environment, game, [ player ] )
+        for _ in range( 10 ):
+            environment.reset()
+            environment.play()
+        counters = p.snapshot()[ 'counters' ]
+        self.assertEqual( counters[ 'episodes' ], 10 )
+        self.assertEqual( counters[ 'moves' ], counters[ 'exploratory' ] + counters[ 'greedy' ] )
+        self.assertEqual( counters[ 'newStates' ], player.nOfStates() )
+        self.assertEqual( len( snapshots ), 2 )
+        self.assertTrue( p.timers[ 'step' ] >= p.timers[ 'setState' ] )
+        #detached objects use the original methods again
+        p.detach()
+        self.assertFalse( 'makeMove' in vars( player ) )
+        self.assertFalse( 'play' in vars( environment ) )
+
+    def testKeywordArguments( self ):
+        #the wrapped methods accept the same keyword arguments as the original ones
+        player = deepTic.AIPlayer( 1.0 )
+        p = profiler.Profiler()
+        p.attach( players = [ player ] )
+        self.assertTrue( player.explore( rng = random.Random( 1 ) ) )
+        move = player.makeMove( state = ( 0, ) * 9, possibleActions = tuple( range( 9 ) ) )
+        self.assertTrue( move in range( 9 ) )
+        expected = 1
+        if deepTic.numpy is not None:
+            rng = deepTic.numpy.random.default_rng( 1 )
+            self.assertEqual( int( player.exploreMany( 3, rng = rng ).sum() ), 3 )
+            states = ( ( 1, 0, 0, 0, 0, 0, 0, 0, 0 ), ( 1, 2, 0, 0, 0, 0, 0, 0, 0 ) )
+            masks = list( sum( 1 << i for i in range( 9 ) if s[ i ] == 0 ) for s in states )
+            moves = player.makeMoves( states, masks, rng = rng )
+            self.assertTrue( all( s[ m ] == 0 for ( s, m ) in zip( states, moves ) ) )
+            expected += len( states )
+        self.assertEqual( p.snapshot()[ 'counters' ][ 'moves' ], expected )
+
+class TestMCTSPlayer( unittest.TestCase ):
+
+    def testAgainstPerfectPlayer( self ):
+        player = mctsPlayer.MCTSPlayer( playouts = 1000, seed = 1 )
+        perfect = solver.PerfectPlayer()
+        self.assertEqual( deepTic.GameEnvironment( player, perfect, deepTic.Game() ).play(), 0 )
+        self.assertEqual( deepTic.GameEnvironment( perfect, player, deepTic.Game() ).play(), 0 )
+
+    def testTranspositions( self ):
+        player = mctsPlayer.MCTSPlayer( playouts = 200, seed = 2 )
+        state = ( 1, 0, 0, 0, 0, 0, 0, 0, 0 )
+        move = player.makeMove( state, ( 1, 2, 3, 4, 5, 6, 7, 8 ) )
+        self.assertEqual( state[ move ], 0 )
+        root = player.levels[ 1 ][ deepTic.sharedSymmetries.invariant( state )[ 0 ] ]
+        self.assertEqual( root.visits, 199 )
+        #symmetric boards share the node
+        corner = ( 0, 0, 1, 0, 0, 0, 0, 0, 0 )
+        self.assertTrue( player.levels[ 1 ][ deepTic.sharedSymmetries.invariant( corner )[ 0 ] ] is root )
+        #the subtree of the move is kept for the next one
+        state = list( state )
+        state[ move ] = 2
+        nextState = tuple( state )
+        reply = player.levels[ 2 ][ deepTic.sharedSymmetries.invariant( nextState )[ 0 ] ]
+        visits = reply.visits
+        self.assertTrue( visits > 0 )
+        player.makeMove( nextState, tuple( a for a in range( 9 ) if nextState[ a ] == 0 ) )
+        self.assertEqual( reply.visits, visits + 200 )
+        self.assertEqual( player.levels[ 1 ], {} )
+
+    def testTimeLimitAndPolicy( self ):
+        player = mctsPlayer.MCTSPlayer( playouts = None, timeLimit = 0.01, k = 3, seed = 3 )
+        game = deepTic.BoardGame( 4, 3 )
+        start = mctsPlayer.clock()
+        move = player.makeMove( game.returnState( True ), game.getAvailableActions( True ) )
+        self.assertTrue( mctsPlayer.clock() - start < 0.5 )
+        self.assertTrue( move in game.getAvailableActions( True ) )
+        guided = mctsPlayer.MCTSPlayer( playouts = 50, policy = deepTicBenchmarks.loadBrainy().freeze(), seed = 4 )
+        environment = deepTic.GameEnvironment( guided, guided, deepTic.Game() )
+        self.assertTrue( environment.play() in ( -1, 0, 1 ) )
+
+class TestResultLog( unittest.TestCase ):
+
+    def testResume( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join( directory, 'test.results' )
+            log = resultLog.ResultLog( fileName, 3 )
+            log.append( [ 1.0, 0.0, -1.0 ] )
+            log.append( [ 1.0, 1.0, 0.0 ] )
+            self.assertEqual( log.mean(), [ 1.0, 0.5, -0.5 ] )
+            self.assertRaises( ValueError, log.append, [ 1.0 ] * 4 )
+            #a row which was not written completely is dropped on resume
+            with open( fileName, 'ab' ) as f:
+                f.write( b'\0' * 5 )
+            log = resultLog.ResultLog( fileName, 3 )
+            self.assertEqual( log.nOfRows, 2 )
+            log.append( [ -1.0, -1.0, -1.0 ] )
+            self.assertEqual( list( log.totals ), [ 1.0, 0.0, -2.0 ] )
+            self.assertEqual( list( list( row ) for row in resultLog.ResultLog.rows( fileName ) ),
+                              [ [ 1.0, 0.0, -1.0 ], [ 1.0, 1.0, 0.0 ], [ -1.0, -1.0, -1.0 ] ] )
+            self.assertRaises( ValueError, resultLog.ResultLog, fileName, 4 )
+            self.assertEqual( resultLog.ResultLog( fileName, 3, resume = False ).nOfRows, 0 )
+        finally:
+            shutil.rmtree( directory )
+
+    def testShortRows( self ):
+        #the episodes an agent did not play are left out of the averages
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join( directory, 'test.results' )
+            log = resultLog.ResultLog( fileName, 4 )
+            log.append( [ 1.0, 0.0 ] )
+            log.append( [ 0.0, 1.0, -1.0 ] )
+            self.assertEqual( log.mean(), [ 0.5, 0.5, -1.0 ] )
+            self.assertEqual( list( log.counts ), [ 2, 2, 1, 0 ] )
+            log = resultLog.ResultLog( fileName, 4 )
+            self.assertEqual( log.played, [ 2, 3 ] )
+            self.assertEqual( log.mean(), [ 0.5, 0.5, -1.0 ] )
+        finally:
+            shutil.rmtree( directory )
+
+class TestCheckpoint( unittest.TestCase ):
+
+    @staticmethod
+    def train( player, nOfEpisodes ):
+        environment = deepTic.GameEnvironment( player, player, deepTic.Game() )
+        results = []
+        for _ in range( nOfEpisodes ):
+            environment.reset()
+            results.append( environment.play() )
+        return results
+
+    def testResume( self ):
+        directory = tempfile.mkdtemp()
+        state = random.getstate()
+        try:
+            path = os.path.join( directory, 'agent' )
+            random.seed( 7 )
+            reference = deepTic.AIPlayer( 0.2 )
+            TestCheckpoint.train( reference, 60 )
+            expectedResults = TestCheckpoint.train( reference, 20 )
+
+            random.seed( 7 )
+            player = deepTic.AIPlayer( 0.2 )
+            checkpointer = checkpoint.Checkpointer( player, path, compactEvery = 4 )
+            for _ in range( 6 ):
+                TestCheckpoint.train( player, 10 )
+                checkpointer.checkpoint()
+            #an interrupted write leaves a partial record behind
+            with open( path + '.log', 'ab' ) as f:
+                f.write( b'\x80\x02}q' )
+
+            restored = deepTic.AIPlayer( 0.5 )
+            checkpoint.Checkpointer( restored, path, resume = True )
+            self.assertEqual( restored.getEps(), 0.2 )
+            self.assertEqual( restored.snapshot().toDict(), player.snapshot().toDict() )
+            self.assertEqual( TestCheckpoint.train( restored, 20 ), expectedResults )
+            self.assertEqual( restored.snapshot().toDict(), reference.snapshot().toDict() )
+        finally:
+            random.setstate( state )
+            shutil.rmtree( directory )
+
+class TestPolicyCache( unittest.TestCase ):
+
+    def testBackgroundTraining( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            parameters = dict( policyCache.defaultParameters, episodes = 300 )
+            self.assertEqual( policyCache.cacheKey( parameters ), policyCache.cacheKey( dict( parameters ) ) )
+            self.assertNotEqual( policyCache.cacheKey( parameters ), policyCache.cacheKey( dict( parameters, sarsa = False ) ) )
+            self.assertTrue( policyCache.load( parameters, directory ) is None )
+            trainer = policyCache.BackgroundTrainer( parameters, directory, publishEvery = 100 )
+            trainer.start()
+            trainer.join()
+            self.assertTrue( trainer.finished() )
+            self.assertEqual( trainer.episodes, 300 )
+            self.assertEqual( len( trainer.gameResults ), 300 )
+            cached = policyCache.load( parameters, directory )
+            self.assertEqual( cached.bestActions, trainer.policy().bestActions )
+        finally:
+            shutil.rmtree( directory )
+
+    def testFailedTraining( self ):
+        #an error in the thread is raised to the caller instead of being lost
+        parameters = dict( policyCache.defaultParameters, episodes = 10 )
+        del parameters[ 'eps' ]
+        trainer = policyCache.BackgroundTrainer( parameters, tempfile.gettempdir() )
+        trainer.start()
+        trainer.join()
+        self.assertTrue( isinstance( trainer.error, KeyError ) )
+        self.assertRaises( RuntimeError, trainer.finished )
+        self.assertRaises( RuntimeError, trainer.policy )
+
+class TestHogwild( unittest.TestCase ):
+
+    def testSharedQTable( self ):
+        values = deepTicBenchmarks.loadBrainy().snapshot().toDict()
+        table = hogwild.SharedQTable( values )
+        self.assertEqual( table.toDict(), values )
+        self.assertEqual( table.snapshot().toDict(), values )
+        self.assertEqual( len( table ), len( values ) )
+        #adding a state again keeps the values another worker has learned
+        state = ( 0, ) * 9
+        table = hogwild.SharedQTable()
+        table.initialize( state, tuple( range( 9 ) ), 0.5 )
+        table.set( state, 4, 1.0 )
+        table.initialize( state, tuple( range( 9 ) ), 0.5 )
+        self.assertEqual( table.get( state, 4 ), 1.0 )
+        if deepTic.numpy is not None:
+            code = deepTic.Symmetries.codes[ state ]
+            other = deepTic.Symmetries.codes[ ( 1, 0, 0, 0, 0, 0, 0, 0, 0 ) ]
+            table.initializeCodes( [ code, other ], [ 0x1ff, 0x1fe ], 0.0 )
+            self.assertEqual( table.get( state, 4 ), 1.0 )
+            self.assertEqual( table.actionValues( deepTic.Symmetries.states[ other ] ), ( list( range( 1, 9 ) ), [ 0.0 ] * 8 ) )
+            self.assertEqual( len( table ), 2 )
+
+    def testTraining( self ):
+        parameters = dict( policyCache.defaultParameters, episodes = 400 )
+        #a single worker plays exactly like the sequential self-play
+        player, results = hogwild.train( parameters, 1, seed = 5 )
+        state = random.getstate()
+        try:
+            random.seed( 5 )
+            reference = policyCache.makePlayer( parameters, deepTic.DenseQTable() )
+            environment = deepTic.GameEnvironment( reference, reference, deepTic.Game() )
+            expected = []
+            for _ in range( 400 ):
+                environment.reset()
+                expected.append( environment.play() )
+        finally:
+            random.setstate( state )
+        self.assertEqual( results, expected )
+        self.assertEqual( player.snapshot().toDict(), reference.snapshot().toDict() )
+        #workers share the table
+        published = []
+        player, results = hogwild.train( parameters, 3, lambda p, n: published.append( n ), 100 )
+        self.assertEqual( len( results ), 400 )
+        self.assertTrue( set( results ) <= set( ( -1, 0, 1 ) ) )
+        self.assertTrue( player.nOfStates() > 0 )
+        self.assertTrue( published )
+
+    @unittest.skipIf( deepTic.numpy is None, "NumPy is not available" )
+    def testMakeMoves( self ):
+        player = deepTic.AIPlayer( 0, qTable = hogwild.SharedQTable() )
+        states = [ ( 0, ) * 9, ( 1, 0, 0, 0, 2, 0, 0, 0, 0 ) ]
+        self.assertEqual( player.makeMoves( states, [ tuple( range( 9 ) ), ( 1, 2, 3, 5, 6, 7, 8 ) ] ), [ 0, 1 ] )
+        self.assertEqual( player.nOfStates(), 2 )
+
+    def testBackgroundTraining( self ):
+        #the workers are started from the calling thread, not the training one
+        directory = tempfile.mkdtemp()
+        try:
+            parameters = dict( policyCache.defaultParameters, episodes = 200 )
+            trainer = policyCache.BackgroundTrainer( parameters, directory, publishEvery = 100, nOfWorkers = 2 )
+            trainer.start()
+            trainer.join()
+            self.assertTrue( trainer.finished() )
+            self.assertEqual( len( trainer.gameResults ), 200 )
+            self.assertTrue( policyCache.load( parameters, directory ) is not None )
+        finally:
+            shutil.rmtree( directory )
+
+class TestSweep( unittest.TestCase ):
+
+    def testCachedSweep( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            configs = sweep.grid( sarsa = [ True, False ], selfPlay = [ True ], episodes = [ 60 ], agents = [ 3 ] )
+            configs.append( dict( configs[ 0 ] ) )
+            self.assertEqual( len( set( sweep.configKey( c ) for c in configs ) ), 2 )
+            experimentSweep = sweep.Sweep( directory, nOfWorkers = 2 )
+            self.assertEqual( len( experimentSweep.pending( configs ) ), 2 )
+            curves = experimentSweep.run( configs )
+            self.assertEqual( curves[ 0 ], curves[ 2 ] )
+            self.assertEqual( experimentSweep.pending( configs ), [] )
+            #the results do not depend on the number of workers
+            other = tempfile.mkdtemp()
+            try:
+                self.assertEqual( sweep.Sweep( other, nOfWorkers = 1 ).run( configs ), curves )
+            finally:
+                shutil.rmtree( other )
+            #an agent trained alone matches the cached row
+            key = sweep.configKey( configs[ 1 ] )
+            task = ( int( key[ : 8 ], 16 ) * 3, False, 0.01, True, True, 60, 0.2, None )
+            gameResults, played = experiments.trainAgent( task )
+            self.assertEqual( played, 60 )
+            self.assertEqual( list( gameResults ), list( next( resultLog.ResultLog.rows( experimentSweep.path( configs[ 1 ], '.results' ) ) ) ) )
+        finally:
+            shutil.rmtree( directory )
+
+    def testPlateau( self ):
+        self.assertTrue( experiments.plateaued( [ 1, 0, 1, 0, 1, 0 ], 6, 2, 0.1 ) )
+        #the last two windows agree, but the curve was still rising before them
+        self.assertFalse( experiments.plateaued( [ -1, -1, 1, 1, 1, 1 ], 6, 2, 0.1 ) )
+        self.assertFalse( experiments.plateaued( [ 1, 0, 1, 0 ], 4, 2, 0.1 ) )
+        self.assertRaises( ValueError, sweep.Sweep, tempfile.gettempdir(), 1, ( 50, 2.0 ) )
+        #self-play settles on ties, the episodes after the plateau are not played
+        gameResults, played = experiments.trainAgent( ( 2, True, 0.01, True, True, 1500, 0.2, ( 100, 0.1 ) ) )
+        self.assertTrue( 300 <= played < 1500 )
+        self.assertEqual( played % 100, 0 )
+        self.assertEqual( len( gameResults ), played )
+        self.assertTrue( experiments.plateaued( gameResults, played, 100, 0.1 ) )
+        directory = tempfile.mkdtemp()
+        try:
+            config = sweep.config( selfPlay = True, episodes = 1500, agents = 2, seed = 1 )
+            experimentSweep = sweep.Sweep( directory, nOfWorkers = 1, plateau = ( 100, 0.1 ) )
+            curve = experimentSweep.run( [ config ] )[ 0 ]
+            status = experimentSweep.status( config )
+            self.assertEqual( len( status[ 'played' ] ), 2 )
+            self.assertEqual( len( curve ), max( status[ 'played' ] ) )
+            self.assertEqual( status[ 'stoppedEarly' ], sum( 1 for n in status[ 'played' ] if n < 1500 ) )
+            #the seeds follow the seed of the config and the agent index
+            _, played = experiments.trainAgent( ( 2, True, 0.01, True, True, 1500, 0.2, ( 100, 0.1 ) ) )
+            self.assertEqual( status[ 'played' ][ 0 ], played )
+            exported = os.path.join( directory, 'exported.pickle' )
+            experimentSweep.export( config, exported )
+            with open( os.path.join( directory, 'exported.json' ), 'rt' ) as f:
+                self.assertEqual( json.load( f )[ 'played' ], status[ 'played' ] )
+        finally:
+            shutil.rmtree( directory )
+
+@unittest.skipIf( batchTrainer is None, "NumPy is not available" )
+class TestBatchTrainer( unittest.TestCase ):
+
+    def testTables( self ):
+        g = deepTic.Game()
+        for code in range( 0, batchTrainer.nOfStates, 7 ):
+            state = deepTic.Symmetries.states[ code ]
+            self.assertEqual( batchTrainer.won[ code ], g.terminalState( state ) )
+            
+    def testGreedyPolicy( self ):
+        emptyBoard = ( 0, ) * 9
+        policy = batchTrainer.greedyPolicy( { emptyBoard: { 0: 0.1, 4: 0.5, 8: 0.5 } } )
+        self.assertEqual( policy[ 0 ], 4 )
+        #unseen states play their first free cell
+        self.assertEqual( policy[ deepTic.Symmetries.codes[ ( 1, 2, 0, 0, 0, 0, 0, 0, 0 ) ] ], 2 )
+        
+    def testTraining( self ):
+        trainer = batchTrainer.BatchTrainer( 20, 4, opponent = batchTrainer.greedyPolicy( {} ), eps = 0.1, seed = 3 )
+        results = trainer.train( 50 )
+        self.assertEqual( results.shape, ( 20, 50 ) )
+        self.assertTrue( set( results.ravel().tolist() ) <= set( ( -1, 0, 1 ) ) )
+        #the opponent always plays the first free cell, it should be beaten
+        self.assertTrue( results[ :, -10: ].mean() > 0.5 )
+        values = trainer.toDict( 1 )
+        self.assertTrue( ( 0, ) * 9 in values )
+        self.assertEqual( trainer.qTable( 1 ).toDict(), values )
+        player = trainer.player( 0, 1 )
+        player.competitionMode = True
+        gameInstance = deepTic.GameEnvironment( player, player, deepTic.Game() )
+        self.assertTrue( gameInstance.play() in ( -1, 0, 1 ) )
+
+    def testSharedTable( self ):
+        #updates of the same pair by games sharing a table are applied one after
+        #another, like two scalar updates towards the same target
+        opponent = batchTrainer.greedyPolicy( {} )
+        single = batchTrainer.BatchTrainer( 1, 1, opponent = opponent, eps = 0, learningRate = 0.1 )
+        shared = batchTrainer.BatchTrainer( 2, 1, opponent = opponent, eps = 0, learningRate = 0.1 )
+        single.train( 1 )
+        shared.train( 1 )
+        self.assertTrue( len( single.toDict() ) > 1 )
+        initial = single.initialStateActionValue
+        for state, row in single.toDict().items():
+            for action, value in row.items():
+                change = value - initial
+                self.assertAlmostEqual( shared.toDict()[ state ][ action ] - initial, change + ( 1 - 0.1 ) * change )
+        #the tables only hold the boards which can occur in a game
+        self.assertTrue( shared.q.shape[ 1 ] < batchTrainer.nOfStates // 20 )
+        #many games on one table, as in play.py --batch, keep the values bounded
+        trainer = batchTrainer.BatchTrainer( 250, eps = 0.2, seed = 0 )
+        trainer.train( 200 )
+        values = trainer.q[ trainer.q != -batchTrainer.np.inf ]
+        self.assertTrue( batchTrainer.np.abs( values ).max() <= 1.0 )
+
+@unittest.skipIf( batchTrainer is None, "NumPy is not available" )
+class TestNeuralPlayer( unittest.TestCase ):
+
+    def testGradient( self ):
+        #the gradient step has to reduce the error of the minibatch
+        states = list( s for s in deepTicBenchmarks.sampleStates( 5 ) if 0 in s )
+        s1 = batchTrainer.np.array( states[ : -1 ] )
+        s2 = batchTrainer.np.array( states[ 1 : ] )
+        a1 = ( s1 == 0 ).argmax( axis = 1 )
+        a2 = ( s2 == 0 ).argmax( axis = 1 )
+        r = batchTrainer.np.linspace( -1, 1, len( a1 ) )
+        t = batchTrainer.np.arange( len( a1 ) ) % 3 == 0
+        for hidden in ( None, 16 ):
+            for sarsa in ( True, False ):
+                player = neuralPlayer.NeuralPlayer( 0.1, hidden = hidden, learningRate = 0.01, seed = 0 )
+                player.sarsa = sarsa
+                target = player.targets( r, s2, a2, t )
+                before = player.train( s1, a1, r, s2, a2, t )
+                values = player.values( s1 )[ batchTrainer.np.arange( len( a1 ) ), a1 ]
+                self.assertTrue( ( ( values - target ) ** 2 ).mean() < before )
+
+    def testPlay( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            player = neuralPlayer.NeuralPlayer( 0.2, nOfCells = 16, hidden = 8, batchSize = 4, seed = 1 )
+            environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ), reuseUpdates = True )
+            for _ in range( 20 ):
+                environment.reset()
+                self.assertTrue( environment.play() in ( -1, 0, 1 ) )
+            board = batchTrainer.np.zeros( ( 3, 16 ), dtype = int )
+            board[ 1, 5 ] = 1
+            moves = player.makeMoves( board, board == 0 )
+            self.assertTrue( all( board[ i, m ] == 0 for ( i, m ) in enumerate( moves ) ) )
+            fileName = os.path.join( directory, 'player.npz' )
+            player.saveState( fileName )
+            loaded = neuralPlayer.NeuralPlayer.load( fileName )
+            self.assertTrue( batchTrainer.np.allclose( loaded.values( board ), player.values( board ) ) )
+        finally:
+            shutil.rmtree( directory )
+
+@unittest.skipIf( batchTrainer is None, "NumPy is not available" )
+class TestDrawGraphs( unittest.TestCase ):
+
+    def testReduceCurve( self ):
+        values = list( random.Random( 3 ).choice( ( -1.0, 0.0, 1.0 ) ) for _ in range( 1000 ) )
+        episodes, means, lows, highs = drawGraphs.reduceCurve( values, 30, 7, chunkSize = 64 )
+        rolling = list( sum( values[ max( 0, i - 6 ) : i + 1 ] ) / min( i + 1, 7 ) for i in range( 1000 ) )
+        edges = list( 1000 * i // 30 for i in range( 31 ) )
+        for point in range( 30 ):
+            run = rolling[ edges[ point ] : edges[ point + 1 ] ]
+            self.assertAlmostEqual( means[ point ], sum( run ) / len( run ) )
+            self.assertAlmostEqual( lows[ point ], min( run ) )
+            self.assertAlmostEqual( highs[ point ], max( run ) )
+        self.assertEqual( len( drawGraphs.reduceCurve( values[ : 10 ], 30 )[ 1 ] ), 10 )
+
+    def testReducedCurve( self ):
+        directory = tempfile.mkdtemp()
+        try:
+            values = list( i / 100.0 for i in range( 500 ) )
+            #text mode pickle written on Windows
+            with open( os.path.join( directory, 'test.pickle' ), 'wb' ) as f:
+                f.write( pickle.dumps( values, 0 ).replace( b'\n', b'\r\n' ) )
+            reduced = drawGraphs.reducedCurve( 'test', 50, 1, directory )
+            self.assertEqual( list( drawGraphs.openCurve( 'test', directory ) ), values )
+            self.assertTrue( os.path.exists( os.path.join( directory, 'reduced', 'test.50.1.npz' ) ) )
+            for cached, computed in zip( drawGraphs.reducedCurve( 'test', 50, 1, directory ), reduced ):
+                self.assertEqual( list( cached ), list( computed ) )
+            self.assertAlmostEqual( reduced[ 1 ][ 0 ], 0.045 )
+        finally:
+            shutil.rmtree( directory )
+
 if __name__ == '__main__':
     unittest.main()
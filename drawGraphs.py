@@ -1,60 +1,161 @@
+"""Draws the learning curves of the experiments into graphs/.
+
+The curves are read from curve files ( see resultLog.writeCurve ) through
+a memory map, one slice at a time, so a curve of millions of episodes is
+never loaded whole. A curve still stored only as a pickle is converted to
+a curve file the first time it is drawn. Every curve is reduced to a fixed
+number of points, one per pixel of the plot: the rolling mean of the
+episodes is averaged over the episodes of the pixel, together with its
+minimum and maximum, which are drawn as a band around the line. Reduced
+curves are cached in expResults/reduced and recomputed only when the
+curve file changes. The graphs are rendered without a display.
+
+    python drawGraphs.py
+"""
+from __future__ import division
+import os
 import pickle
-import matplotlib.pyplot as plt
-
-with open('expResults/sarsa1.pickle', 'rt') as f:
-    sarsa = pickle.load( f )
-
-with open('expResults/Q1.pickle', 'rt') as f:
-    q = pickle.load( f )
-
-with open('expResults/sarsa01.pickle', 'rt') as f:
-    sarsa01 = pickle.load( f )
-with open('expResults/Q01.pickle', 'rt') as f:
-    q01 = pickle.load( f )
-
-f, axarr = plt.subplots( 2 )
-l = 5000
-axarr[0].plot(range(l), sarsa[:l], color='r', label="SARSA")
-axarr[0].plot(range(l), q[:l], color='g', label="Q-learning")
-axarr[0].set_title("Optimistic intial state action values ( 1.0 )")
-axarr[0].set_ylabel("Average reward")
-axarr[0].set_xlabel("Number of episodes experienced")
-axarr[1].plot(range(l), sarsa01[:l], color='r', label="SARSA")
-axarr[1].plot(range(l), q01[:l], color='g', label="Q-learning")
-axarr[1].set_title("Optimistic intial state action values ( 0.01 )")
-axarr[1].set_ylabel("Average reward")
-axarr[1].set_xlabel("Number of episodes experienced")
-axarr[0].legend( loc='best' )
-axarr[1].legend( loc='best' )
-plt.tight_layout()
-plt.savefig('graphs/SARSAvsQ.png')
-plt.show()
-
-with open('expResults/sarsa01.pickle', 'rt') as f:
-    symmetric = pickle.load( f )
-
-with open('expResults/noSymmetry.pickle', 'rt') as f:
-    noSymmetry = pickle.load( f )
-
-with open('expResults/Q01.pickle', 'rt') as f:
-    Qsymmetric = pickle.load( f )
-
-with open('expResults/QnoSymmetry.pickle', 'rt') as f:
-    QnoSymmetry = pickle.load( f )
-
-f, axarr = plt.subplots( 2 )
-axarr[0].plot(range(l), symmetric[:l], color='r', label="With symmetry")
-axarr[0].plot(range(l), noSymmetry[:l], color='g', label="Without symmetry")
-axarr[0].set_title("Effect of symmetry (SARSA algorithm)")
-axarr[0].set_ylabel("Average reward")
-axarr[0].set_xlabel("Number of episodes experienced")
-axarr[1].plot(range(l), Qsymmetric[:l], color='r', label="With symmetry")
-axarr[1].plot(range(l), QnoSymmetry[:l], color='g', label="Without symmetry")
-axarr[1].set_title("Effect of symmetry (Q algorithm)")
-axarr[1].set_ylabel("Average reward")
-axarr[1].set_xlabel("Number of episodes experienced")
-axarr[0].legend( loc='best' )
-axarr[1].legend( loc='best' )
-plt.tight_layout()
-plt.savefig('graphs/Symmetry.png')
-plt.show()
+import numpy as np
+import resultLog
+
+resultsDirectory = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'expResults' )
+graphsDirectory = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'graphs' )
+#number of points of a reduced curve, about the width of a plot in pixels
+nOfPixels = 1000
+
+
+def loadPickle( fileName ):
+    """Returns the curve stored in a pickle, also the ones written in text mode on Windows."""
+    with open( fileName, 'rb' ) as f:
+        data = f.read()
+    if not data.startswith( b'\x80' ):
+        #protocol 0 pickles are text, their line endings may have been translated
+        data = data.replace( b'\r\n', b'\n' )
+    return pickle.loads( data )
+
+def openCurve( name, directory = resultsDirectory ):
+    """Returns memory map of the curve with the given name.
+
+    The curve file is created from the pickle of the same name if it does
+    not exist or is older than the pickle.
+
+    Args:
+        name: name of the experiment, e.g. sarsa01
+        directory: directory of the results
+    """
+    curveFile = os.path.join( directory, name + '.curve' )
+    pickleFile = os.path.join( directory, name + '.pickle' )
+    if os.path.exists( pickleFile ) and ( not os.path.exists( curveFile ) or
+                                          os.path.getmtime( curveFile ) < os.path.getmtime( pickleFile ) ):
+        resultLog.writeCurve( curveFile, loadPickle( pickleFile ) )
+    return np.memmap( curveFile, dtype = '<f8', mode = 'r' )
+
+def reduceCurve( values, nOfPoints = nOfPixels, window = None, chunkSize = 1 << 20 ):
+    """Reduces a curve to a fixed number of points.
+
+    The rolling mean over the window of the preceding episodes ( fewer at
+    the start of the curve ) is split into nOfPoints runs of consecutive
+    episodes, every run is reduced to its mean, minimum and maximum. The
+    curve is processed in chunks, so it can be a memory map of any size.
+
+    Args:
+        values: the curve, sequence of the results of the episodes
+        nOfPoints: number of points of the reduced curve, at most the length of the curve
+        window: number of episodes of the rolling mean, the length of a run if None
+        chunkSize: number of episodes processed at once
+
+    Returns:
+        tuple of arrays of the middle episode, the mean, the minimum and the maximum of every run
+    """
+    n = len( values )
+    nOfPoints = min( nOfPoints, n )
+    edges = np.linspace( 0, n, nOfPoints + 1 ).astype( np.int64 )
+    if window is None:
+        window = max( 1, n // max( nOfPoints, 1 ) )
+    sums = np.zeros( nOfPoints )
+    lows = np.full( nOfPoints, np.inf )
+    highs = np.full( nOfPoints, -np.inf )
+    #sums of the values up to the last window episodes before the chunk
+    history = np.zeros( window )
+    for start in range( 0, n, chunkSize ):
+        stop = min( start + chunkSize, n )
+        chunk = np.asarray( values[ start : stop ], dtype = float )
+        totals = np.concatenate( ( history, history[ -1 ] + np.cumsum( chunk ) ) )
+        counts = np.minimum( np.arange( start + 1, stop + 1 ), window )
+        rolling = ( totals[ window : ] - totals[ : -window ] ) / counts
+        history = totals[ -window : ]
+        #runs overlapping the chunk and their starts within it
+        first = np.searchsorted( edges, start, 'right' ) - 1
+        last = np.searchsorted( edges, stop, 'left' )
+        starts = np.clip( edges[ first : last ], start, stop ) - start
+        runs = np.arange( first, last )
+        np.add.at( sums, runs, np.add.reduceat( rolling, starts ) )
+        np.minimum.at( lows, runs, np.minimum.reduceat( rolling, starts ) )
+        np.maximum.at( highs, runs, np.maximum.reduceat( rolling, starts ) )
+    return ( edges[ : -1 ] + edges[ 1 : ] ) / 2, sums / np.diff( edges ), lows, highs
+
+def reducedCurve( name, nOfPoints = nOfPixels, window = None, directory = resultsDirectory ):
+    """Returns the reduced curve of an experiment, computing it only if it is not cached.
+
+    Args:
+        name: name of the experiment
+        nOfPoints: number of points of the reduced curve
+        window: number of episodes of the rolling mean ( see reduceCurve )
+        directory: directory of the results, the cache is its subdirectory reduced
+
+    Returns:
+        tuple of arrays of the episodes, the means, the minima and the maxima ( see reduceCurve )
+    """
+    values = openCurve( name, directory )
+    cacheDirectory = os.path.join( directory, 'reduced' )
+    cacheFile = os.path.join( cacheDirectory, "{}.{}.{}.npz".format( name, nOfPoints, window or 'auto' ) )
+    source = np.array( [ len( values ), os.path.getmtime( values.filename ) ] )
+    if os.path.exists( cacheFile ):
+        cached = np.load( cacheFile )
+        if np.array_equal( cached[ 'source' ], source ):
+            return cached[ 'episodes' ], cached[ 'means' ], cached[ 'lows' ], cached[ 'highs' ]
+    episodes, means, lows, highs = reduceCurve( values, nOfPoints, window )
+    if not os.path.isdir( cacheDirectory ):
+        os.makedirs( cacheDirectory )
+    np.savez( cacheFile, source = source, episodes = episodes, means = means, lows = lows, highs = highs )
+    return episodes, means, lows, highs
+
+def drawGraph( fileName, panels, curves ):
+    """Draws a figure of panels of learning curves and saves it.
+
+    Args:
+        fileName: path of the image
+        panels: list of the panels, tuples of the title and of a list of
+            the curves, tuples of the experiment name, the color and the label
+        curves: dictionary of the reduced curves of the experiments
+    """
+    import matplotlib
+    matplotlib.use( 'Agg' )
+    import matplotlib.pyplot as plt
+    figure, axarr = plt.subplots( len( panels ) )
+    for axis, ( title, lines ) in zip( axarr, panels ):
+        for name, color, label in lines:
+            episodes, means, lows, highs = curves[ name ]
+            axis.fill_between( episodes, lows, highs, color = color, alpha = 0.2, linewidth = 0 )
+            axis.plot( episodes, means, color = color, label = label )
+        axis.set_title( title )
+        axis.set_ylabel( "Average reward" )
+        axis.set_xlabel( "Number of episodes experienced" )
+        axis.legend( loc = 'best' )
+    figure.tight_layout()
+    figure.savefig( fileName )
+    plt.close( figure )
+
+if __name__ == "__main__":
+    graphs = [
+        ( 'SARSAvsQ.png', [
+            ( "Optimistic intial state action values ( 1.0 )", [ ( 'sarsa1', 'r', "SARSA" ), ( 'Q1', 'g', "Q-learning" ) ] ),
+            ( "Optimistic intial state action values ( 0.01 )", [ ( 'sarsa01', 'r', "SARSA" ), ( 'Q01', 'g', "Q-learning" ) ] ) ] ),
+        ( 'Symmetry.png', [
+            ( "Effect of symmetry (SARSA algorithm)", [ ( 'sarsa01', 'r', "With symmetry" ), ( 'noSymmetry', 'g', "Without symmetry" ) ] ),
+            ( "Effect of symmetry (Q algorithm)", [ ( 'Q01', 'r', "With symmetry" ), ( 'QnoSymmetry', 'g', "Without symmetry" ) ] ) ] ) ]
+    #every curve is reduced once, even if it is drawn in several graphs
+    names = set( name for _, panels in graphs for _, lines in panels for name, _, _ in lines )
+    curves = dict( ( name, reducedCurve( name ) ) for name in names )
+    for fileName, panels in graphs:
+        drawGraph( os.path.join( graphsDirectory, fileName ), panels, curves )
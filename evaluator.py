@@ -0,0 +1,112 @@
+"""Exact expected result of a player against a fixed opponent.
+
+Instead of sampling games, the game tree is traversed once, every move
+weighted by the probability the player making it chooses it ( see the
+actionProbabilities methods of the players ), so the exploration of both
+players is taken into account exactly. The outcomes of the boards are
+memoized, keyed by the invariant of the board ( Symmetries ) when both
+players act alike in all the symmetric boards, which makes an evaluation
+cheap enough to be run during the training:
+
+    opponent = experiments.loadCanonicalPlayer()
+    scores = []
+    policyCache.train( parameters, lambda player, episode: scores.append( evaluator.evaluate( player, opponent )[ 'score' ] ), 1000 )
+
+    python evaluator.py --brain brainy.brain --opponent-eps 0.1
+"""
+from __future__ import division
+import argparse
+import deepTic
+
+symmetries = deepTic.sharedSymmetries
+
+
+def moves( player, code ):
+    """Returns the probabilities of the moves of the player in the board with the given code.
+
+    The player gets the board and the actions the way the GameEnvironment
+    gives them, w.r.t. the invariant of the board if it uses the symmetry.
+
+    Returns:
+        list of pairs of a cell of the board and the probability it is taken
+    """
+    permutation = 0
+    if player.useSymmetry:
+        permutation = deepTic.Symmetries.canonicalPerm[ code ]
+        code = deepTic.Symmetries.canonicalCode[ code ]
+    state = deepTic.Symmetries.states[ code ]
+    possibleActions = tuple( a for a in range( 9 ) if state[ a ] == 0 )
+    return list( ( symmetries.inverseAction( a, permutation ), p )
+                 for ( a, p ) in player.actionProbabilities( state, possibleActions ) )
+
+def evaluate( agent, opponent, agentFirst = True, symmetric = None ):
+    """Returns the exact probabilities of the results of a game of the agent against the opponent.
+
+    Both players keep their settings, so an agent which should not explore
+    has to be put into the competition mode or get zero eps first. The
+    players are only asked for the probabilities of their moves, their
+    state action pair values are not changed.
+
+    Args:
+        agent: the evaluated player
+        opponent: the fixed opponent
+        agentFirst: True if the agent plays X ( moves first ) like in the experiments
+        symmetric: flag denoting if the boards can be memoized by their
+            invariants, True if both players use the symmetry when None
+
+    Returns:
+        dictionary of the probabilities of a win, a tie and a loss of the
+        agent and of the expected result ( score, 1 for a win, -1 for a loss )
+    """
+    if symmetric is None:
+        symmetric = agent.useSymmetry and opponent.useSymmetry
+    players = ( agent, opponent ) if agentFirst else ( opponent, agent )
+    canonicalCode = deepTic.Symmetries.canonicalCode
+    winning = deepTic.Game.winning
+    powers = deepTic.Game.powers
+    memo = {}
+
+    def outcome( code, movers, others, symbol ):
+        """Returns probabilities of a win and a loss of the player to move.
+
+        Args:
+            code: base-3 code of the board
+            movers: mask of the cells of the player to move
+            others: mask of the cells of the other player
+            symbol: symbol of the player to move
+        """
+        key = canonicalCode[ code ] if symmetric else code
+        if key in memo:
+            return memo[ key ]
+        win = 0.0
+        loss = 0.0
+        for action, p in moves( players[ symbol - 1 ], code ):
+            mask = movers | ( 1 << action )
+            if winning[ mask ]:
+                win += p
+            elif mask | others != 0x1ff:
+                childWin, childLoss = outcome( code + symbol * powers[ action ], others, mask, 3 - symbol )
+                win += p * childLoss
+                loss += p * childWin
+        memo[ key ] = ( win, loss )
+        return win, loss
+
+    win, loss = outcome( 0, 0, 0, 1 )
+    if not agentFirst:
+        win, loss = loss, win
+    return { 'win': win, 'tie': max( 0.0, 1.0 - win - loss ), 'loss': loss, 'score': win - loss }
+
+
+if __name__ == "__main__":
+    import solver
+    parser = argparse.ArgumentParser( description = 'Exact expected results of a trained policy' )
+    parser.add_argument( "--brain", default = 'brainy.brain', help = 'Path to the evaluated policy' )
+    parser.add_argument( "--no-symmetry", action = 'store_true', help = 'The policy was trained without the symmetric invariants of the states' )
+    parser.add_argument( "--opponent-eps", type = float, default = 0.0, help = 'Probability of random moves of the perfect opponent' )
+    args = parser.parse_args()
+    agent = deepTic.FrozenPlayer.load( args.brain, not args.no_symmetry )
+    opponent = solver.PerfectPlayer( args.opponent_eps )
+    for agentFirst in ( True, False ):
+        result = evaluate( agent, opponent, agentFirst )
+        print( "{} vs perfect player: win {win:.4f} tie {tie:.4f} loss {loss:.4f} score {score:+.4f}".format(
+            'X' if agentFirst else 'O', **result ) )
@@ -1,42 +1,173 @@
 from __future__ import division
 import deepTic
+import array
+import multiprocessing
+import os
 import pickle
 import random
+import resultLog
 
-def experiment(sarsa, defVal, outputFileName, selfPlay, symmetry ):
-    print outputFileName
-    canonicalPlayer = deepTic.AIPlayer( 0, "brainy.brain" )
-    canonicalPlayer.competitionMode = True
-    canonicalPlayer.useSymmetry = True
+#frozen pretrained opponent, loaded once and inherited by the worker processes
+canonicalPlayer = None
+
+def loadCanonicalPlayer():
+    """Returns the pretrained opponent, loading it on the first call."""
+    global canonicalPlayer
+    if canonicalPlayer is None:
+        canonicalPlayer = deepTic.FrozenPlayer.load( "brainy.brain" )
+    return canonicalPlayer
+
+def plateaued( gameResults, episode, window, tolerance ):
+    """Returns True if the learning curve stopped improving before the episode.
+    
+    The curve is taken as plateaued when the average results of the last
+    three windows of episodes differ from each other by less than the
+    tolerance, so a single pair of close averages in a noisy curve does
+    not end the training.
+    
+    Args:
+        gameResults: results of the episodes played so far
+        episode: number of the episodes played
+        window: number of episodes averaged
+        tolerance: largest change of the averages counted as a plateau,
+            between 0 and 2 ( the results are from -1 to 1 )
+    """
+    if episode < 3 * window:
+        return False
+    sums = list( sum( gameResults[ end - window : end ] ) for end in ( episode - 2 * window, episode - window, episode ) )
+    return max( sums ) - min( sums ) < tolerance * window
+
+def trainAgent( task ):
+    """Trains a single agent, runs in a worker process.
+    
+    The random generator is seeded for every agent, so the results do not
+    depend on which worker trains the agent. With the plateau set the curve
+    is checked every window episodes and once it stops improving the
+    training ends, the results of the episodes not played are left out.
+    
+    Args:
+        task: tuple of the seed, sarsa, defVal, selfPlay, symmetry, nOfEpisodes,
+            learningRate and plateau ( tuple of the window and the tolerance
+            of plateaued or None )
+    
+    Returns:
+        tuple of the results of the episodes played and their number
+    """
+    ( seed, sarsa, defVal, selfPlay, symmetry, nOfEpisodes, learningRate, plateau ) = task
+    random.seed( seed )
+    trainee = deepTic.AIPlayer( 0.1 )
+    trainee.sarsa = sarsa
+    trainee.initialStateActionValue = defVal
+    trainee.useSymmetry = symmetry
+    trainee.learningRate = learningRate
+    if selfPlay:
+        opponent = trainee
+    else:
+        opponent = loadCanonicalPlayer()
+    environment = deepTic.GameEnvironment( trainee, opponent, deepTic.Game(), reuseUpdates = True )
+    gameResults = array.array( 'd', [ 0.0 ] ) * nOfEpisodes 
+    for episodeNumber in range( nOfEpisodes):
+        if plateau is not None and episodeNumber % plateau[ 0 ] == 0 and plateaued( gameResults, episodeNumber, *plateau ):
+            del gameResults[ episodeNumber : ]
+            return gameResults, episodeNumber
+        trainee.setEps( 0.2 * ( 1 - episodeNumber / float(nOfEpisodes ) ) )
+        environment.reset()
+        gresult = environment.play()
+        gameResults[ episodeNumber ] = gresult
+    return gameResults, nOfEpisodes
+
+def parallelExperiment( sarsa, defVal, selfPlay, symmetry, nOfEpisodes, nOfAgentIterations, nOfWorkers, log ):
+    """Trains the agents on a pool of worker processes, playing one game at a time.
+    
+    Each agent gets a seed derived from the global random generator and its
+    index. Results are appended to the log in the order of the agents, so they
+    are the same for any number of workers. Agents already in the log are skipped.
+    
+    Returns:
+        average result of every episode over all the agents
+    """
+    baseSeed = random.getrandbits( 32 )
+    tasks = list( ( baseSeed * nOfAgentIterations + agentIndex, sarsa, defVal, selfPlay, symmetry, nOfEpisodes, 0.2, None )
+                  for agentIndex in range( log.nOfRows, nOfAgentIterations ) )
+    if not tasks:
+        return log.mean()
+    if not selfPlay:
+        loadCanonicalPlayer()
+    if nOfWorkers > 1:
+        pool = multiprocessing.Pool( nOfWorkers )
+        allResults = pool.imap( trainAgent, tasks )
+    else:
+        pool = None
+        allResults = ( trainAgent( task ) for task in tasks )
+    for gameResults, _ in allResults:
+        if log.nOfRows % 10 == 0: 
+            print( "{:.0%} done".format( log.nOfRows / nOfAgentIterations ) )  
+        log.append( gameResults )
+    if pool is not None:
+        pool.close()
+        pool.join()
+    return log.mean()
+
+def batchedExperiment( sarsa, defVal, selfPlay, symmetry, nOfEpisodes, nOfAgentIterations, log ):
+    """Trains all the agents at once, playing their games in lockstep.
     
+    Needs NumPy. Every agent gets its own table, the opponent is the
+    greedy policy of the pretrained player. The results of all the agents
+    are appended to the log at the end.
+    
+    Returns:
+        average result of every episode over all the agents
+    """
+    import batchTrainer
+    if selfPlay:
+        canonicalPolicy = None
+    else:
+        with open( "brainy.brain", 'rb' ) as f:
+            canonicalPolicy = batchTrainer.greedyPolicy( pickle.load( f ) )
+    trainer = batchTrainer.BatchTrainer( nOfAgentIterations, nOfAgentIterations, opponent = canonicalPolicy,
+        eps = lambda episodes: 0.2 * ( 1 - episodes / float( nOfEpisodes ) ),
+        sarsa = sarsa, initialStateActionValue = defVal, useSymmetry = symmetry,
+        seed = random.randint( 0, 2 ** 31 - 1 ) )
+    for gameResults in trainer.train( nOfEpisodes ):
+        log.append( gameResults.astype( float ) )
+    return log.mean()
+
+def experiment(sarsa, defVal, outputFileName, selfPlay, symmetry, batched = False, nOfWorkers = None, resume = True ):
+    """Trains agents and saves their average learning curve.
+    
+    Results of every agent are streamed to a result log next to the output
+    file ( same name with the .results extension ). With resume set, agents
+    already in the log are not trained again.
+    """
+    print( outputFileName )
     nOfEpisodes = 5000
     nOfAgentIterations = 200
-    totalResults = [0.0] * nOfEpisodes
-    for agentIndex in xrange( nOfAgentIterations ):        
-        if agentIndex % 10 == 0: 
-            print( "{:.0%} done".format( agentIndex / nOfAgentIterations ) )  
-        trainee = deepTic.AIPlayer( 0.1 )
-        trainee.sarsa = sarsa
-        trainee.initialStateActionValue = defVal
-        trainee.useSymmetry = symmetry
-        if selfPlay:
-            canonicalPlayer = trainee
-        gameResults = [ 0.0 ] * nOfEpisodes 
-        for episodeNumber in xrange( nOfEpisodes):
-            trainee.setEps( 0.2 * ( 1 - episodeNumber / float(nOfEpisodes ) ) )
-            gresult = deepTic.GameEnvironment( trainee, canonicalPlayer, deepTic.Game() ).play()
-            gameResults[ episodeNumber ] = gresult
-        totalResults = list( a + b for ( a, b ) in zip( totalResults, gameResults ) )
-    totalResults = list( x / float( nOfAgentIterations ) for x in totalResults )
-    with open( outputFileName, 'wt' ) as f:
-        pickle.dump( totalResults, f )
-
-random.seed( 42 );
-
-
-experiment( sarsa = True, defVal = 0.01, outputFileName = 'expResults/noSymmetry.pickle', selfPlay=False, symmetry = False)
-experiment( sarsa = False, defVal = 0.01, outputFileName = 'expResults/QnoSymmetry.pickle', selfPlay=False, symmetry = False)
-experiment( sarsa = True, defVal = 0.01, outputFileName = 'expResults/sarsa01.pickle', selfPlay=False, symmetry = True)
-experiment( sarsa = True, defVal = 1.0,  outputFileName = 'expResults/sarsa1.pickle', selfPlay=False, symmetry = True )
-experiment( sarsa = False, defVal = 0.01, outputFileName = 'expResults/Q01.pickle', selfPlay=False, symmetry = True )
-experiment( sarsa = False, defVal = 1.0, outputFileName = 'expResults/Q1.pickle', selfPlay=False, symmetry = True )
+    logFileName = os.path.splitext( outputFileName )[ 0 ] + '.results'
+    if batched:
+        log = resultLog.ResultLog( logFileName, nOfEpisodes, resume = False )
+        totalResults = batchedExperiment( sarsa, defVal, selfPlay, symmetry, nOfEpisodes, nOfAgentIterations, log )
+    else:
+        log = resultLog.ResultLog( logFileName, nOfEpisodes, resume )
+        if nOfWorkers is None:
+            nOfWorkers = multiprocessing.cpu_count()
+        totalResults = parallelExperiment( sarsa, defVal, selfPlay, symmetry, nOfEpisodes, nOfAgentIterations, nOfWorkers, log )
+    with open( outputFileName, 'wb' ) as f:
+        pickle.dump( totalResults, f, 2 )
+
+if __name__ == '__main__':
+    import sweep
+    #the configs behind the graphs, already trained ones are loaded from the sweep cache;
+    #the seeds of the agents follow random.seed( 42 ) and the agent index as before
+    random.seed( 42 )
+    figures = [
+        ( 'expResults/noSymmetry.pickle', sweep.config( sarsa = True, defVal = 0.01, symmetry = False, seed = random.getrandbits( 32 ) ) ),
+        ( 'expResults/QnoSymmetry.pickle', sweep.config( sarsa = False, defVal = 0.01, symmetry = False, seed = random.getrandbits( 32 ) ) ),
+        ( 'expResults/sarsa01.pickle', sweep.config( sarsa = True, defVal = 0.01, symmetry = True, seed = random.getrandbits( 32 ) ) ),
+        ( 'expResults/sarsa1.pickle', sweep.config( sarsa = True, defVal = 1.0, symmetry = True, seed = random.getrandbits( 32 ) ) ),
+        ( 'expResults/Q01.pickle', sweep.config( sarsa = False, defVal = 0.01, symmetry = True, seed = random.getrandbits( 32 ) ) ),
+        ( 'expResults/Q1.pickle', sweep.config( sarsa = False, defVal = 1.0, symmetry = True, seed = random.getrandbits( 32 ) ) ) ]
+    experimentSweep = sweep.Sweep()
+    experimentSweep.run( list( config for _, config in figures ) )
+    for outputFileName, config in figures:
+        print( outputFileName )
+        experimentSweep.export( config, outputFileName )
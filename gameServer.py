@@ -0,0 +1,242 @@
+"""asyncio server playing many games at once against one shared policy.
+
+Every connection plays its own games against the same policy, which is
+read only: a trained AIPlayer is frozen ( see AIPlayer.freeze ) first, so
+serving a move never changes its state action pair values. Clients talk to the server in text lines, so a
+human can play with telnet or netcat:
+
+    new x           start a new game, the client plays X ( moves first )
+    new o           start a new game, the client plays O
+    move <pos>      place the client's symbol on the cell 0-8
+    stats           latency percentiles of the moves served so far
+    quit            close the connection
+
+Every game command is answered with
+
+    ok <board> <aiMove> <status>
+
+where board is the 9 cells ( 0 empty, 1 X, 2 O ), aiMove is the cell the
+AI has just taken ( - if it did not move ) and status is one of play, win,
+loss or tie ( from the point of view of the client ). Errors are answered
+with 'error <message>'.
+
+    python gameServer.py --brain brainy.brain --port 8765
+    python gameServer.py --unix /tmp/tictac.sock
+"""
+from __future__ import division
+import argparse
+import asyncio
+import os
+import timeit
+import deepTic
+
+clock = timeit.default_timer
+brainFile = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'brainy.brain' )
+
+
+def loadPolicy( fileName, useSymmetry = True ):
+    """Returns the greedy strategy stored in the brain file as a FrozenPlayer.
+
+    Args:
+        fileName: path of a pickled or binary brain file
+        useSymmetry: flag denoting if the brain was trained w.r.t. the
+            symmetric invariants of the states
+    """
+    return deepTic.FrozenPlayer.load( fileName, useSymmetry )
+
+def percentile( values, q ):
+    """Returns the q-th percentile ( 0-100 ) of sorted values, nearest rank."""
+    if not values:
+        return 0.0
+    rank = int( round( q / 100 * ( len( values ) - 1 ) ) )
+    return values[ rank ]
+
+def summary( latencies ):
+    """Returns count and p50, p90, p99 and max of the latencies in milliseconds."""
+    values = sorted( latencies )
+    return {
+        'count': len( values ),
+        'p50': percentile( values, 50 ) * 1000,
+        'p90': percentile( values, 90 ) * 1000,
+        'p99': percentile( values, 99 ) * 1000,
+        'max': ( values[ -1 ] if values else 0.0 ) * 1000 }
+
+
+class Session( object ):
+    """Game of one connection against the shared policy.
+
+    Attributes:
+        game: state of the current game, None before the first 'new' command
+        side: symbol of the client ( 1 - X, 2 - O )
+        lastMover: symbol of the player who made the last move
+    """
+
+    def __init__( self ):
+        self.game = None
+        self.side = 1
+        self.lastMover = None
+
+    def over( self ):
+        """Returns True if there is no game in progress."""
+        return self.game is None or self.game.end() or self.game.tie()
+
+    def status( self ):
+        """Returns status of the game from the point of view of the client."""
+        if self.game.end():
+            return 'win' if self.lastMover == self.side else 'loss'
+        if self.game.tie():
+            return 'tie'
+        return 'play'
+
+
+class GameServer( object ):
+    """Serves games against one policy to any number of connections.
+
+    Attributes:
+        player: the shared policy, in competition mode
+        latencies: service times in seconds of the latest moves, a ring of
+            at most keepLatencies values
+        keepLatencies: number of latencies kept for the percentiles
+        nOfGames: number of games started
+    """
+
+    def __init__( self, player, keepLatencies = 100000 ):
+        """Constructor
+
+        Args:
+            player: policy answering the moves, an AIPlayer is frozen, other
+                players are put into competition mode
+            keepLatencies: number of latest move latencies kept for the percentiles
+        """
+        if isinstance( player, deepTic.AIPlayer ):
+            player = player.freeze()
+        player.competitionMode = True
+        self.player = player
+        self.keepLatencies = keepLatencies
+        self.latencies = []
+        self.nOfGames = 0
+        self.__next = 0
+
+    def record( self, latency ):
+        """Stores a move latency, overwriting the oldest one when the ring is full."""
+        if len( self.latencies ) < self.keepLatencies:
+            self.latencies.append( latency )
+        else:
+            self.latencies[ self.__next ] = latency
+            self.__next = ( self.__next + 1 ) % self.keepLatencies
+
+    def aiMove( self, session ):
+        """Lets the policy make its move in the game of the session."""
+        player = self.player
+        game = session.game
+        before = game.returnState( False )
+        move = player.makeMove( game.returnState( player.useSymmetry ), game.getAvailableActions( player.useSymmetry ) )
+        game.setState( move, 3 - session.side, player.useSymmetry )
+        session.lastMover = 3 - session.side
+        #the move on the board the client sees
+        after = game.returnState( False )
+        return next( i for i in range( len( after ) ) if after[ i ] != before[ i ] )
+
+    def reply( self, session, aiMove ):
+        """Returns the answer describing the game of the session."""
+        board = "".join( str( x ) for x in session.game.returnState( False ) )
+        return "ok {} {} {}".format( board, '-' if aiMove is None else aiMove, session.status() )
+
+    def handle( self, session, line ):
+        """Executes a single command and returns the answer.
+
+        Args:
+            session: session of the connection
+            line: the command
+        """
+        words = line.split()
+        if not words:
+            return "error empty command"
+        command = words[ 0 ].lower()
+        if command == 'new':
+            side = words[ 1 ].lower() if len( words ) > 1 else 'x'
+            if side not in ( 'x', 'o' ):
+                return "error side must be x or o"
+            session.game = deepTic.Game()
+            session.side = 1 if side == 'x' else 2
+            self.nOfGames += 1
+            aiMove = None
+            if session.side == 2:
+                aiMove = self.aiMove( session )
+            return self.reply( session, aiMove )
+        if command == 'move':
+            if session.over():
+                return "error no game in progress"
+            try:
+                pos = int( words[ 1 ] )
+            except ( IndexError, ValueError ):
+                return "error move needs a cell number"
+            if pos not in session.game.getAvailableActions( False ):
+                return "error cell {} is not available".format( pos )
+            session.game.setState( pos, session.side, False )
+            session.lastMover = session.side
+            aiMove = None
+            if not session.over():
+                aiMove = self.aiMove( session )
+            return self.reply( session, aiMove )
+        if command == 'stats':
+            return "stats games={nOfGames} moves={count} p50={p50:.3f}ms p90={p90:.3f}ms p99={p99:.3f}ms max={max:.3f}ms".format(
+                nOfGames = self.nOfGames, **summary( self.latencies ) )
+        return "error unknown command {}".format( command )
+
+    async def serveConnection( self, reader, writer ):
+        """Plays the games of a single connection until it is closed."""
+        session = Session()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = clock()
+                line = line.decode( 'ascii', 'replace' ).strip()
+                if line.lower() == 'quit':
+                    break
+                answer = self.handle( session, line )
+                writer.write( ( answer + "\n" ).encode( 'ascii' ) )
+                if answer.startswith( 'ok' ):
+                    self.record( clock() - start )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start( self, host = '127.0.0.1', port = 8765, path = None ):
+        """Starts listening on a TCP port, or on a Unix socket if the path is given.
+
+        Returns:
+            the asyncio server
+        """
+        if path is not None:
+            return await asyncio.start_unix_server( self.serveConnection, path = path )
+        return await asyncio.start_server( self.serveConnection, host, port )
+
+
+async def main( args ):
+    server = GameServer( loadPolicy( args.brain, not args.no_symmetry ) )
+    listener = await server.start( args.host, args.port, args.unix )
+    print( "Serving on {}".format( args.unix or "{}:{}".format( args.host, args.port ) ) )
+    async with listener:
+        while True:
+            await asyncio.sleep( args.report_every )
+            if server.latencies:
+                print( server.handle( None, 'stats' ) )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description = 'Serves tic tac toe games against a trained policy' )
+    parser.add_argument( "--brain", default = brainFile, help = 'Path to pre-trained policy' )
+    parser.add_argument( "--no-symmetry", action = 'store_true', help = 'The policy was trained without the symmetric invariants of the states' )
+    parser.add_argument( "--host", default = '127.0.0.1', help = 'Address to listen on' )
+    parser.add_argument( "--port", type = int, default = 8765, help = 'TCP port to listen on' )
+    parser.add_argument( "--unix", help = 'Path of a Unix socket to listen on instead of the TCP port' )
+    parser.add_argument( "--report-every", type = float, default = 10.0, help = 'Seconds between latency reports' )
+    args = parser.parse_args()
+    try:
+        asyncio.run( main( args ) )
+    except KeyboardInterrupt:
+        pass
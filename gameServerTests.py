@@ -0,0 +1,63 @@
+"""Tests of the asyncio game server, which needs Python 3.
+
+deepTicTests imports them when the interpreter can compile this module.
+"""
+import random
+import unittest
+import deepTic
+import gameServer
+import loadGenerator
+import solver
+
+
+class TestGameServer( unittest.TestCase ):
+
+    def testCommands( self ):
+        player = solver.PerfectPlayer()
+        server = gameServer.GameServer( player )
+        session = gameServer.Session()
+        self.assertEqual( server.handle( session, 'move 4' ), "error no game in progress" )
+        self.assertTrue( server.handle( session, 'new x' ).startswith( "ok 000000000 - play" ) )
+        answer = server.handle( session, 'move 0' ).split()
+        self.assertEqual( answer[ 0 ], 'ok' )
+        self.assertEqual( answer[ 1 ][ int( answer[ 2 ] ) ], '2' )
+        self.assertTrue( server.handle( session, 'move 0' ).startswith( "error" ) )
+        self.assertEqual( server.handle( session, 'new o' ).split()[ 1 ].count( '1' ), 1 )
+        #the perfect player never loses
+        status = 'play'
+        while status == 'play':
+            move = session.game.getAvailableActions( False )[ 0 ]
+            status = server.handle( session, 'move {}'.format( move ) ).split()[ 3 ]
+        self.assertIn( status, ( 'loss', 'tie' ) )
+        self.assertTrue( server.handle( session, 'stats' ).startswith( "stats games=2" ) )
+
+    def testLoad( self ):
+        async def run():
+            server = gameServer.GameServer( solver.PerfectPlayer() )
+            listener = await server.start( port = 0 )
+            port = listener.sockets[ 0 ].getsockname()[ 1 ]
+            connect = lambda: gameServer.asyncio.open_connection( '127.0.0.1', port )
+            _, latencies = await loadGenerator.generateLoad( connect, 10, 5 )
+            listener.close()
+            await listener.wait_closed()
+            return server, latencies
+        server, latencies = gameServer.asyncio.run( run() )
+        self.assertEqual( server.nOfGames, 50 )
+        self.assertEqual( len( latencies ), len( server.latencies ) )
+        self.assertEqual( gameServer.summary( latencies )[ 'count' ], len( latencies ) )
+
+    def testReadOnlyPolicy( self ):
+        #every state is unseen by an untrained player
+        player = deepTic.AIPlayer( 0 )
+        server = gameServer.GameServer( player )
+        session = gameServer.Session()
+        for _ in range( 20 ):
+            status = server.handle( session, 'new o' ).split()[ 3 ]
+            while status == 'play':
+                move = random.choice( session.game.getAvailableActions( False ) )
+                status = server.handle( session, 'move {}'.format( move ) ).split()[ 3 ]
+        self.assertEqual( player.nOfStates(), 0 )
+
+
+if __name__ == '__main__':
+    unittest.main()
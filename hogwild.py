@@ -0,0 +1,218 @@
+"""Self-play of a single agent on several processes sharing one Q-table.
+
+The state action values live in shared memory ( see SharedQTable ), indexed
+by the base-3 code of the state like in the DenseQTable. Every worker
+process plays its share of the episodes with its own AIPlayer over the
+shared table and updates the values without any locking ( Hogwild style ):
+updates of the same state action pair racing each other may lose one of
+them, which is rare and harmless for the learning. Only adding a state
+takes a lock, so a worker never resets the values of a state another
+worker has already added and learned. The worker processes
+are forked when a Training is created, so it has to be created from the
+main thread ( forking a process from another thread may copy locks held
+by the other threads ); only waiting for the workers can be left to a
+background thread ( see policyCache.BackgroundTrainer ).
+
+    player, gameResults = hogwild.train( policyCache.defaultParameters, nOfWorkers = 4 )
+"""
+from __future__ import division
+import array
+import multiprocessing
+import random
+import time
+import deepTic
+import policyCache
+
+
+class SharedQTable( deepTic.DenseQTable ):
+    """DenseQTable keeping its values in memory shared with the child processes.
+
+    Attributes:
+        values: shared array of nOfStates * 9 state action pair values
+        seen: shared array of flags of the initialized states
+        lock: lock of the processes adding states, the flag of a state is
+            checked again under the lock before its values are set
+    """
+
+    def __init__( self, values = None ):
+        """Constructor
+
+        Args:
+            values: dictionary of state action pair values to start with
+        """
+        n = deepTic.DenseQTable.nOfStates
+        self.values = multiprocessing.RawArray( 'd', n * 9 )
+        self.values[ : ] = array.array( 'd', [ deepTic.DenseQTable.illegal ] ) * ( n * 9 )
+        self.seen = multiprocessing.RawArray( 'B', n )
+        self.lock = multiprocessing.Lock()
+        if values is not None:
+            self.loadDict( values )
+
+    def __contains__( self, state ):
+        return self.seen[ deepTic.Symmetries.codes[ state ] ] != 0
+
+    def __len__( self ):
+        return sum( self.seen )
+
+    def containsCode( self, code ):
+        """Returns True if the state with the given base-3 code was seen."""
+        return self.seen[ code ] != 0
+
+    def initialize( self, state, possibleActions, value ):
+        """Adds a state with all its actions set to the given value, unless
+        another process has added it already."""
+        code = deepTic.Symmetries.codes[ state ]
+        base = code * 9
+        with self.lock:
+            if self.seen[ code ]:
+                return
+            for a in possibleActions:
+                self.values[ base + a ] = value
+            self.seen[ code ] = 1
+
+    def initializeCodes( self, codes, possibleMasks, value ):
+        """Adds many states at once, all their actions set to the given value,
+        skips the states another process has added already."""
+        with self.lock:
+            unseen = list( i for ( i, code ) in enumerate( codes ) if not self.seen[ code ] )
+            if not unseen:
+                return
+            codes = list( codes[ i ] for i in unseen )
+            self.setRows( codes, list( possibleMasks[ i ] for i in unseen ), value )
+            for code in codes:
+                self.seen[ code ] = 1
+
+    def stateActions( self, code ):
+        """Returns the actions of the state with the given code."""
+        base = code * 9
+        illegal = deepTic.DenseQTable.illegal
+        return tuple( a for a in range( 9 ) if self.values[ base + a ] != illegal )
+
+    def actionValues( self, state ):
+        """Returns lists of the actions and their values in the given state."""
+        code = deepTic.Symmetries.codes[ state ]
+        base = code * 9
+        actions = list( self.stateActions( code ) )
+        return actions, list( self.values[ base + a ] for a in actions )
+
+    def toDict( self ):
+        """Returns the state action pair values as a dictionary."""
+        q = {}
+        for code in range( deepTic.DenseQTable.nOfStates ):
+            if self.seen[ code ]:
+                base = code * 9
+                q[ deepTic.Symmetries.states[ code ] ] = dict( ( a, self.values[ base + a ] ) for a in self.stateActions( code ) )
+        return q
+
+    def snapshot( self ):
+        """Returns an independent copy of the table as a DenseQTable."""
+        table = deepTic.DenseQTable.__new__( deepTic.DenseQTable )
+        table.values = array.array( 'd', self.values )
+        table.actions = list( self.stateActions( code ) if self.seen[ code ] else None
+                              for code in range( deepTic.DenseQTable.nOfStates ) )
+        return table
+
+
+def playEpisodes( parameters, qTable, seed, first, last, results, progress, worker ):
+    """Plays self-play episodes first, ..., last - 1 in a worker process.
+
+    Args:
+        parameters: dictionary of the training parameters
+        qTable: the shared storage
+        seed: seed of the random generator of the worker
+        first, last: range of the episodes played by the worker
+        results: shared array the results of the episodes are written to
+        progress: shared array of the numbers of episodes played by the workers
+        worker: index of the worker
+    """
+    random.seed( seed )
+    player = policyCache.makePlayer( parameters, qTable )
+    environment = deepTic.GameEnvironment( player, player, deepTic.Game(), reuseUpdates = True )
+    for episode in range( first, last ):
+        environment.reset()
+        results[ episode ] = environment.play()
+        progress[ worker ] += 1
+
+class Training( object ):
+    """Self-play of one player running on several worker processes.
+
+    Attributes:
+        parameters: dictionary of the training parameters
+        qTable: the shared storage
+        results: shared array of the results of the episodes
+        progress: shared array of the numbers of episodes played by the workers
+        workers: the worker processes
+    """
+
+    def __init__( self, parameters, nOfWorkers = None, seed = None ):
+        """Starts the worker processes.
+
+        Args:
+            parameters: dictionary of the training parameters ( see policyCache.defaultParameters )
+            nOfWorkers: number of worker processes, the number of cores if None
+            seed: seed from which the seeds of the workers are derived
+        """
+        if nOfWorkers is None:
+            nOfWorkers = multiprocessing.cpu_count()
+        if seed is None:
+            seed = random.getrandbits( 32 )
+        nOfEpisodes = parameters[ 'episodes' ]
+        self.parameters = parameters
+        self.qTable = SharedQTable()
+        self.results = multiprocessing.RawArray( 'b', nOfEpisodes )
+        self.progress = multiprocessing.RawArray( 'l', nOfWorkers )
+        bounds = list( nOfEpisodes * i // nOfWorkers for i in range( nOfWorkers + 1 ) )
+        self.workers = list( multiprocessing.Process( target = playEpisodes,
+                                 args = ( parameters, self.qTable, seed * nOfWorkers + i, bounds[ i ], bounds[ i + 1 ], self.results, self.progress, i ) )
+                             for i in range( nOfWorkers ) )
+        for worker in self.workers:
+            worker.start()
+
+    def wait( self, callback = None, publishEvery = 5000 ):
+        """Waits for the workers to finish, can be called from any thread.
+
+        Args:
+            callback: function called with a snapshot player and the number of
+                episodes played about every publishEvery episodes
+            publishEvery: number of episodes between the callbacks
+
+        Returns:
+            tuple of the trained AIPlayer ( with a DenseQTable ) and the list of
+            the results of the episodes ( the episodes of worker i follow the ones of worker i - 1 )
+        """
+        parameters = self.parameters
+        published = 0
+        while True:
+            running = any( worker.is_alive() for worker in self.workers )
+            played = sum( self.progress )
+            if callback is not None and played - published >= publishEvery:
+                published = played - played % publishEvery
+                callback( policyCache.makePlayer( parameters, self.qTable.snapshot() ), played )
+            if not running:
+                break
+            time.sleep( 0.05 )
+        for worker in self.workers:
+            worker.join()
+            if worker.exitcode != 0:
+                raise RuntimeError( "Self-play worker failed with exit code {}".format( worker.exitcode ) )
+        return policyCache.makePlayer( parameters, self.qTable.snapshot() ), list( self.results )
+
+
+def train( parameters, nOfWorkers = None, callback = None, publishEvery = 5000, seed = None ):
+    """Trains one player by self-play on several processes sharing its values.
+
+    Has to be called from the main thread ( see Training ).
+
+    Args:
+        parameters: dictionary of the training parameters ( see policyCache.defaultParameters )
+        nOfWorkers: number of worker processes, the number of cores if None
+        callback: function called with a snapshot player and the number of
+            episodes played about every publishEvery episodes
+        publishEvery: number of episodes between the callbacks
+        seed: seed from which the seeds of the workers are derived
+
+    Returns:
+        tuple of the trained AIPlayer ( with a DenseQTable ) and the list of
+        the results of the episodes ( the episodes of worker i follow the ones of worker i - 1 )
+    """
+    return Training( parameters, nOfWorkers, seed ).wait( callback, publishEvery )
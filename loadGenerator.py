@@ -0,0 +1,91 @@
+"""Load generator for the game server.
+
+Opens many connections at once, every one of them playing games with
+random moves, and reports games per second together with the percentiles
+of the round trip latency of the moves.
+
+    python loadGenerator.py --port 8765 --clients 200 --games 50
+    python loadGenerator.py --in-process --clients 200 --games 50
+"""
+from __future__ import division
+import argparse
+import asyncio
+import random
+import gameServer
+
+clock = gameServer.clock
+
+
+async def runClient( connect, nOfGames, latencies, seed ):
+    """Plays games over one connection with random moves.
+
+    Args:
+        connect: coroutine function returning the reader and the writer of a new connection
+        nOfGames: number of games to play
+        latencies: list the round trip times of the requests are appended to
+        seed: seed of the random moves
+    """
+    rng = random.Random( seed )
+    reader, writer = await connect()
+    async def request( line ):
+        start = clock()
+        writer.write( ( line + "\n" ).encode( 'ascii' ) )
+        answer = ( await reader.readline() ).decode( 'ascii' ).split()
+        latencies.append( clock() - start )
+        if not answer or answer[ 0 ] != 'ok':
+            raise RuntimeError( "Server answered {!r} to {!r}".format( " ".join( answer ), line ) )
+        return answer
+    try:
+        for _ in range( nOfGames ):
+            _, board, _, status = await request( "new {}".format( rng.choice( 'xo' ) ) )
+            while status == 'play':
+                move = rng.choice( list( i for ( i, cell ) in enumerate( board ) if cell == '0' ) )
+                _, board, _, status = await request( "move {}".format( move ) )
+    finally:
+        writer.write( b"quit\n" )
+        writer.close()
+
+async def generateLoad( connect, nOfClients, nOfGames ):
+    """Runs the clients concurrently and returns the elapsed time and the latencies.
+
+    Args:
+        connect: coroutine function returning the reader and the writer of a new connection
+        nOfClients: number of concurrent connections
+        nOfGames: number of games played over every connection
+    """
+    latencies = []
+    start = clock()
+    await asyncio.gather( *( runClient( connect, nOfGames, latencies, seed ) for seed in range( nOfClients ) ) )
+    return clock() - start, latencies
+
+async def main( args ):
+    server = None
+    if args.in_process:
+        server = await gameServer.GameServer( gameServer.loadPolicy( args.brain, not args.no_symmetry ) ).start( args.host, 0 )
+        port = server.sockets[ 0 ].getsockname()[ 1 ]
+    else:
+        port = args.port
+    if args.unix is not None and not args.in_process:
+        connect = lambda: asyncio.open_unix_connection( args.unix )
+    else:
+        connect = lambda: asyncio.open_connection( args.host, port )
+    elapsed, latencies = await generateLoad( connect, args.clients, args.games )
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    stats = gameServer.summary( latencies )
+    print( "Games: {} in {:.2f}s ( {:,.0f} games/s )".format( args.clients * args.games, elapsed, args.clients * args.games / elapsed ) )
+    print( "Requests: {count} p50={p50:.3f}ms p90={p90:.3f}ms p99={p99:.3f}ms max={max:.3f}ms".format( **stats ) )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description = 'Load generator for the game server' )
+    parser.add_argument( "--host", default = '127.0.0.1', help = 'Address of the server' )
+    parser.add_argument( "--port", type = int, default = 8765, help = 'TCP port of the server' )
+    parser.add_argument( "--unix", help = 'Path of the Unix socket of the server' )
+    parser.add_argument( "--clients", type = int, default = 100, help = 'Number of concurrent connections' )
+    parser.add_argument( "--games", type = int, default = 20, help = 'Number of games per connection' )
+    parser.add_argument( "--in-process", action = 'store_true', help = 'Start a server in the same process' )
+    parser.add_argument( "--brain", default = gameServer.brainFile, help = 'Policy of the in-process server' )
+    parser.add_argument( "--no-symmetry", action = 'store_true', help = 'The policy was trained without the symmetric invariants of the states' )
+    args = parser.parse_args()
+    asyncio.run( main( args ) )
@@ -0,0 +1,282 @@
+"""Player choosing its moves by Monte Carlo tree search.
+
+Every move the player runs playouts from the current board: the tree is
+descended choosing the actions by their values and priors ( PUCT ), a new
+board is added to it and the game is finished by a rollout, whose result
+is backed up along the path. The statistics are kept in a transposition
+table keyed by the invariants of the boards ( see Symmetries.invariant ),
+so all the symmetric boards, and all the move orders leading to the same
+board, share them. The table is kept between the moves, only the boards
+with fewer symbols than the current one are dropped, so the subtree of the
+move played is reused. Each move takes a fixed number of playouts or a
+fixed time, whichever runs out first.
+
+A trained player can guide the search: its action probabilities ( see
+AIPlayer.actionProbabilities ) are the priors of the actions and the
+rollouts follow them, otherwise the priors are uniform and the rollouts
+random. The player works on boards of any size ( see deepTic.BoardGame ).
+
+    player = MCTSPlayer( playouts = 2000, timeLimit = 0.05 )
+    environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ) )
+    guided = MCTSPlayer( playouts = 200, policy = deepTic.FrozenPlayer.load( "brainy.brain" ) )
+"""
+from __future__ import division
+import math
+import random
+import timeit
+import deepTic
+
+clock = timeit.default_timer
+
+
+class Node( object ):
+    """Statistics of the search in an invariant board.
+
+    The results are from the point of view of the player to move.
+
+    Attributes:
+        visits: number of the playouts through the board
+        actions: actions possible in the invariant board
+        priors: prior probabilities of the actions
+        counts: number of the playouts through every action
+        values: sums of the results of the playouts through every action
+    """
+    __slots__ = ( 'visits', 'actions', 'priors', 'counts', 'values' )
+
+    def __init__( self, actions, priors ):
+        self.visits = 0
+        self.actions = actions
+        self.priors = priors
+        self.counts = [ 0 ] * len( actions )
+        self.values = [ 0.0 ] * len( actions )
+
+
+class MCTSPlayer( object ):
+    """Player with the same interface as the AIPlayer, searching the game tree every move.
+
+    Attributes:
+        playouts: number of playouts per move, None for no limit
+        timeLimit: seconds per move, None for no limit
+        k: number of symbols in a row needed to win, the size of the board if None
+        exploration: weight of the priors against the values in the tree
+        policy: player whose action probabilities guide the search, None for
+            uniform priors and random rollouts
+        uniformShare: share of the uniform distribution mixed into the priors
+            of the policy, so no action is ruled out
+        levels: transposition tables of the boards, levels[ n ] maps the
+            invariant boards with n symbols to their Node
+        debug: Flag denoting if the debug output should be printed.
+        competitionMode: when set to True the player never makes exploratory moves
+        useSymmetry: Flag denoting if the player receives invariant states, the
+            player works either way
+        rng: random generator of the rollouts and of the exploratory moves
+    """
+    uniformShare = 0.25
+
+    def __init__( self, playouts = 1000, timeLimit = None, k = None, exploration = 2.0, policy = None, eps = 0.0, seed = None ):
+        """Constructor
+
+        Args:
+            playouts: number of playouts per move, None for no limit
+            timeLimit: seconds per move, None for no limit
+            k: number of symbols in a row needed to win, the size of the board if None
+            exploration: weight of the priors against the values in the tree
+            policy: player whose action probabilities guide the search
+            eps: probability of making a random move instead of the searched one
+            seed: seed of the random generator
+        """
+        if playouts is None and timeLimit is None:
+            raise ValueError( "Either the number of playouts or the time limit is needed" )
+        self.playouts = playouts
+        self.timeLimit = timeLimit
+        self.k = k
+        self.exploration = exploration
+        self.policy = policy
+        self.levels = None
+        self.debug = False
+        self.competitionMode = False
+        self.useSymmetry = True
+        self.rng = random.Random( seed )
+        self.__eps = eps
+        self.__nOfCells = None
+        self.__stones = None
+
+    def setEps( self, eps ):
+        """Sets the probability of random moves
+        """
+        self.__eps = eps
+
+    def getEps( self ):
+        """Returns the probability of random moves
+        """
+        return self.__eps
+
+    def prepare( self, state ):
+        """Sets up the geometry of the board and drops the boards which can not follow the state."""
+        nOfCells = len( state )
+        stones = nOfCells - state.count( 0 )
+        if nOfCells != self.__nOfCells:
+            size = int( round( math.sqrt( nOfCells ) ) )
+            k = size if self.k is None else self.k
+            if ( size, k ) not in deepTic.BoardGame.tables:
+                deepTic.BoardGame.tables[ ( size, k ) ] = deepTic.BoardGame.buildTables( size, k )
+            symmetries, _, self.linesThrough = deepTic.BoardGame.tables[ ( size, k ) ]
+            #the lookup tables are faster on the tic tac toe board
+            self.symmetries = deepTic.sharedSymmetries if size == 3 else symmetries
+            self.__nOfCells = nOfCells
+            self.__stones = None
+        if self.__stones is None or stones < self.__stones:
+            #a new game
+            self.levels = list( {} for _ in range( nOfCells + 1 ) )
+        else:
+            for n in range( self.__stones, stones ):
+                self.levels[ n ] = {}
+        self.__stones = stones
+
+    def expand( self, board ):
+        """Returns a new node of an invariant board."""
+        actions = tuple( a for a in range( len( board ) ) if board[ a ] == 0 )
+        share = 1.0 / len( actions )
+        if self.policy is None:
+            return Node( actions, [ share ] * len( actions ) )
+        probabilities = dict( self.policy.actionProbabilities( board, actions ) )
+        mix = MCTSPlayer.uniformShare
+        return Node( actions, list( mix * share + ( 1 - mix ) * probabilities.get( a, 0.0 ) for a in actions ) )
+
+    def select( self, node ):
+        """Returns index of the action to descend with, the one with the best PUCT score."""
+        scale = self.exploration * math.sqrt( node.visits + 1 )
+        counts = node.counts
+        values = node.values
+        priors = node.priors
+        best = 0
+        bestScore = None
+        for i in range( len( counts ) ):
+            n = counts[ i ]
+            score = ( values[ i ] / n if n else 0.0 ) + scale * priors[ i ] / ( 1 + n )
+            if bestScore is None or score > bestScore:
+                best, bestScore = i, score
+        return best
+
+    def rollout( self, cells, movers, others ):
+        """Finishes the game and returns its result for the player to move.
+
+        Args:
+            cells: the board, it is changed
+            movers: mask of the cells of the player to move
+            others: mask of the cells of the other player
+        """
+        linesThrough = self.linesThrough
+        empty = list( a for a in range( len( cells ) ) if cells[ a ] == 0 )
+        sign = 1
+        symbol = 1 if cells.count( 1 ) == cells.count( 2 ) else 2
+        if self.policy is None:
+            self.rng.shuffle( empty )
+        while empty:
+            if self.policy is None:
+                action = empty.pop()
+            else:
+                action = self.sample( cells, empty )
+                empty.remove( action )
+            cells[ action ] = symbol
+            movers |= 1 << action
+            for line in linesThrough[ action ]:
+                if movers & line == line:
+                    return sign
+            movers, others = others, movers
+            sign = -sign
+            symbol = 3 - symbol
+        return 0
+
+    def sample( self, cells, empty ):
+        """Returns an action drawn from the probabilities of the policy."""
+        policy = self.policy
+        permutation = 0
+        board = tuple( cells )
+        actions = empty
+        if policy.useSymmetry:
+            board, permutation = self.symmetries.invariant( board )
+            actions = tuple( a for a in range( len( board ) ) if board[ a ] == 0 )
+        r = self.rng.random()
+        for action, p in policy.actionProbabilities( board, actions ):
+            r -= p
+            if r < 0:
+                break
+        return self.symmetries.inverseAction( action, permutation )
+
+    def playout( self, state ):
+        """Runs a single playout from the state and backs up its result."""
+        cells = list( state )
+        symbol = 1 if cells.count( 1 ) == cells.count( 2 ) else 2
+        movers = sum( 1 << i for i in range( len( cells ) ) if cells[ i ] == symbol )
+        others = sum( 1 << i for i in range( len( cells ) ) if cells[ i ] == 3 - symbol )
+        stones = len( cells ) - cells.count( 0 )
+        symmetries = self.symmetries
+        linesThrough = self.linesThrough
+        path = []
+        while True:
+            board, permutation = symmetries.invariant( tuple( cells ) )
+            level = self.levels[ stones ]
+            node = level.get( board )
+            if node is None:
+                level[ board ] = self.expand( board )
+                value = self.rollout( cells, movers, others )
+                break
+            index = self.select( node )
+            action = symmetries.inverseAction( node.actions[ index ], permutation )
+            path.append( ( node, index ) )
+            cells[ action ] = symbol
+            movers |= 1 << action
+            stones += 1
+            if any( movers & line == line for line in linesThrough[ action ] ):
+                #the player to move next has lost
+                value = -1
+                break
+            if stones == len( cells ):
+                value = 0
+                break
+            movers, others = others, movers
+            symbol = 3 - symbol
+        for node, index in reversed( path ):
+            value = -value
+            node.visits += 1
+            node.counts[ index ] += 1
+            node.values[ index ] += value
+
+    def search( self, state ):
+        """Runs the playouts of a move and returns the node of the state and its permutation.
+
+        At least one playout is run, whatever the limits.
+        """
+        self.prepare( state )
+        start = clock()
+        n = 0
+        while True:
+            self.playout( state )
+            n += 1
+            if self.playouts is not None and n >= self.playouts:
+                break
+            if self.timeLimit is not None and clock() - start >= self.timeLimit:
+                break
+        board, permutation = self.symmetries.invariant( state )
+        return self.levels[ len( state ) - state.count( 0 ) ][ board ], permutation
+
+    def makeMove( self, state, possibleActions ):
+        """Chooses the most visited move of the search, or a random one with probability eps
+
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        if self.__eps > 0 and ( not self.competitionMode ) and self.rng.random() < self.__eps:
+            return self.rng.choice( possibleActions )
+        state = tuple( state )
+        node, permutation = self.search( state )
+        best = max( range( len( node.actions ) ), key = lambda i: ( node.counts[ i ], node.priors[ i ] ) )
+        if self.debug:
+            print( "{} playouts, value {:.3f}".format( node.visits, node.values[ best ] / max( node.counts[ best ], 1 ) ) )
+        return self.symmetries.inverseAction( node.actions[ best ], permutation )
+
+    def update( self, stateUpdate ):
+        """The search does not learn from the updates."""
+        pass
@@ -0,0 +1,231 @@
+"""Agent estimating the state action values with a small NumPy model.
+
+The board is encoded as one-hot features ( empty, X, O for every cell ) and
+mapped to the values of all the actions by a linear model or by a network
+with one hidden layer of rectified linear units. The model is trained with
+stochastic gradient descent on minibatches of the SARSA / Q-learning targets
+built from the updates the GameEnvironment sends, so the memory does not
+grow with the number of states seen and the player works on boards of any
+size ( see deepTic.BoardGame ).
+
+    player = NeuralPlayer( 0.1, nOfCells = 16, hidden = 64 )
+    environment = deepTic.GameEnvironment( player, player, deepTic.BoardGame( 4, 3 ) )
+"""
+from __future__ import division
+import random
+import numpy as np
+import deepTic
+
+
+class NeuralPlayer( object ):
+    """Player with the same interface as the AIPlayer, backed by a NumPy model.
+
+    Attributes:
+        nOfCells: number of cells of the board ( and of the actions )
+        hidden: number of hidden units, None for the linear model
+        params: dictionary of the model parameters ( W1, b1 and for the
+            network also W2, b2 )
+        debug: Flag denoting if the debug output should be printed.
+        competitionMode: when set to True the player neither explores nor learns
+        sarsa: Flag denoting if SARSA ( when set to True ) or Q-learning (when set
+            to False) targets should be used
+        learningRate: step size of the gradient descent
+        batchSize: number of updates collected before a gradient step
+        useSymmetry: Flag denoting if the agent is aware of symmetric states.
+        rng: NumPy random generator used for the initial weights
+    """
+
+    def __init__( self, eps, nOfCells = 9, hidden = None, learningRate = 0.05, batchSize = 32, seed = None ):
+        """Constructor
+
+        Args:
+            eps: epsilon parameter for the epsilon greedy strategy
+            nOfCells: number of cells of the board
+            hidden: number of hidden units, the model is linear if None
+            learningRate: step size of the gradient descent
+            batchSize: number of updates collected before a gradient step
+            seed: seed of the random generator of the initial weights
+        """
+        self.nOfCells = nOfCells
+        self.hidden = hidden
+        self.rng = np.random.RandomState( seed )
+        nOfFeatures = 3 * nOfCells
+        if hidden is None:
+            self.params = {
+                'W1': np.zeros( ( nOfFeatures, nOfCells ) ),
+                'b1': np.zeros( nOfCells ) }
+        else:
+            self.params = {
+                'W1': self.rng.normal( 0.0, np.sqrt( 2.0 / nOfFeatures ), ( nOfFeatures, hidden ) ),
+                'b1': np.zeros( hidden ),
+                'W2': self.rng.normal( 0.0, np.sqrt( 1.0 / hidden ), ( hidden, nOfCells ) ) * 0.1,
+                'b2': np.zeros( nOfCells ) }
+        self.__eps = eps
+        self.debug = False
+        self.competitionMode = False
+        self.sarsa = True
+        self.learningRate = learningRate
+        self.batchSize = batchSize
+        self.useSymmetry = True
+        #preallocated minibatch of the updates
+        self.__s1 = np.zeros( ( batchSize, nOfCells ), dtype = np.int8 )
+        self.__s2 = np.zeros( ( batchSize, nOfCells ), dtype = np.int8 )
+        self.__a1 = np.zeros( batchSize, dtype = np.int64 )
+        self.__a2 = np.zeros( batchSize, dtype = np.int64 )
+        self.__r = np.zeros( batchSize )
+        self.__t = np.zeros( batchSize, dtype = bool )
+        self.__pending = 0
+
+    def setEps( self, eps ):
+        """Sets the epsilon parameter
+        """
+        self.__eps = eps
+
+    def getEps( self ):
+        """Returns the epsilon parameter
+        """
+        return self.__eps
+
+    def features( self, states ):
+        """Returns one-hot features of an array of states, shape ( n, 3 * nOfCells )."""
+        states = np.asarray( states, dtype = np.int8 ).reshape( -1, self.nOfCells )
+        return ( states[ :, :, np.newaxis ] == np.arange( 3 ) ).reshape( len( states ), -1 ).astype( float )
+
+    def forward( self, x ):
+        """Returns the action values for the features and the hidden activations."""
+        p = self.params
+        if self.hidden is None:
+            return x.dot( p[ 'W1' ] ) + p[ 'b1' ], None
+        h = np.maximum( x.dot( p[ 'W1' ] ) + p[ 'b1' ], 0.0 )
+        return h.dot( p[ 'W2' ] ) + p[ 'b2' ], h
+
+    def values( self, states ):
+        """Returns the values of all the actions in the given states, shape ( n, nOfCells )."""
+        return self.forward( self.features( states ) )[ 0 ]
+
+    def makeMove( self, state, possibleActions ):
+        """Chooses a move, best in the given state using epsilon greedy strategy
+
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        if random.random() < self.__eps and not self.competitionMode:
+            return random.choice( possibleActions )
+        values = self.values( state )[ 0 ]
+        return max( possibleActions, key = lambda a: values[ a ] )
+
+    def actionProbabilities( self, state, possibleActions ):
+        """Returns the probabilities of the moves makeMove chooses from.
+
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        values = self.values( state )[ 0 ]
+        greedyAction = max( possibleActions, key = lambda a: values[ a ] )
+        return deepTic.epsilonGreedy( greedyAction, possibleActions, 0 if self.competitionMode else self.__eps )
+
+    def makeMoves( self, states, legal ):
+        """Chooses epsilon greedy moves in many states at once.
+
+        Args:
+            states: array of states, shape ( n, nOfCells )
+            legal: array of flags of the legal actions, shape ( n, nOfCells )
+
+        Returns:
+            array of the chosen actions
+        """
+        legal = np.asarray( legal, dtype = bool )
+        values = np.where( legal, self.values( states ), -np.inf )
+        moves = values.argmax( axis = 1 )
+        if self.__eps > 0 and not self.competitionMode:
+            noise = np.where( legal, self.rng.random_sample( legal.shape ), -1.0 )
+            explore = self.rng.random_sample( len( moves ) ) < self.__eps
+            moves = np.where( explore, noise.argmax( axis = 1 ), moves )
+        return moves
+
+    def update( self, stateUpdate ):
+        """Stores an update, a gradient step is taken once batchSize updates are collected.
+
+        Args:
+            stateUpdate: dictionary containing state action pairs for two consecutive
+                states experienced by agent ( see AIPlayer.update )
+        """
+        if self.competitionMode:
+            return
+        i = self.__pending
+        self.__s1[ i ] = stateUpdate[ 's1' ]
+        self.__a1[ i ] = stateUpdate[ 'a1' ]
+        self.__r[ i ] = stateUpdate[ 'r' ]
+        self.__s2[ i ] = stateUpdate[ 's2' ]
+        self.__a2[ i ] = stateUpdate[ 'a2' ]
+        self.__t[ i ] = stateUpdate[ 't' ]
+        self.__pending = i + 1
+        if self.__pending == self.batchSize:
+            self.train( self.__s1, self.__a1, self.__r, self.__s2, self.__a2, self.__t )
+            self.__pending = 0
+
+    def targets( self, r, s2, a2, t ):
+        """Returns the SARSA or Q-learning targets of a minibatch."""
+        values = self.values( s2 )
+        if self.sarsa:
+            following = values[ np.arange( len( r ) ), np.where( t, 0, a2 ) ]
+        else:
+            following = np.where( s2 == 0, values, -np.inf ).max( axis = 1 )
+        #in a terminal state the value of s2, a2 is zero
+        return r + np.where( t, 0.0, following )
+
+    def train( self, s1, a1, r, s2, a2, t ):
+        """Takes a gradient step on the squared errors of a minibatch.
+
+        Args:
+            s1: array of the first states
+            a1: array of the actions taken in them
+            r: array of the rewards
+            s2: array of the second states
+            a2: array of the actions taken in the second states ( ignored in terminal ones )
+            t: array of the terminal flags
+
+        Returns:
+            mean squared error of the minibatch before the step
+        """
+        target = self.targets( r, s2, a2, t )
+        x = self.features( s1 )
+        values, h = self.forward( x )
+        rows = np.arange( len( a1 ) )
+        error = values[ rows, a1 ] - target
+        #gradient of the mean squared error w.r.t. the outputs
+        grad = np.zeros_like( values )
+        grad[ rows, a1 ] = error / len( a1 )
+        p = self.params
+        step = self.learningRate
+        if self.hidden is None:
+            p[ 'W1' ] -= step * x.T.dot( grad )
+            p[ 'b1' ] -= step * grad.sum( axis = 0 )
+        else:
+            gradH = grad.dot( p[ 'W2' ].T ) * ( h > 0 )
+            p[ 'W2' ] -= step * h.T.dot( grad )
+            p[ 'b2' ] -= step * grad.sum( axis = 0 )
+            p[ 'W1' ] -= step * x.T.dot( gradH )
+            p[ 'b1' ] -= step * gradH.sum( axis = 0 )
+        return float( ( error ** 2 ).mean() )
+
+    def saveState( self, fileName ):
+        """Saves the model parameters into a NumPy .npz file."""
+        np.savez( fileName, nOfCells = self.nOfCells, hidden = -1 if self.hidden is None else self.hidden, **self.params )
+
+    @staticmethod
+    def load( fileName, eps = 0.0 ):
+        """Returns a player with the model parameters saved by saveState.
+
+        Args:
+            fileName: path of the .npz file
+            eps: epsilon parameter of the player
+        """
+        data = np.load( fileName )
+        hidden = int( data[ 'hidden' ] )
+        player = NeuralPlayer( eps, int( data[ 'nOfCells' ] ), None if hidden < 0 else hidden )
+        for name in player.params:
+            player.params[ name ] = data[ name ].copy()
+        return player
@@ -1,52 +1,94 @@
 from __future__ import division
 import argparse
 import deepTic
+import policyCache
 import random
+import solver
 
 #Helper functions for simplistic UI        
 def doYouWantToPlay():
     print( "Shall we play a game? (y/n)" )
     x = '_'
     while x not in [ 'y', 'n' ]:
-        x = raw_input()
+        x = deepTic.readLine()
     return x == 'y'
 
 def chooseSide():
     print( "Choose 'x' or 'o':" )
     x = '_'
     while x not in [ 'x', 'o' ]:
-        x = raw_input()
+        x = deepTic.readLine()
     return x == 'x'
 
+def printStatistics( gameResults ):
+    print( "Training statistics:" )
+    print( "Number of ties: {}".format( sum( list( 1 for x in gameResults if x == 0) ) ) )
+    print( "Number of wins as Player 1: {}".format( sum( list( 1 for x in gameResults if x == 1) ) ) )
+    print( "Number of wins as Player 2: {}".format( sum( list( 1 for x in gameResults if x == -1) ) ) )
+
 if __name__ == "__main__":  
     random.seed( None ) #initialize with system time
     parser = argparse.ArgumentParser()
     parser.add_argument("--brain", nargs='?', help='Path to pre-trained policy')
+    parser.add_argument("--batch", action='store_true', help='Train on many games in lockstep (needs NumPy)')
+    parser.add_argument("--episodes", type=int, default=policyCache.defaultParameters[ 'episodes' ], help='Number of self-play training episodes')
+    parser.add_argument("--eps", type=float, default=policyCache.defaultParameters[ 'eps' ], help='Epsilon parameter used in training')
+    parser.add_argument("--q-learning", action='store_true', help='Train with Q-learning instead of SARSA')
+    parser.add_argument("--initial-value", type=float, default=policyCache.defaultParameters[ 'initialStateActionValue' ], help='Initial state action value')
+    parser.add_argument("--learning-rate", type=float, default=policyCache.defaultParameters[ 'learningRate' ], help='Learning rate used in training')
+    parser.add_argument("--no-symmetry", action='store_true', help='Train without the symmetric invariants of the states')
+    parser.add_argument("--workers", type=int, default=1, help='Number of processes sharing the background training')
+    parser.add_argument("--no-cache", action='store_true', help='Train a new policy even if a cached one exists')
     args = parser.parse_args()
+    trainer = None
     if args.brain is not None:
         print( "AI is being loaded from file." )
         opponent = deepTic.AIPlayer( 0.2, args.brain )
-    else:  
-        opponent = deepTic.AIPlayer( 0.2 )
+    elif args.batch:
+        import batchTrainer
         print( "Training AI. Please wait." )
-        gameResults = []
-        nOfEpisodes = 50000
-        for x in range( nOfEpisodes ):        
-            if x % 10000 == 0:
-                print( "{:.0%} done".format( x / nOfEpisodes ) ) 
-            g = deepTic.GameEnvironment( opponent, opponent, deepTic.Game(None, False))
-            gameResults.append( g.play() )
+        batch = batchTrainer.BatchTrainer( 250, eps = 0.2 )
+        gameResults = batch.train( 50000 // 250 )
         print( "Training statistics:" )
-        print( "Number of ties: {}".format( sum( list( 1 for x in gameResults if x == 0) ) ) )
-        print( "Number of wins as Player 1: {}".format( sum( list( 1 for x in gameResults if x == 1) ) ) )
-        print( "Number of wins as Player 2: {}".format( sum( list( 1 for x in gameResults if x == -1) ) ) )
-
+        print( "Number of ties: {}".format( ( gameResults == 0 ).sum() ) )
+        print( "Number of wins as Player 1: {}".format( ( gameResults == 1 ).sum() ) )
+        print( "Number of wins as Player 2: {}".format( ( gameResults == -1 ).sum() ) )
+        opponent = batch.player( 0.2 )
+    else:  
+        parameters = {
+            'episodes': args.episodes,
+            'eps': args.eps,
+            'sarsa': not args.q_learning,
+            'initialStateActionValue': args.initial_value,
+            'learningRate': args.learning_rate,
+            'useSymmetry': not args.no_symmetry }
+        opponent = None if args.no_cache else policyCache.load( parameters )
+        if opponent is not None:
+            print( "AI is loaded from the cache." )
+        else:
+            #play the solver until the first snapshot of the training is published
+            print( "Training AI in the background, the opponent improves between the games." )
+            trainer = policyCache.BackgroundTrainer( parameters, publishEvery = max( 1, args.episodes // 10 ), nOfWorkers = args.workers )
+            trainer.start()
+            opponent = solver.PerfectPlayer()
 
     opponent.competitionMode = True
+    #the opponent does not learn from the human, every move is a table lookup
+    if hasattr( opponent, 'freeze' ):
+        opponent = opponent.freeze()
     
     print("These are all available actions in the game:\n\n0|1|2\n-----\n3|4|5\n-----\n6|7|8\n\n")
     
     while doYouWantToPlay():
+        if trainer is not None:
+            policy = trainer.policy()
+            if policy is not None and policy is not opponent:
+                #hot-swap the improved policy between the games
+                opponent = policy
+                print( "The AI has trained for {} episodes now.".format( trainer.episodes ) )
+            if trainer.finished() and opponent is trainer.policy():
+                printStatistics( trainer.gameResults )
+                trainer = None
         if (chooseSide()):
             g = deepTic.GameEnvironment( deepTic.HumanPlayer(), opponent, deepTic.Game() )
         else:
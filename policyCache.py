@@ -0,0 +1,207 @@
+"""Cache of trained policies keyed by the training parameters.
+
+A policy trained by self-play is saved as a binary brain ( see
+deepTic.MappedQTable ) named after a hash of the parameters it was trained
+with, so the next run with the same parameters loads it instantly. When
+no cached policy exists, BackgroundTrainer trains one in a worker thread,
+publishing frozen snapshots of the policy as the training goes on and
+saving the final one into the cache.
+
+    parameters = dict( policyCache.defaultParameters, episodes = 20000 )
+    opponent = policyCache.load( parameters )
+    if opponent is None:
+        trainer = policyCache.BackgroundTrainer( parameters )
+        trainer.start()
+        ...
+        opponent = trainer.policy() or opponent
+"""
+from __future__ import division
+import hashlib
+import json
+import os
+import threading
+import traceback
+import deepTic
+
+cacheDirectory = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'policies' )
+defaultParameters = {
+    'episodes': 50000,
+    'eps': 0.2,
+    'sarsa': True,
+    'initialStateActionValue': 0.01,
+    'learningRate': 0.2,
+    'useSymmetry': True }
+
+
+def cacheKey( parameters ):
+    """Returns a short hash identifying the training parameters."""
+    text = json.dumps( parameters, sort_keys = True )
+    return hashlib.sha1( text.encode( 'utf-8' ) ).hexdigest()[ : 16 ]
+
+def cacheFile( parameters, directory = cacheDirectory ):
+    """Returns path of the cached policy trained with the parameters."""
+    return os.path.join( directory, cacheKey( parameters ) + '.brain' )
+
+def load( parameters, directory = cacheDirectory ):
+    """Returns the cached policy as a FrozenPlayer, None if it was not trained yet.
+
+    Args:
+        parameters: dictionary of the training parameters
+        directory: directory of the cache
+    """
+    fileName = cacheFile( parameters, directory )
+    if not os.path.exists( fileName ):
+        return None
+    return deepTic.FrozenPlayer.fromQTable( deepTic.MappedQTable( fileName ), parameters[ 'useSymmetry' ] )
+
+def save( player, parameters, directory = cacheDirectory ):
+    """Stores the policy of the player in the cache.
+
+    The brain is written to a temporary file first, so a crash never
+    leaves a partial policy behind. The parameters are stored next to it
+    in a JSON file.
+
+    Args:
+        player: trained AIPlayer
+        parameters: dictionary of the parameters it was trained with
+        directory: directory of the cache
+    """
+    if not os.path.isdir( directory ):
+        os.makedirs( directory )
+    fileName = cacheFile( parameters, directory )
+    temporaryFile = fileName + '.tmp'
+    player.saveState( temporaryFile, binary = True )
+    if os.path.exists( fileName ):
+        os.remove( fileName )
+    os.rename( temporaryFile, fileName )
+    with open( os.path.splitext( fileName )[ 0 ] + '.json', 'wt' ) as f:
+        json.dump( parameters, f, indent = 2, sort_keys = True )
+
+def makePlayer( parameters, qTable = None ):
+    """Returns an AIPlayer set up with the training parameters.
+
+    Args:
+        parameters: dictionary of the training parameters
+        qTable: storage for the state action pair values, DictQTable if None
+    """
+    player = deepTic.AIPlayer( parameters[ 'eps' ], qTable = qTable )
+    player.sarsa = parameters[ 'sarsa' ]
+    player.initialStateActionValue = parameters[ 'initialStateActionValue' ]
+    player.learningRate = parameters[ 'learningRate' ]
+    player.useSymmetry = parameters[ 'useSymmetry' ]
+    return player
+
+def train( parameters, callback = None, publishEvery = 5000 ):
+    """Trains a player by self-play.
+
+    Args:
+        parameters: dictionary of the training parameters ( see defaultParameters )
+        callback: function called with the player and the number of episodes
+            played every publishEvery episodes
+        publishEvery: number of episodes between the callbacks
+
+    Returns:
+        tuple of the trained AIPlayer and the list of the results of the episodes
+    """
+    player = makePlayer( parameters )
+    environment = deepTic.GameEnvironment( player, player, deepTic.Game(), reuseUpdates = True )
+    gameResults = []
+    for episode in range( parameters[ 'episodes' ] ):
+        if callback is not None and episode > 0 and episode % publishEvery == 0:
+            callback( player, episode )
+        environment.reset()
+        gameResults.append( environment.play() )
+    return player, gameResults
+
+
+class BackgroundTrainer( threading.Thread ):
+    """Trains a policy in a worker thread and saves it into the cache.
+
+    Attributes:
+        parameters: dictionary of the training parameters
+        directory: directory of the cache
+        publishEvery: number of episodes between the published snapshots
+        nOfWorkers: number of processes sharing the training ( see hogwild )
+        episodes: number of episodes behind the latest snapshot
+        gameResults: results of all the training episodes, None until finished
+        error: exception which ended the training, None while it goes well
+    """
+
+    def __init__( self, parameters, directory = cacheDirectory, publishEvery = 5000, nOfWorkers = 1 ):
+        """Constructor
+
+        Args:
+            parameters: dictionary of the training parameters
+            directory: directory of the cache
+            publishEvery: number of episodes between the published snapshots
+            nOfWorkers: number of processes sharing the training, the
+                training runs in the thread itself if 1
+        """
+        threading.Thread.__init__( self )
+        self.daemon = True
+        self.parameters = parameters
+        self.directory = directory
+        self.publishEvery = publishEvery
+        self.nOfWorkers = nOfWorkers
+        self.episodes = 0
+        self.gameResults = None
+        self.error = None
+        self.__training = None
+        self.__latest = None
+        self.__lock = threading.Lock()
+
+    def start( self ):
+        """Starts the training.
+
+        The worker processes of a shared training are started here, in the
+        calling thread, as forking them from the training thread is unsafe.
+        """
+        if self.nOfWorkers > 1:
+            import hogwild
+            self.__training = hogwild.Training( self.parameters, self.nOfWorkers )
+        threading.Thread.start( self )
+
+    def publish( self, player, episodes ):
+        """Makes a frozen snapshot of the player available to policy()."""
+        frozen = player.freeze()
+        with self.__lock:
+            self.__latest = frozen
+            self.episodes = episodes
+
+    def checkError( self ):
+        """Raises RuntimeError if the training failed."""
+        if self.error is not None:
+            raise RuntimeError( "Background training failed: {!r}".format( self.error ) )
+
+    def policy( self ):
+        """Returns the latest published policy as a FrozenPlayer, None before the first one.
+
+        Raises:
+            RuntimeError: if the training failed
+        """
+        self.checkError()
+        with self.__lock:
+            return self.__latest
+
+    def finished( self ):
+        """Returns True once the final policy is published and cached.
+
+        Raises:
+            RuntimeError: if the training failed
+        """
+        self.checkError()
+        return self.gameResults is not None
+
+    def run( self ):
+        try:
+            if self.__training is not None:
+                player, gameResults = self.__training.wait( self.publish, self.publishEvery )
+            else:
+                player, gameResults = train( self.parameters, self.publish, self.publishEvery )
+            save( player, self.parameters, self.directory )
+            self.publish( player, self.parameters[ 'episodes' ] )
+            self.gameResults = gameResults
+        except Exception as e:
+            #the thread would die silently, the error is raised to the caller by policy() and finished()
+            traceback.print_exc()
+            self.error = e
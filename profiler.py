@@ -0,0 +1,228 @@
+"""Optional timers and counters for GameEnvironment, Game and AIPlayer.
+
+The profiler replaces methods of the given instances with timed versions
+and puts the original methods back when detached, so objects which are
+not attached run exactly the same code as without the profiler.
+
+    profiler = Profiler( snapshotEvery = 1000, dumpFile = 'profile.jsonl' )
+    profiler.attach( environment, game, [ trainee ] )
+    ...
+    print( profiler.report() )
+    profiler.detach()
+"""
+from __future__ import division
+import collections
+import contextlib
+import json
+import timeit
+
+clock = timeit.default_timer
+
+
+class Profiler( object ):
+    """Collects per-phase timers and counters of a training run.
+
+    Timers ( cumulative seconds ):
+        step: whole GameEnvironment.step calls
+        setState: Game.setState, including the symmetry canonicalization
+        makeMove: move selection of the players, also the batched one
+        update: SARSA / Q-learning updates of the players
+        plus any phase timed with the phase() context manager
+
+    Counters:
+        episodes, moves, updates, newStates ( states initialized by
+        initializeStateActions ), exploratory and greedy moves
+
+    Attributes:
+        timers: cumulative time of every phase
+        counters: counts of the events
+        snapshotEvery: number of episodes between snapshots, no snapshots if None
+        callback: function receiving every snapshot
+        dumpFile: path of a file to which snapshots are appended as JSON lines
+    """
+
+    def __init__( self, snapshotEvery = None, callback = None, dumpFile = None ):
+        """Constructor
+
+        Args:
+            snapshotEvery: number of episodes between snapshots
+            callback: function receiving every snapshot
+            dumpFile: path of a file to which snapshots are appended as JSON lines
+        """
+        self.timers = collections.defaultdict( float )
+        self.counters = collections.defaultdict( int )
+        self.snapshotEvery = snapshotEvery
+        self.callback = callback
+        self.dumpFile = dumpFile
+        self.__players = []
+        self.__wrapped = []
+        self.__start = clock()
+
+    def attach( self, environment = None, game = None, players = () ):
+        """Starts profiling the given objects.
+
+        Args:
+            environment: GameEnvironment, its play and step calls are profiled
+            game: Game, its setState calls are profiled
+            players: players whose moves and updates are profiled
+        """
+        if environment is not None:
+            self.wrapPlay( environment )
+            self.wrapTimed( environment, 'step', 'step' )
+        if game is not None:
+            self.wrapTimed( game, 'setState', 'setState' )
+        for player in players:
+            if any( player is p for p in self.__players ):
+                continue
+            self.__players.append( player )
+            self.wrapTimed( player, 'makeMove', 'makeMove', 'moves' )
+            self.wrapTimed( player, 'update', 'update', 'updates' )
+            if hasattr( player, 'makeMoves' ):
+                self.wrapBatch( player )
+            if hasattr( player, 'initializeStateActions' ):
+                self.wrapCounted( player, 'initializeStateActions', 'newStates' )
+            if hasattr( player, 'initializeManyStateActions' ):
+                self.wrapCountedMany( player, 'initializeManyStateActions', 'newStates' )
+            if hasattr( player, 'explore' ):
+                self.wrapExplore( player )
+            if hasattr( player, 'exploreMany' ):
+                self.wrapExploreMany( player )
+
+    def detach( self ):
+        """Stops profiling, restores the original methods."""
+        for ( obj, name ) in reversed( self.__wrapped ):
+            delattr( obj, name )
+        self.__wrapped = []
+        self.__players = []
+
+    def wrap( self, obj, name, wrapper ):
+        """Replaces a method of the object with a wrapper."""
+        setattr( obj, name, wrapper )
+        self.__wrapped.append( ( obj, name ) )
+
+    def wrapTimed( self, obj, name, timer, counter = None ):
+        """Wraps a method to measure its cumulative time."""
+        original = getattr( obj, name )
+        timers = self.timers
+        counters = self.counters
+        def timed( *args, **kwargs ):
+            start = clock()
+            try:
+                return original( *args, **kwargs )
+            finally:
+                timers[ timer ] += clock() - start
+                if counter is not None:
+                    counters[ counter ] += 1
+        self.wrap( obj, name, timed )
+
+    def wrapCounted( self, obj, name, counter ):
+        """Wraps a method to count its calls."""
+        original = getattr( obj, name )
+        counters = self.counters
+        def counted( *args, **kwargs ):
+            counters[ counter ] += 1
+            return original( *args, **kwargs )
+        self.wrap( obj, name, counted )
+
+    def wrapCountedMany( self, obj, name, counter ):
+        """Wraps a method taking a sequence of items to count the items."""
+        original = getattr( obj, name )
+        counters = self.counters
+        def counted( items, *args, **kwargs ):
+            counters[ counter ] += len( items )
+            return original( items, *args, **kwargs )
+        self.wrap( obj, name, counted )
+
+    def wrapBatch( self, player ):
+        """Wraps the batched move selection of a player, every state counts as a move."""
+        original = player.makeMoves
+        timers = self.timers
+        counters = self.counters
+        def makeMoves( states, *args, **kwargs ):
+            start = clock()
+            try:
+                return original( states, *args, **kwargs )
+            finally:
+                timers[ 'makeMove' ] += clock() - start
+                counters[ 'moves' ] += len( states )
+        self.wrap( player, 'makeMoves', makeMoves )
+
+    def wrapExplore( self, player ):
+        """Wraps the exploration decision of a player to count exploratory and greedy moves."""
+        original = player.explore
+        counters = self.counters
+        def explore( *args, **kwargs ):
+            result = original( *args, **kwargs )
+            if result:
+                counters[ 'exploratory' ] += 1
+            else:
+                counters[ 'greedy' ] += 1
+            return result
+        self.wrap( player, 'explore', explore )
+
+    def wrapExploreMany( self, player ):
+        """Wraps the batched exploration decisions of a player to count exploratory and greedy moves."""
+        original = player.exploreMany
+        counters = self.counters
+        def exploreMany( n, *args, **kwargs ):
+            result = original( n, *args, **kwargs )
+            exploratory = int( result.sum() )
+            counters[ 'exploratory' ] += exploratory
+            counters[ 'greedy' ] += n - exploratory
+            return result
+        self.wrap( player, 'exploreMany', exploreMany )
+
+    def wrapPlay( self, environment ):
+        """Wraps GameEnvironment.play to count episodes and take periodic snapshots."""
+        original = environment.play
+        counters = self.counters
+        def play():
+            result = original()
+            counters[ 'episodes' ] += 1
+            if self.snapshotEvery and counters[ 'episodes' ] % self.snapshotEvery == 0:
+                self.takeSnapshot()
+            return result
+        self.wrap( environment, 'play', play )
+
+    @contextlib.contextmanager
+    def phase( self, name ):
+        """Context manager timing a phase of the run, e.g. object construction.
+
+        Args:
+            name: name of the timer
+        """
+        start = clock()
+        try:
+            yield
+        finally:
+            self.timers[ name ] += clock() - start
+
+    def snapshot( self ):
+        """Returns the current timers and counters as a dictionary."""
+        return {
+            'elapsed': clock() - self.__start,
+            'timers': dict( self.timers ),
+            'counters': dict( self.counters ),
+            'qTableSizes': list( p.nOfStates() for p in self.__players if hasattr( p, 'nOfStates' ) ) }
+
+    def takeSnapshot( self ):
+        """Passes a snapshot to the callback and appends it to the dump file."""
+        snapshot = self.snapshot()
+        if self.callback is not None:
+            self.callback( snapshot )
+        if self.dumpFile is not None:
+            with open( self.dumpFile, 'at' ) as f:
+                f.write( json.dumps( snapshot, sort_keys = True ) + '\n' )
+        return snapshot
+
+    def report( self ):
+        """Returns a human readable summary of the timers and counters."""
+        snapshot = self.snapshot()
+        lines = [ "Elapsed: {:.3f}s".format( snapshot[ 'elapsed' ] ) ]
+        for name in sorted( self.timers ):
+            lines.append( "{:<20} {:10.3f}s".format( name, self.timers[ name ] ) )
+        for name in sorted( self.counters ):
+            lines.append( "{:<20} {:10d}".format( name, self.counters[ name ] ) )
+        for index, size in enumerate( snapshot[ 'qTableSizes' ] ):
+            lines.append( "{:<20} {:10d}".format( "qTableSize[{}]".format( index ), size ) )
+        return "\n".join( lines )
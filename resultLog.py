@@ -0,0 +1,150 @@
+"""Append-only binary log of the per-agent results of an experiment.
+
+The file starts with a 16 byte header ( magic bytes, format version and the
+number of episodes ) followed by one row of little endian float64 episode
+results per agent. Rows are appended as the agents finish, so a run which
+dies can be resumed from the last complete row. An agent which stopped
+before the last episode ( see experiments.plateaued ) has the episodes it
+did not play stored as NaN, they are left out of the averages.
+
+Average learning curves are also stored as curve files: the bare little
+endian float64 values, one per episode, which can be memory-mapped and
+read in slices without loading the whole curve ( see drawGraphs ).
+"""
+from __future__ import division
+import array
+import os
+import struct
+import sys
+
+
+def writeCurve( fileName, values ):
+    """Writes a learning curve as a curve file.
+
+    The values go into a temporary file first, so a crash never leaves a
+    partial curve behind.
+
+    Args:
+        fileName: path of the curve file
+        values: average result of every episode
+    """
+    data = array.array( 'd', values )
+    if sys.byteorder != 'little':
+        data.byteswap()
+    with open( fileName + '.tmp', 'wb' ) as f:
+        data.tofile( f )
+    if os.path.exists( fileName ):
+        os.remove( fileName )
+    os.rename( fileName + '.tmp', fileName )
+
+
+class ResultLog( object ):
+    """Appends per-agent rows of episode results to a file and keeps their running sum.
+
+    Attributes:
+        fileName: path of the log file
+        nOfEpisodes: length of every row
+        nOfRows: number of complete rows in the file
+        totals: running sum of all the rows
+        counts: number of the rows which played every episode
+        played: number of the episodes played by every row
+    """
+    magic = b'TTTR'
+    version = 1
+    header = struct.Struct( '<4sHxxI4x' )
+
+    def __init__( self, fileName, nOfEpisodes, resume = True ):
+        """Opens the log, creating it if needed.
+
+        Args:
+            fileName: path of the log file
+            nOfEpisodes: length of every row
+            resume: if True the rows already in the file are kept, otherwise
+                the file is started anew
+        """
+        self.fileName = fileName
+        self.nOfEpisodes = nOfEpisodes
+        self.nOfRows = 0
+        self.totals = array.array( 'd', [ 0.0 ] ) * nOfEpisodes
+        self.counts = array.array( 'l', [ 0 ] ) * nOfEpisodes
+        self.played = []
+        if resume and os.path.exists( fileName ):
+            if ResultLog.readHeader( fileName ) != nOfEpisodes:
+                raise ValueError( "{} holds rows of a different length".format( fileName ) )
+            rowSize = 8 * nOfEpisodes
+            nOfRows = ( os.path.getsize( fileName ) - ResultLog.header.size ) // rowSize
+            #drop a row which was not written completely
+            with open( fileName, 'r+b' ) as f:
+                f.truncate( ResultLog.header.size + nOfRows * rowSize )
+            for row in ResultLog.rows( fileName ):
+                self.add( row )
+        else:
+            with open( fileName, 'wb' ) as f:
+                f.write( ResultLog.header.pack( ResultLog.magic, ResultLog.version, nOfEpisodes ) )
+
+    @staticmethod
+    def readHeader( fileName ):
+        """Returns number of episodes in the rows of the log file."""
+        with open( fileName, 'rb' ) as f:
+            magic, version, nOfEpisodes = ResultLog.header.unpack( f.read( ResultLog.header.size ) )
+        if magic != ResultLog.magic or version != ResultLog.version:
+            raise ValueError( "{} is not a supported result log".format( fileName ) )
+        return nOfEpisodes
+
+    @staticmethod
+    def rows( fileName ):
+        """Yields the complete rows of the log file one at a time."""
+        nOfEpisodes = ResultLog.readHeader( fileName )
+        with open( fileName, 'rb' ) as f:
+            f.seek( ResultLog.header.size )
+            while True:
+                row = array.array( 'd' )
+                try:
+                    row.fromfile( f, nOfEpisodes )
+                except EOFError:
+                    return
+                if sys.byteorder != 'little':
+                    row.byteswap()
+                yield row
+
+    def add( self, row ):
+        """Adds the played episodes of a row to the running sum in place."""
+        totals = self.totals
+        counts = self.counts
+        played = 0
+        for i, value in enumerate( row ):
+            #NaN marks an episode which was not played
+            if value == value:
+                totals[ i ] += value
+                counts[ i ] += 1
+                played += 1
+        self.played.append( played )
+        self.nOfRows += 1
+
+    def append( self, row ):
+        """Appends a row to the file and to the running sum.
+
+        Args:
+            row: results of the episodes of an agent, shorter than the
+                rows of the log if the agent stopped early
+        """
+        data = array.array( 'd', row )
+        if len( data ) > self.nOfEpisodes:
+            raise ValueError( "Row has {} episodes, more than {}".format( len( data ), self.nOfEpisodes ) )
+        data.extend( [ float( 'nan' ) ] * ( self.nOfEpisodes - len( data ) ) )
+        if sys.byteorder != 'little':
+            data.byteswap()
+        with open( self.fileName, 'ab' ) as f:
+            data.tofile( f )
+            f.flush()
+            os.fsync( f.fileno() )
+        self.add( row )
+
+    def mean( self ):
+        """Returns the average result of every episode over the rows which played it.
+
+        The curve ends with the last episode played by any of the rows, the
+        number of the rows behind every value is in counts.
+        """
+        end = max( self.played ) if self.played else 0
+        return list( self.totals[ i ] / float( self.counts[ i ] ) for i in range( end ) )
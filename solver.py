@@ -0,0 +1,226 @@
+"""Exact solver of tic tac toe and a perfect player built on top of it.
+
+The game tree is searched once with negamax, using a transposition table
+keyed on the invariant ( Symmetries ) of the states. The best action of
+every reachable board is then stored in a table, so the perfect player
+answers every move with a single lookup.
+"""
+import os
+import pickle
+import random
+import deepTic
+
+cacheFile = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'solver.cache' )
+#version of the cache format and of the solver, bump it whenever a change of
+#the Solver or of the board codes alters the tables, so a stale cache is rebuilt
+cacheVersion = 1
+cacheMagic = 'tttSolver'
+
+
+class Solver( object ):
+    """Game theoretic values of all reachable tic tac toe states.
+
+    Scores are given from the point of view of the player to move: positive
+    for a win, zero for a tie and negative for a loss. Faster wins ( and slower
+    losses ) get larger scores, so the best actions finish the game early.
+
+    Attributes:
+        scores: score of every reachable invariant state, keyed by its base-3 code
+        bestActions: best action for every board code ( 255 for terminal and
+            unreachable boards )
+    """
+    noAction = 255
+
+    def __init__( self ):
+        self.scores = {}
+        self.bestActions = bytearray( [ Solver.noAction ] ) * len( deepTic.Symmetries.states )
+
+    def solve( self ):
+        """Searches the whole game tree and fills in the tables."""
+        self.negamax( 0 )
+        for code in range( len( deepTic.Symmetries.states ) ):
+            if deepTic.Symmetries.canonicalCode[ code ] in self.scores and not self.terminal( code ):
+                self.bestActions[ code ] = self.bestAction( code )
+        return self
+
+    @staticmethod
+    def toMove( state ):
+        """Returns symbol of the player to move in the state."""
+        if state.count( 1 ) == state.count( 2 ):
+            return 1
+        return 2
+
+    @staticmethod
+    def won( state ):
+        """Returns True if one of the players has a winning line in the state."""
+        x = 0
+        o = 0
+        for pos, symbol in enumerate( state ):
+            if symbol == 1:
+                x |= 1 << pos
+            elif symbol == 2:
+                o |= 1 << pos
+        return deepTic.Game.winning[ x ] or deepTic.Game.winning[ o ]
+
+    def terminal( self, code ):
+        """Returns True if the game is over in the board with the given code."""
+        state = deepTic.Symmetries.states[ code ]
+        return 0 not in state or Solver.won( state )
+
+    def children( self, code ):
+        """Yields actions and codes of the boards following the given board."""
+        state = deepTic.Symmetries.states[ code ]
+        symbol = Solver.toMove( state )
+        for action in range( 9 ):
+            if state[ action ] == 0:
+                yield action, code + symbol * deepTic.Game.powers[ action ]
+
+    def negamax( self, code ):
+        """Returns score of the board for the player to move.
+
+        Args:
+            code: base-3 code of the board
+        """
+        canonical = deepTic.Symmetries.canonicalCode[ code ]
+        if canonical in self.scores:
+            return self.scores[ canonical ]
+        state = deepTic.Symmetries.states[ canonical ]
+        empty = state.count( 0 )
+        if Solver.won( state ):
+            #the previous move won the game
+            score = -( 1 + empty )
+        elif empty == 0:
+            score = 0
+        else:
+            score = max( -self.negamax( child ) for ( _, child ) in self.children( canonical ) )
+        self.scores[ canonical ] = score
+        return score
+
+    def bestAction( self, code ):
+        """Returns the first action with the highest score in a non-terminal board."""
+        bestScore = None
+        for action, child in self.children( code ):
+            score = -self.negamax( child )
+            if bestScore is None or score > bestScore:
+                best, bestScore = action, score
+        return best
+
+    def value( self, state ):
+        """Returns game theoretic value of the state for the player to move.
+
+        Args:
+            state: state of the board
+
+        Returns:
+            1 for a win, 0 for a tie and -1 for a loss
+        """
+        score = self.negamax( deepTic.Symmetries.codes[ tuple( state ) ] )
+        return ( score > 0 ) - ( score < 0 )
+
+
+def loadCache( fileName ):
+    """Returns the solver stored in the cache file, None if the file is missing or stale.
+
+    The file holds the magic string, the cache version, the scores and the
+    best actions; a file of another version ( or written before the version
+    was stored ) is stale.
+    """
+    if not os.path.exists( fileName ):
+        return None
+    try:
+        with open( fileName, 'rb' ) as f:
+            header = pickle.load( f )
+            if header != ( cacheMagic, cacheVersion ):
+                return None
+            solver = Solver()
+            solver.scores, bestActions = pickle.load( f )
+    except ( EOFError, pickle.UnpicklingError, ValueError, TypeError, IndexError, KeyError ):
+        return None
+    solver.bestActions = bytearray( bestActions )
+    return solver
+
+def solve( fileName = cacheFile ):
+    """Returns the solved game, loading it from the cache file if possible.
+
+    A missing or stale cache file ( see loadCache ) is written anew.
+
+    Args:
+        fileName: path of the cache file, nothing is cached if None
+    """
+    if fileName is not None:
+        solver = loadCache( fileName )
+        if solver is not None:
+            return solver
+    solver = Solver().solve()
+    if fileName is not None:
+        with open( fileName + '.tmp', 'wb' ) as f:
+            pickle.dump( ( cacheMagic, cacheVersion ), f, 2 )
+            pickle.dump( ( solver.scores, bytes( solver.bestActions ) ), f, 2 )
+        if os.path.exists( fileName ):
+            os.remove( fileName )
+        os.rename( fileName + '.tmp', fileName )
+    return solver
+
+
+class PerfectPlayer( object ):
+    """Player making the game theoretically best moves.
+
+    Has the same interface as the AIPlayer, but never learns.
+
+    Attributes:
+        solver: solved game
+        debug: Flag denoting if the debug output should be printed.
+        competitionMode: when set to True the player never makes exploratory moves
+        useSymmetry: Flag denoting if the player receives invariant states, the
+            player works either way
+    """
+
+    def __init__( self, eps = 0.0, solver = None ):
+        """Constructor
+
+        Args:
+            eps: probability of making a random move instead of the best one
+            solver: solved game, it is loaded with solve() if None
+        """
+        if solver is None:
+            solver = solve()
+        self.solver = solver
+        self.__eps = eps
+        self.debug = False
+        self.competitionMode = False
+        self.useSymmetry = False
+
+    def setEps( self, eps ):
+        """Sets the probability of random moves
+        """
+        self.__eps = eps
+
+    def makeMove( self, state, possibleActions ):
+        """Chooses the best move in the given state.
+
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        if self.__eps > 0 and ( not self.competitionMode ) and random.random() < self.__eps:
+            return random.choice( possibleActions )
+        action = self.solver.bestActions[ deepTic.Symmetries.codes[ tuple( state ) ] ]
+        if action == Solver.noAction:
+            return possibleActions[ 0 ]
+        return action
+
+    def actionProbabilities( self, state, possibleActions ):
+        """Returns the probabilities of the moves makeMove chooses from.
+
+        Args:
+            state: State for which action is needed.
+            possibleActions: All actions possible in the given state.
+        """
+        action = self.solver.bestActions[ deepTic.Symmetries.codes[ tuple( state ) ] ]
+        if action == Solver.noAction:
+            action = possibleActions[ 0 ]
+        return deepTic.epsilonGreedy( action, possibleActions, 0 if self.competitionMode else self.__eps )
+
+    def update( self, stateUpdate ):
+        """Perfect player does not learn."""
+        pass
@@ -0,0 +1,274 @@
+"""Cached sweep over the parameters of the experiments.
+
+A config is a dictionary of the parameters of an experiment ( see
+defaultConfig ). Every config is identified by a hash of its parameters
+together with the version of the learning engine, and its results are
+stored in the sweep directory under that hash: a result log with a row per
+agent ( see resultLog ), the average learning curve as a pickle and the
+config with its status, including the number of the episodes every agent
+played, in a JSON file. Running a sweep skips the configs already complete
+and the duplicates, resumes the partially trained ones and trains the
+agents of the rest on a pool of worker processes, the configs with the
+highest priority first.
+
+    configs = sweep.grid( sarsa = [ True, False ], defVal = [ 0.01, 1.0 ], episodes = [ 5000 ] )
+    curves = sweep.Sweep( plateau = ( 500, 0.01 ) ).run( configs )
+
+    python sweep.py --sarsa true false --defVal 0.01 1.0 --workers 4
+"""
+from __future__ import division
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import experiments
+import resultLog
+
+#version of the learning engine, bump it whenever a change of deepTic or of
+#experiments.trainAgent alters the results, so the cached ones are not reused
+engineVersion = 2
+sweepDirectory = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'expResults', 'sweep' )
+defaultConfig = {
+    'sarsa': True,
+    'defVal': 0.01,
+    'symmetry': True,
+    'selfPlay': False,
+    'learningRate': 0.2,
+    'episodes': 5000,
+    'agents': 200,
+    #base of the seeds of the agents, derived from the hash of the config if None
+    'seed': None }
+
+
+def config( **parameters ):
+    """Returns the default config with the given parameters changed."""
+    unknown = set( parameters ) - set( defaultConfig )
+    if unknown:
+        raise ValueError( "Unknown parameters {}".format( ", ".join( sorted( unknown ) ) ) )
+    return dict( defaultConfig, **parameters )
+
+def grid( **axes ):
+    """Returns configs of all the combinations of the given parameter values.
+
+    Args:
+        axes: lists of the values of the parameters, the parameters left out
+            keep their default values
+    """
+    names = sorted( axes )
+    return list( config( **dict( zip( names, values ) ) )
+                 for values in itertools.product( *( axes[ name ] for name in names ) ) )
+
+def configKey( config, plateau = None ):
+    """Returns a short hash identifying the config, the engine version and the early termination."""
+    identity = dict( config, engine = engineVersion )
+    if plateau is not None:
+        identity[ 'plateau' ] = list( plateau )
+    text = json.dumps( identity, sort_keys = True )
+    return hashlib.sha1( text.encode( 'utf-8' ) ).hexdigest()[ : 16 ]
+
+def cost( config ):
+    """Returns the number of episodes the config trains, the default priority."""
+    return config[ 'episodes' ] * config[ 'agents' ]
+
+def runAgent( job ):
+    """Trains a single agent of a config, runs in a worker process.
+
+    Args:
+        job: tuple of the config key, the index of the agent and the task
+            of experiments.trainAgent
+
+    Returns:
+        tuple of the config key, the index of the agent, the results of its
+        episodes and the number of the episodes it played
+    """
+    key, agentIndex, task = job
+    gameResults, played = experiments.trainAgent( task )
+    return key, agentIndex, gameResults, played
+
+
+class Sweep( object ):
+    """Trains the agents of many configs on a pool of processes, caching the results.
+
+    Attributes:
+        directory: directory of the cached results
+        nOfWorkers: number of worker processes
+        plateau: tuple of the window and the tolerance of the early
+            termination ( see experiments.plateaued ), None to train every
+            agent for all the episodes
+    """
+
+    def __init__( self, directory = sweepDirectory, nOfWorkers = None, plateau = None ):
+        """Constructor
+
+        Args:
+            directory: directory of the cached results
+            nOfWorkers: number of worker processes, the number of cores if None
+            plateau: tuple of the window and the tolerance of the early termination
+        """
+        if plateau is not None and not 0 < plateau[ 1 ] < 2:
+            #the averages of the results lie between -1 and 1
+            raise ValueError( "Tolerance {} of the plateau is not between 0 and 2".format( plateau[ 1 ] ) )
+        self.directory = directory
+        self.nOfWorkers = multiprocessing.cpu_count() if nOfWorkers is None else nOfWorkers
+        self.plateau = None if plateau is None else tuple( plateau )
+
+    def key( self, config ):
+        """Returns the hash the results of the config are stored under."""
+        return configKey( config, self.plateau )
+
+    def path( self, config, extension ):
+        """Returns path of the file with the given extension of the config."""
+        return os.path.join( self.directory, self.key( config ) + extension )
+
+    def status( self, config ):
+        """Returns the stored status of the config, None if it was never run."""
+        fileName = self.path( config, '.json' )
+        if not os.path.exists( fileName ):
+            return None
+        with open( fileName, 'rt' ) as f:
+            return json.load( f )
+
+    def cached( self, config ):
+        """Returns True if the results of all the agents of the config are cached."""
+        status = self.status( config )
+        return status is not None and status[ 'complete' ]
+
+    def curve( self, config ):
+        """Returns the cached average learning curve of a complete config."""
+        with open( self.path( config, '.pickle' ), 'rb' ) as f:
+            return pickle.load( f )
+
+    def pending( self, configs, priority = cost ):
+        """Returns the configs to run without the cached ones and the duplicates.
+
+        Args:
+            configs: list of the configs
+            priority: function of a config, the configs with the lower values run first
+        """
+        unique = {}
+        for config in configs:
+            key = self.key( config )
+            if key not in unique and not self.cached( config ):
+                unique[ key ] = config
+        return sorted( unique.values(), key = priority )
+
+    def writeStatus( self, config, log ):
+        """Stores the config with the number of its agents trained so far and the episodes they played."""
+        status = {
+            'config': config,
+            'engine': engineVersion,
+            'plateau': None if self.plateau is None else list( self.plateau ),
+            'agents': log.nOfRows,
+            'played': log.played,
+            'stoppedEarly': sum( 1 for played in log.played if played < config[ 'episodes' ] ),
+            'complete': log.nOfRows == config[ 'agents' ] }
+        fileName = self.path( config, '.json' )
+        with open( fileName + '.tmp', 'wt' ) as f:
+            json.dump( status, f, indent = 2, sort_keys = True )
+        if os.path.exists( fileName ):
+            os.remove( fileName )
+        os.rename( fileName + '.tmp', fileName )
+
+    def finish( self, config, log ):
+        """Stores the average learning curve of a config whose agents are all trained."""
+        with open( self.path( config, '.pickle' ), 'wb' ) as f:
+            pickle.dump( log.mean(), f, 2 )
+        self.writeStatus( config, log )
+
+    def run( self, configs, priority = cost ):
+        """Trains the agents of the configs not cached yet.
+
+        The agents of all the configs share one pool of workers, so the cores
+        stay busy until the last agent finishes. Every agent gets a seed
+        derived from the seed of its config ( or its key ) and its index, and the results
+        are appended to the logs in the order of the agents, so they do not
+        depend on the number of workers nor on the other configs.
+
+        Args:
+            configs: list of the configs
+            priority: function of a config, the configs with the lower values run first
+
+        Returns:
+            list of the average learning curves of the configs
+        """
+        configs = list( configs )
+        if not os.path.isdir( self.directory ):
+            os.makedirs( self.directory )
+        runs = {}
+        jobs = []
+        for config in self.pending( configs, priority ):
+            key = self.key( config )
+            log = resultLog.ResultLog( self.path( config, '.results' ), config[ 'episodes' ] )
+            status = self.status( config )
+            runs[ key ] = ( config, log )
+            baseSeed = int( key[ : 8 ], 16 ) if config[ 'seed' ] is None else config[ 'seed' ]
+            for agentIndex in range( log.nOfRows, config[ 'agents' ] ):
+                task = ( baseSeed * config[ 'agents' ] + agentIndex, config[ 'sarsa' ], config[ 'defVal' ], config[ 'selfPlay' ],
+                         config[ 'symmetry' ], config[ 'episodes' ], config[ 'learningRate' ], self.plateau )
+                jobs.append( ( key, agentIndex, task ) )
+            if log.nOfRows == config[ 'agents' ]:
+                self.finish( config, log )
+            else:
+                self.writeStatus( config, log )
+        if jobs:
+            if any( not runs[ key ][ 0 ][ 'selfPlay' ] for key in runs ):
+                experiments.loadCanonicalPlayer()
+            if self.nOfWorkers > 1:
+                pool = multiprocessing.Pool( self.nOfWorkers )
+                allResults = pool.imap( runAgent, jobs )
+            else:
+                pool = None
+                allResults = ( runAgent( job ) for job in jobs )
+            for key, agentIndex, gameResults, played in allResults:
+                config, log = runs[ key ]
+                log.append( gameResults )
+                if log.nOfRows == config[ 'agents' ]:
+                    self.finish( config, log )
+                elif log.nOfRows % 10 == 0:
+                    self.writeStatus( config, log )
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return list( self.curve( config ) for config in configs )
+
+    def export( self, config, fileName ):
+        """Copies the average learning curve of a complete config into the given pickle.
+
+        The curve is also written as a curve file next to the pickle ( see
+        resultLog.writeCurve ), together with the status of the config, which
+        holds the number of the episodes played by every agent.
+        """
+        curve = self.curve( config )
+        with open( fileName, 'wb' ) as f:
+            pickle.dump( curve, f, 2 )
+        base = os.path.splitext( fileName )[ 0 ]
+        resultLog.writeCurve( base + '.curve', curve )
+        shutil.copyfile( self.path( config, '.json' ), base + '.json' )
+
+
+if __name__ == "__main__":
+    flag = lambda text: text.lower() in ( '1', 'true', 'yes' )
+    parser = argparse.ArgumentParser( description = 'Runs the experiments of all the combinations of the parameters' )
+    parser.add_argument( "--sarsa", type = flag, nargs = '+', default = [ defaultConfig[ 'sarsa' ] ], help = 'SARSA ( true ) or Q-learning ( false )' )
+    parser.add_argument( "--defVal", type = float, nargs = '+', default = [ defaultConfig[ 'defVal' ] ], help = 'Initial state action values' )
+    parser.add_argument( "--symmetry", type = flag, nargs = '+', default = [ defaultConfig[ 'symmetry' ] ], help = 'Use of the symmetric states' )
+    parser.add_argument( "--selfPlay", type = flag, nargs = '+', default = [ defaultConfig[ 'selfPlay' ] ], help = 'Self-play or the pretrained opponent' )
+    parser.add_argument( "--learningRate", type = float, nargs = '+', default = [ defaultConfig[ 'learningRate' ] ], help = 'Learning rates' )
+    parser.add_argument( "--episodes", type = int, nargs = '+', default = [ defaultConfig[ 'episodes' ] ], help = 'Numbers of episodes per agent' )
+    parser.add_argument( "--agents", type = int, default = defaultConfig[ 'agents' ], help = 'Number of agents per config' )
+    parser.add_argument( "--seed", type = int, help = 'Base of the seeds of the agents, derived from the config by default' )
+    parser.add_argument( "--workers", type = int, help = 'Number of worker processes, the number of cores by default' )
+    parser.add_argument( "--plateau", type = float, nargs = 2, metavar = ( 'WINDOW', 'TOLERANCE' ), help = 'Stop an agent once its curve plateaus' )
+    args = parser.parse_args()
+    configs = grid( sarsa = args.sarsa, defVal = args.defVal, symmetry = args.symmetry, selfPlay = args.selfPlay,
+                    learningRate = args.learningRate, episodes = args.episodes, agents = [ args.agents ], seed = [ args.seed ] )
+    plateau = None if args.plateau is None else ( int( args.plateau[ 0 ] ), args.plateau[ 1 ] )
+    experimentSweep = Sweep( nOfWorkers = args.workers, plateau = plateau )
+    print( "{} configs, {} to run".format( len( configs ), len( experimentSweep.pending( configs ) ) ) )
+    for config, curve in zip( configs, experimentSweep.run( configs ) ):
+        tail = curve[ -len( curve ) // 10 : ]
+        print( "{} {} final average {:.3f}".format( experimentSweep.key( config ), json.dumps( config, sort_keys = True ), sum( tail ) / len( tail ) ) )